@@ -25,23 +25,37 @@ docker compose -f ../docker-compose.yml exec -T train bash -c "
 "
 
 echo ""
-echo "ステップ 2/4: トレーニングテキストの再拡張"
-echo "----------------------------------------"
-docker compose -f ../docker-compose.yml exec -T train python3 scripts/expand_training_texts.py
+# PIPELINE=1（デフォルト）: 拡張した行をそのまま描画へ流す（拡張の完了を待たずに描画が始まる）
+# PIPELINE=0: 拡張を終えてから描画する（従来どおり）
+# EXECUTOR_BACKEND環境変数で実行バックエンドを指定可能（process / thread）
+# BATCH_SIZE環境変数で1回のtext2imageで描画する行数を指定可能（デフォルト: 1）
+# MAX_WORKERS環境変数でワーカー数を指定可能（デフォルト: auto = 枚数/秒と空きメモリを見て自動調整）
+# AUTOCROP=1 で描画後に文字の範囲へ切り詰めてGroup 4圧縮で保存（デフォルト: 0）
+# AUGMENT_VARIANTS環境変数で1枚の描画から作る劣化させた派生サンプルの数を指定可能（デフォルト: 0）
+# JOB_QUEUE=1 でジョブキューから処理（中断しても未完了のジョブから再開, デフォルト: 0）
+if [ "${PIPELINE:-1}" = "1" ]; then
+    echo "ステップ 2-3/4: トレーニングテキストの再拡張とトレーニングデータの生成（パイプライン）"
+    echo "----------------------------------------"
+    echo "これには10〜20分かかる場合があります..."
+    docker compose -f ../docker-compose.yml exec -T train bash -c "PYTHONUNBUFFERED=1 MAX_WORKERS=${MAX_WORKERS:-auto} BATCH_SIZE=${BATCH_SIZE:-1} EXECUTOR_BACKEND=${EXECUTOR_BACKEND:-process} AUTOCROP=${AUTOCROP:-0} AUGMENT_VARIANTS=${AUGMENT_VARIANTS:-0} JOB_QUEUE=${JOB_QUEUE:-0} python3 scripts/pipeline.py"
+else
+    echo "ステップ 2/4: トレーニングテキストの再拡張"
+    echo "----------------------------------------"
+    docker compose -f ../docker-compose.yml exec -T train python3 scripts/expand_training_texts.py
 
-echo ""
-echo "ステップ 3/4: トレーニングデータの生成（text2image）"
-echo "----------------------------------------"
-echo "これには10〜20分かかる場合があります..."
-# MAX_WORKERS環境変数でワーカー数を指定可能（デフォルト: 12）
-docker compose -f ../docker-compose.yml exec -T train bash -c "PYTHONUNBUFFERED=1 MAX_WORKERS=${MAX_WORKERS:-12} python3 scripts/generate_training_data.py"
+    echo ""
+    echo "ステップ 3/4: トレーニングデータの生成（text2image）"
+    echo "----------------------------------------"
+    echo "これには10〜20分かかる場合があります..."
+    docker compose -f ../docker-compose.yml exec -T train bash -c "PYTHONUNBUFFERED=1 MAX_WORKERS=${MAX_WORKERS:-auto} BATCH_SIZE=${BATCH_SIZE:-1} EXECUTOR_BACKEND=${EXECUTOR_BACKEND:-process} AUTOCROP=${AUTOCROP:-0} AUGMENT_VARIANTS=${AUGMENT_VARIANTS:-0} JOB_QUEUE=${JOB_QUEUE:-0} python3 scripts/generate_training_data.py"
+fi
 
 echo ""
 echo "ステップ 4/4: モデルのトレーニング（LSTM）"
 echo "----------------------------------------"
 echo "これには1〜2時間かかる場合があります..."
-# PARALLEL_JOBS環境変数でlstmf生成の並列数を指定可能（デフォルト: 12）
-docker compose -f ../docker-compose.yml exec -T train bash -c "PARALLEL_JOBS=${PARALLEL_JOBS:-12} bash scripts/train_model.sh"
+# PARALLEL_JOBS環境変数でlstmf生成の並列数を指定可能（デフォルト: 使用可能なCPU数）
+docker compose -f ../docker-compose.yml exec -T train bash -c "PARALLEL_JOBS=${PARALLEL_JOBS:-} bash scripts/train_model.sh"
 
 echo ""
 echo "完了: トレーニング済みモデルのコピー"
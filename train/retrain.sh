@@ -22,8 +22,34 @@ fi
 echo "ステップ 1/2: lstmfファイルの再生成とモデルトレーニング"
 echo "----------------------------------------"
 echo "これには1〜2時間かかる場合があります..."
-# PARALLEL_JOBS環境変数でlstmf生成の並列数を指定可能（デフォルト: 12）
-docker compose -C "$PROJECT_ROOT" exec -T train bash -c "PARALLEL_JOBS=${PARALLEL_JOBS:-12} bash scripts/train_model.sh"
+# PARALLEL_JOBS環境変数でlstmf生成の並列数を指定可能（デフォルト: 使用可能なCPU数）
+# EARLY_STOPPING=0 で早期終了せず MAX_ITERATIONS（デフォルト: 50,000）まで学習
+# TRAINING_ORDER環境変数でトレーニングリストの並び順を指定可能（interleave / curriculum / sorted）
+docker compose -C "$PROJECT_ROOT" exec -T train bash -c "PYTHONUNBUFFERED=1 PARALLEL_JOBS=${PARALLEL_JOBS:-} EARLY_STOPPING=${EARLY_STOPPING:-1} MAX_ITERATIONS=${MAX_ITERATIONS:-50000} TRAINING_ORDER=${TRAINING_ORDER:-interleave} WEIGHT_BY_ERROR=${WEIGHT_BY_ERROR:-0} bash scripts/train_model.sh"
+
+# 学習に使っていない行でベースモデル（jpn）と比較し、改善していなければアプリへはコピーしない
+# EVALUATE=0 で評価を省略、MIN_IMPROVEMENT で採用に必要な文字誤り率の改善幅を指定可能（デフォルト: 0）
+SHIP_MODEL=1
+if [ "${EVALUATE:-1}" = "1" ]; then
+    echo ""
+    echo "モデルの評価（jpn と jpn_custom の比較）"
+    echo "----------------------------------------"
+    if ! docker compose -C "$PROJECT_ROOT" exec -T train bash -c "PYTHONUNBUFFERED=1 python3 scripts/evaluate_model.py --min-improvement ${MIN_IMPROVEMENT:-0}"; then
+        SHIP_MODEL=0
+    fi
+fi
+
+# 配布用の書き出し（整数化した fast 版と圧縮レベルを比較し、精度の条件を満たす中で最も軽いものを選ぶ）
+# EXPORT=0 で省略（従来どおり best 版を gzip -k で圧縮）、MAX_CER_INCREASE で best からの文字誤り率の許容増加幅を指定可能
+EXPORTED=0
+if [ "$SHIP_MODEL" = "1" ] && [ "${EXPORT:-1}" = "1" ]; then
+    echo ""
+    echo "配布用モデルの書き出し（best / fast × 圧縮レベルの比較）"
+    echo "----------------------------------------"
+    if docker compose -C "$PROJECT_ROOT" exec -T train bash -c "PYTHONUNBUFFERED=1 python3 scripts/export_model.py --max-cer-increase ${MAX_CER_INCREASE:-0.005}"; then
+        EXPORTED=1
+    fi
+fi
 
 echo ""
 echo "ステップ 2/2: トレーニング済みモデルのコピー"
@@ -31,12 +57,23 @@ echo "----------------------------------------"
 docker cp tesseract-train-jp:/workspace/output/jpn_custom.traineddata "$SCRIPT_DIR/output/"
 
 # アプリフォルダが存在する場合は自動的にコピー
-if [ -d "$PROJECT_ROOT/app/public/tessdata" ]; then
-    cp "$SCRIPT_DIR/output/jpn_custom.traineddata" "$PROJECT_ROOT/app/public/tessdata/"
-    # gzip圧縮版も作成
-    gzip -k -f "$PROJECT_ROOT/app/public/tessdata/jpn_custom.traineddata"
-    echo "✓ モデルを app/public/tessdata/ にコピーしました"
-    echo "✓ gzip圧縮版も作成しました"
+if [ "$SHIP_MODEL" != "1" ]; then
+    echo "注意: 評価でベースモデルより改善しなかったため app/public/tessdata/ にはコピーしません"
+    echo "評価レポート: train/output/eval/eval_report.json"
+elif [ -d "$PROJECT_ROOT/app/public/tessdata" ]; then
+    if [ "$EXPORTED" = "1" ]; then
+        # output はコンテナの /workspace/output をマウントしているので、書き出した版はそのまま読める
+        cp "$SCRIPT_DIR/output/publish/jpn_custom.traineddata" "$SCRIPT_DIR/output/publish/jpn_custom.traineddata.gz" \
+            "$PROJECT_ROOT/app/public/tessdata/"
+        echo "✓ 書き出した配布用モデルを app/public/tessdata/ にコピーしました"
+        echo "比較レポート: train/output/export/export_report.json"
+    else
+        cp "$SCRIPT_DIR/output/jpn_custom.traineddata" "$PROJECT_ROOT/app/public/tessdata/"
+        # gzip圧縮版も作成
+        gzip -k -f "$PROJECT_ROOT/app/public/tessdata/jpn_custom.traineddata"
+        echo "✓ モデルを app/public/tessdata/ にコピーしました"
+        echo "✓ gzip圧縮版も作成しました"
+    fi
 else
     echo "注意: app/public/tessdata/ が見つかりません"
 fi
@@ -53,16 +53,54 @@ fi
 echo ""
 echo "ステップ 4/6: トレーニングデータの生成（text2image）"
 echo "----------------------------------------"
+# PLAN=1 で一部だけ描画して所要時間・ディスク使用量・失敗数を見積もり、生成せずに終了
+if [ "${PLAN:-0}" = "1" ]; then
+    docker compose -f ../docker-compose.yml exec -T train bash -c "PYTHONUNBUFFERED=1 BATCH_SIZE=${BATCH_SIZE:-1} EXECUTOR_BACKEND=${EXECUTOR_BACKEND:-process} AUTOCROP=${AUTOCROP:-0} AUGMENT_VARIANTS=${AUGMENT_VARIANTS:-0} python3 scripts/plan_generation.py"
+    echo ""
+    echo "見積もり: train/output/plan.json（コンテナ内: /workspace/output/plan.json）"
+    exit 0
+fi
 echo "これには10〜20分かかる場合があります..."
-# MAX_WORKERS環境変数でワーカー数を指定可能（デフォルト: CPU数×2）
-docker compose -f ../docker-compose.yml exec -T train bash -c "PYTHONUNBUFFERED=1 MAX_WORKERS=${MAX_WORKERS:-12} python3 scripts/generate_training_data.py"
+# EXECUTOR_BACKEND環境変数で実行バックエンドを指定可能（process / thread）
+# BATCH_SIZE環境変数で1回のtext2imageで描画する行数を指定可能（デフォルト: 1）
+# MAX_WORKERS環境変数でワーカー数を指定可能（デフォルト: auto = 枚数/秒と空きメモリを見て自動調整）
+# AUTOCROP=1 で描画後に文字の範囲へ切り詰めてGroup 4圧縮で保存（デフォルト: 0）
+# AUGMENT_VARIANTS環境変数で1枚の描画から作る劣化させた派生サンプルの数を指定可能（デフォルト: 0）
+# JOB_QUEUE=1 でジョブキューから処理（中断しても未完了のジョブから再開, デフォルト: 0）
+docker compose -f ../docker-compose.yml exec -T train bash -c "PYTHONUNBUFFERED=1 MAX_WORKERS=${MAX_WORKERS:-auto} BATCH_SIZE=${BATCH_SIZE:-1} EXECUTOR_BACKEND=${EXECUTOR_BACKEND:-process} AUTOCROP=${AUTOCROP:-0} AUGMENT_VARIANTS=${AUGMENT_VARIANTS:-0} JOB_QUEUE=${JOB_QUEUE:-0} python3 scripts/generate_training_data.py"
 
 echo ""
 echo "ステップ 5/6: モデルのトレーニング（LSTM）"
 echo "----------------------------------------"
 echo "これには30分〜1時間かかる場合があります..."
-# PARALLEL_JOBS環境変数でlstmf生成の並列数を指定可能（デフォルト: 12）
-docker compose -f ../docker-compose.yml exec -T train bash -c "PARALLEL_JOBS=${PARALLEL_JOBS:-12} bash scripts/train_model.sh"
+# PARALLEL_JOBS環境変数でlstmf生成の並列数を指定可能（デフォルト: 使用可能なCPU数）
+# EARLY_STOPPING=0 で早期終了せず MAX_ITERATIONS（デフォルト: 50,000）まで学習
+# TRAINING_ORDER環境変数でトレーニングリストの並び順を指定可能（interleave / curriculum / sorted）
+docker compose -f ../docker-compose.yml exec -T train bash -c "PYTHONUNBUFFERED=1 PARALLEL_JOBS=${PARALLEL_JOBS:-} EARLY_STOPPING=${EARLY_STOPPING:-1} MAX_ITERATIONS=${MAX_ITERATIONS:-50000} TRAINING_ORDER=${TRAINING_ORDER:-interleave} WEIGHT_BY_ERROR=${WEIGHT_BY_ERROR:-0} bash scripts/train_model.sh"
+
+# 学習に使っていない行でベースモデル（jpn）と比較し、改善していなければアプリへはコピーしない
+# EVALUATE=0 で評価を省略、MIN_IMPROVEMENT で採用に必要な文字誤り率の改善幅を指定可能（デフォルト: 0）
+SHIP_MODEL=1
+if [ "${EVALUATE:-1}" = "1" ]; then
+    echo ""
+    echo "モデルの評価（jpn と jpn_custom の比較）"
+    echo "----------------------------------------"
+    if ! docker compose -f ../docker-compose.yml exec -T train bash -c "PYTHONUNBUFFERED=1 python3 scripts/evaluate_model.py --min-improvement ${MIN_IMPROVEMENT:-0}"; then
+        SHIP_MODEL=0
+    fi
+fi
+
+# 配布用の書き出し（整数化した fast 版と圧縮レベルを比較し、精度の条件を満たす中で最も軽いものを選ぶ）
+# EXPORT=0 で省略（従来どおり best 版を gzip -k で圧縮）、MAX_CER_INCREASE で best からの文字誤り率の許容増加幅を指定可能
+EXPORTED=0
+if [ "$SHIP_MODEL" = "1" ] && [ "${EXPORT:-1}" = "1" ]; then
+    echo ""
+    echo "配布用モデルの書き出し（best / fast × 圧縮レベルの比較）"
+    echo "----------------------------------------"
+    if docker compose -f ../docker-compose.yml exec -T train bash -c "PYTHONUNBUFFERED=1 python3 scripts/export_model.py --max-cer-increase ${MAX_CER_INCREASE:-0.005}"; then
+        EXPORTED=1
+    fi
+fi
 
 echo ""
 echo "ステップ 6/6: トレーニング済みモデルのコピー"
@@ -70,12 +108,22 @@ echo "----------------------------------------"
 docker cp tesseract-train-jp:/workspace/output/jpn_custom.traineddata ./output/
 
 # アプリフォルダが存在する場合は自動的にコピー
-if [ -d "../app/public/tessdata" ]; then
-    cp ./output/jpn_custom.traineddata ../app/public/tessdata/
-    # gzip圧縮版も作成
-    gzip -k -f ../app/public/tessdata/jpn_custom.traineddata
-    echo "✓ モデルを app/public/tessdata/ にコピーしました"
-    echo "✓ gzip圧縮版も作成しました"
+if [ "$SHIP_MODEL" != "1" ]; then
+    echo "注意: 評価でベースモデルより改善しなかったため app/public/tessdata/ にはコピーしません"
+    echo "評価レポート: train/output/eval/eval_report.json"
+elif [ -d "../app/public/tessdata" ]; then
+    if [ "$EXPORTED" = "1" ]; then
+        # ./output はコンテナの /workspace/output をマウントしているので、書き出した版はそのまま読める
+        cp ./output/publish/jpn_custom.traineddata ./output/publish/jpn_custom.traineddata.gz ../app/public/tessdata/
+        echo "✓ 書き出した配布用モデルを app/public/tessdata/ にコピーしました"
+        echo "比較レポート: train/output/export/export_report.json"
+    else
+        cp ./output/jpn_custom.traineddata ../app/public/tessdata/
+        # gzip圧縮版も作成
+        gzip -k -f ../app/public/tessdata/jpn_custom.traineddata
+        echo "✓ モデルを app/public/tessdata/ にコピーしました"
+        echo "✓ gzip圧縮版も作成しました"
+    fi
 else
     echo "注意: app/public/tessdata/ が見つかりません"
     echo "手動でコピーしてください: cp output/jpn_custom.traineddata ../app/public/tessdata/"
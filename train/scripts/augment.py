@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+描画済みのサンプル1枚から劣化させた派生サンプルをK枚作る画像拡張
+
+ノイズ・ぼかし・露出/コントラストの変化はK枚をまとめた配列に対してNumPyで一括で適用し、
+その後に1枚ずつ小さな回転（BOXの座標も回転して付け直す）とJPEG圧縮のノイズを加える。
+乱数はシード値とBOXファイルの内容から決まるので、同じサンプルからは同じ派生サンプルができる。
+"""
+
+import io
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from image_postprocess import crop_to_content
+from tess_box import read_box_file, write_box_file
+
+# 派生サンプルは文字の範囲 + この余白（ピクセル）に切り詰めてから加工する
+MARGIN = 40
+# ガウスノイズの標準偏差（画素値 0〜255）の範囲
+NOISE_SIGMA = (0.0, 18.0)
+# ぼかしをかける確率と、ガウスぼかしのσの範囲
+BLUR_PROB = 0.5
+BLUR_SIGMA = (0.4, 1.2)
+# コントラスト（倍率）と露出（明るさのずれ）の範囲
+CONTRAST = (0.6, 1.1)
+EXPOSURE = (-40.0, 40.0)
+# 回転角（度）の最大値
+MAX_ROTATION = 1.5
+# JPEGの圧縮ノイズを加える確率と品質の範囲
+JPEG_PROB = 0.5
+JPEG_QUALITY = (25, 75)
+
+
+def sample_rng(seed, box_path):
+    """シード値とBOXファイルの内容から乱数生成器を作る（画像番号に依存しない）"""
+    with open(box_path, 'rb') as f:
+        digest = zlib.crc32(f.read())
+    return np.random.default_rng([seed, digest])
+
+
+def gaussian_kernels(sigmas):
+    """σの異なるガウスカーネルを同じ長さに揃えて (K, 2R+1) で返す（σ=0は恒等）"""
+    radius = max(1, int(np.ceil(sigmas.max() * 3)))
+    x = np.arange(-radius, radius + 1, dtype=np.float32)
+    safe = np.where(sigmas > 0, sigmas, 1.0).astype(np.float32)[:, None]
+    kernels = np.exp(-(x * x) / (2 * safe * safe))
+    kernels[sigmas <= 0] = (x == 0)
+    return kernels / kernels.sum(axis=1, keepdims=True)
+
+
+def blur_batch(batch, sigmas):
+    """(K, H, W) の各画像にσの異なるガウスぼかしを縦横の分離フィルタで一括でかける"""
+    if not (sigmas > 0).any():
+        return batch
+    kernels = gaussian_kernels(sigmas)
+    radius = kernels.shape[1] // 2
+    for axis in (1, 2):
+        pad = [(0, 0)] * 3
+        pad[axis] = (radius, radius)
+        padded = np.pad(batch, pad, mode='edge')
+        length = batch.shape[axis]
+        blurred = np.zeros_like(batch)
+        for i in range(kernels.shape[1]):
+            window = padded[:, i:i + length, :] if axis == 1 else padded[:, :, i:i + length]
+            blurred += kernels[:, i, None, None] * window
+        batch = blurred
+    return batch
+
+
+def photometric_batch(image, variants, rng):
+    """
+    同じ画像をK枚に複製し、露出/コントラスト・ぼかし・ノイズを一括で適用
+
+    戻り値は (K, H, W) の float32 配列（0〜255）
+    """
+    batch = np.repeat(np.asarray(image.convert('L'), dtype=np.float32)[None], variants, axis=0)
+
+    contrast = rng.uniform(*CONTRAST, size=(variants, 1, 1)).astype(np.float32)
+    exposure = rng.uniform(*EXPOSURE, size=(variants, 1, 1)).astype(np.float32)
+    batch = (batch - 128.0) * contrast + 128.0 + exposure
+
+    sigmas = np.where(rng.random(variants) < BLUR_PROB, rng.uniform(*BLUR_SIGMA, size=variants), 0.0)
+    batch = blur_batch(batch, sigmas)
+
+    noise_sigma = rng.uniform(*NOISE_SIGMA, size=(variants, 1, 1)).astype(np.float32)
+    batch += rng.standard_normal(batch.shape, dtype=np.float32) * noise_sigma
+
+    return np.clip(batch, 0, 255)
+
+
+def rotate_boxes(boxes, angle, size, new_size):
+    """
+    BOXの座標を画像と同じだけ回転させ、回転後の矩形に外接するボックスに付け直す
+
+    PillowのImage.rotate(expand=True)と同じく画像中心まわりの反時計回り。
+    """
+    if not boxes:
+        return []
+    width, height = size
+    new_width, new_height = new_size
+    coords = np.array([box[1:5] for box in boxes], dtype=np.float64)
+    left, bottom, right, top = coords.T
+
+    # 左上原点の四隅 (N, 4, 2)
+    xs = np.stack([left, right, right, left], axis=1)
+    ys = np.stack([height - top, height - top, height - bottom, height - bottom], axis=1)
+
+    theta = np.deg2rad(angle)
+    cos, sin = np.cos(theta), np.sin(theta)
+    dx, dy = xs - width / 2, ys - height / 2
+    new_xs = new_width / 2 + dx * cos + dy * sin
+    new_ys = new_height / 2 - dx * sin + dy * cos
+
+    new_left = np.clip(np.floor(new_xs.min(axis=1)), 0, new_width).astype(int)
+    new_right = np.clip(np.ceil(new_xs.max(axis=1)), 0, new_width).astype(int)
+    new_top = np.clip(np.floor(new_ys.min(axis=1)), 0, new_height).astype(int)
+    new_bottom = np.clip(np.ceil(new_ys.max(axis=1)), 0, new_height).astype(int)
+
+    return [
+        (box[0], int(l), int(new_height - b), int(r), int(new_height - t), 0)
+        for box, l, b, r, t in zip(boxes, new_left, new_bottom, new_right, new_top)
+    ]
+
+
+def jpeg_roundtrip(image, quality):
+    """JPEGで圧縮・展開してブロックノイズを加える"""
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=int(quality))
+    buffer.seek(0)
+    with Image.open(buffer) as degraded:
+        return degraded.convert('L')
+
+
+def augment_sample(base, variant_bases, seed):
+    """
+    base.tif / base.box から派生サンプルを variant_bases の各パスに書き出す
+
+    派生サンプルは文字の範囲に切り詰めたグレースケールのTIFF（LZW圧縮）。
+    """
+    variants = len(variant_bases)
+    if variants == 0:
+        return
+    rng = sample_rng(seed, base + '.box')
+    boxes = read_box_file(base + '.box')
+    with Image.open(base + '.tif') as image:
+        image.load()
+    dpi = image.info.get('dpi', (300, 300))
+    # ページ全体の余白まで加工すると無駄なので先に切り詰める
+    image, boxes = crop_to_content(image, boxes, MARGIN)
+
+    batch = photometric_batch(image, variants, rng).astype(np.uint8)
+    angles = rng.uniform(-MAX_ROTATION, MAX_ROTATION, size=variants)
+    use_jpeg = rng.random(variants) < JPEG_PROB
+    qualities = rng.integers(*JPEG_QUALITY, size=variants, endpoint=True)
+
+    for k, variant_base in enumerate(variant_bases):
+        variant = Image.fromarray(batch[k])
+        rotated = variant.rotate(angles[k], resample=Image.BILINEAR, expand=True, fillcolor=255)
+        variant_boxes = rotate_boxes(boxes, angles[k], variant.size, rotated.size)
+        if use_jpeg[k]:
+            rotated = jpeg_roundtrip(rotated, qualities[k])
+        rotated.save(variant_base + '.tif', compression='tiff_lzw', dpi=dpi)
+        write_box_file(variant_base + '.box', variant_boxes)
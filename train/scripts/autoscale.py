@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成処理の同時実行数を実測の枚数/秒と空きメモリから決める
+
+少ない同時実行数から始め、一定時間ごとの枚数/秒が伸びている間は増やし、
+伸びなくなったら最も速かった段階に戻して固定する。
+空きメモリ（/proc/meminfo とcgroupの上限の小さい方）がしきい値を下回ったら減らす。
+固定した後も、空きメモリがしきい値以上の状態が RECOVERY_WINDOWS 回続いたら改めて増やしてみる
+（一時的なメモリ不足で下げたままにならないように）。
+使えるCPU数（available_cpus）もここで求め、生成以外のスクリプトからも使う。
+"""
+
+import multiprocessing
+import os
+import time
+
+# 空きメモリがこれを下回ったら同時実行数を減らす（MB）
+MIN_AVAILABLE_MB = int(os.environ.get('AUTOSCALE_MIN_AVAILABLE_MB', '1024'))
+# 枚数/秒を測る間隔（秒）
+INTERVAL_SEC = float(os.environ.get('AUTOSCALE_INTERVAL_SEC', '10'))
+# これ以上速くならなければ頭打ちとみなす（前の段階比）
+MIN_GAIN = 0.05
+# 固定してから、空きメモリに余裕のある間隔がこの回数続いたら再び増やしてみる
+RECOVERY_WINDOWS = int(os.environ.get('AUTOSCALE_RECOVERY_WINDOWS', '3'))
+
+
+def _read_int(path):
+    try:
+        with open(path, 'r') as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def available_cpus():
+    """このプロセスが使えるCPU数（コンテナのCPU制限を反映）"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return multiprocessing.cpu_count()
+
+
+def available_memory_mb():
+    """使えるメモリの残り（MB）。ホストの MemAvailable とcgroupの上限までの残りの小さい方"""
+    candidates = []
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    candidates.append(int(line.split()[1]) / 1024)
+                    break
+    except OSError:
+        pass
+
+    # cgroup v2 / v1
+    for limit_file, usage_file in (
+            ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),
+            ('/sys/fs/cgroup/memory/memory.limit_in_bytes', '/sys/fs/cgroup/memory/memory.usage_in_bytes')):
+        limit = _read_int(limit_file)
+        usage = _read_int(usage_file)
+        # 上限なしのv1は非常に大きな値になる
+        if limit is not None and usage is not None and limit < 1 << 60:
+            candidates.append((limit - usage) / (1024 * 1024))
+            break
+
+    return min(candidates) if candidates else None
+
+
+class ConcurrencyController:
+    """
+    同時実行数を山登りで調整する
+
+    limit() が現在の同時実行数、observe() に完了件数を渡すと間隔ごとに見直す。
+    """
+
+    def __init__(self, max_level, start=2, step=None, interval_sec=INTERVAL_SEC,
+                 min_available_mb=MIN_AVAILABLE_MB, recovery_windows=RECOVERY_WINDOWS, log=print):
+        self.max_level = max(1, max_level)
+        self.level = max(1, min(start, self.max_level))
+        self.step = step or max(1, self.max_level // 8)
+        self.interval_sec = interval_sec
+        self.min_available_mb = min_available_mb
+        self.recovery_windows = recovery_windows
+        self.log = log
+        self.best_rate = 0.0
+        self.best_level = self.level
+        self.settled = False
+        # 空きメモリに余裕のある間隔が続いた回数（減らしたとき・固定したときに0に戻す）
+        self.healthy_windows = 0
+        self.window_start = time.time()
+        self.window_completed = 0
+        self.history = []
+
+    def limit(self):
+        return self.level
+
+    def _set_level(self, level, reason, rate):
+        level = max(1, min(self.max_level, level))
+        if level != self.level:
+            self.log(f"同時実行数: {self.level} → {level}（{reason}, {rate:.1f}枚/秒）")
+            self.level = level
+
+    def observe(self, completed):
+        """完了したサンプルの累計を渡す（間隔が経過していれば同時実行数を見直す）"""
+        now = time.time()
+        elapsed = now - self.window_start
+        if elapsed < self.interval_sec:
+            return
+        rate = (completed - self.window_completed) / elapsed
+        self.window_start = now
+        self.window_completed = completed
+
+        available = available_memory_mb()
+        self.history.append({'level': self.level, 'rate': round(rate, 2),
+                             'available_mb': round(available) if available is not None else None})
+
+        if available is not None and available < self.min_available_mb:
+            # メモリが逼迫したら、頭打ちの判定に関わらず減らす
+            self.best_level = max(1, min(self.best_level, self.level - self.step))
+            self.healthy_windows = 0
+            self._set_level(self.level - self.step, f"空きメモリ {available:.0f}MB", rate)
+            return
+        self.healthy_windows += 1
+
+        if self.settled:
+            if self.healthy_windows < self.recovery_windows or self.level >= self.max_level:
+                return
+            # 余裕のある状態が続いたので、今の段階を基準に改めて増やしてみる
+            self.settled = False
+            self.best_rate = rate
+            self.best_level = self.level
+            self._set_level(self.level + self.step, "再探索", rate)
+            return
+
+        if rate > self.best_rate * (1 + MIN_GAIN):
+            self.best_rate = rate
+            self.best_level = self.level
+            if self.level < self.max_level:
+                self._set_level(self.level + self.step, "枚数/秒が向上", rate)
+            else:
+                self.settled = True
+                self.healthy_windows = 0
+        else:
+            # 頭打ち: 最も速かった段階に戻して固定
+            self.settled = True
+            self.healthy_windows = 0
+            self._set_level(self.best_level, "頭打ち", rate)
@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+トレーニングデータ生成のベンチマーク
+
+使い方:
+  python3 scripts/benchmark.py backends --lines 200
+  python3 scripts/benchmark.py renderers --lines 100
+  python3 scripts/benchmark.py postprocess --lines 100
+  python3 scripts/benchmark.py augment --lines 100 --variants 4
+  python3 scripts/benchmark.py expansion --lines 20000
+  python3 scripts/benchmark.py scheduler --tasks 2000 --sleep-ms 20
+  python3 scripts/benchmark.py e2e --lines 50
+  python3 scripts/benchmark.py convergence --target-error 10 --max-iterations 5000
+  python3 scripts/benchmark.py suite --output bench_$(git rev-parse --short HEAD).json
+  python3 scripts/benchmark.py compare bench_old.json bench_new.json --threshold 0.1
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import build_training_list
+import generate_training_data as gen
+import supervise_training
+from tess_box import read_box_file, box_text
+
+
+def bench_backends(args):
+    """同じコーパスで実行バックエンドごとの枚数/秒を比較"""
+    texts = list(itertools.islice(gen.iter_training_texts(), args.lines))
+    fonts = gen.get_available_fonts()[:args.fonts]
+    total = len(texts) * len(fonts)
+
+    # キャッシュが効くと比較にならないので無効化
+    gen.RENDER_CACHE_DIR = ''
+    gen.METRICS_DIR = ''
+
+    results = []
+    for backend in args.backends:
+        gen.OUTPUT_DIR = tempfile.mkdtemp(prefix=f'bench_{backend}_')
+        try:
+            start = time.perf_counter()
+            succeeded, failed = gen.generate_training_data_with_text2image(
+                texts, fonts, max_workers=args.workers, backend=backend)
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(gen.OUTPUT_DIR, ignore_errors=True)
+
+        results.append({
+            'backend': backend,
+            'workers': args.workers or gen.default_max_workers(backend),
+            'samples': total,
+            'succeeded': succeeded,
+            'failed': failed,
+            'seconds': round(elapsed, 3),
+            'samples_per_sec': round(total / elapsed, 2) if elapsed > 0 else 0,
+        })
+
+    print("\n=== 実行バックエンドの比較 ===")
+    for r in results:
+        print(f"  {r['backend']:8s} ワーカー数: {r['workers']:3d} | {r['samples']}枚 "
+              f"{r['seconds']:.1f}秒 | {r['samples_per_sec']:.1f}枚/秒")
+    return results
+
+
+def bench_renderers(args):
+    """text2imageとPillowレンダラーの枚数/秒を比較し、BOXの文字列が一致するか確認"""
+    texts = list(itertools.islice(gen.iter_training_texts(), args.lines))
+    fonts = gen.get_available_fonts()[:args.fonts]
+    total = len(texts) * len(fonts)
+
+    gen.RENDER_CACHE_DIR = ''
+    gen.METRICS_DIR = ''
+
+    output_dirs = {}
+    results = []
+    try:
+        for renderer in ('text2image', 'pillow'):
+            gen.RENDERER = renderer
+            gen.OUTPUT_DIR = output_dirs[renderer] = tempfile.mkdtemp(prefix=f'bench_{renderer}_')
+            start = time.perf_counter()
+            succeeded, failed = gen.generate_training_data_with_text2image(
+                texts, fonts, max_workers=args.workers, backend='thread')
+            elapsed = time.perf_counter() - start
+            results.append({
+                'renderer': renderer,
+                'samples': total,
+                'succeeded': succeeded,
+                'failed': failed,
+                'seconds': round(elapsed, 3),
+                'samples_per_sec': round(total / elapsed, 2) if elapsed > 0 else 0,
+            })
+
+        # BOXファイルの文字列（空白・行末を除く）が一致するか
+        compared = matched = 0
+        mismatches = []
+        for image_index in range(total):
+            name = gen.sample_base_name(image_index) + '.box'
+            try:
+                expected = box_text(read_box_file(f"{output_dirs['text2image']}/{name}"))
+                actual = box_text(read_box_file(f"{output_dirs['pillow']}/{name}"))
+            except FileNotFoundError:
+                continue
+            compared += 1
+            if expected == actual:
+                matched += 1
+            elif len(mismatches) < 5:
+                mismatches.append({'sample': name, 'text2image': expected, 'pillow': actual})
+    finally:
+        for output_dir in output_dirs.values():
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    parity = {'compared': compared, 'matched': matched,
+              'match_rate': round(matched / compared, 4) if compared else None,
+              'mismatches': mismatches}
+
+    print("\n=== レンダラーの比較 ===")
+    for r in results:
+        print(f"  {r['renderer']:10s} | {r['samples']}枚 {r['seconds']:.1f}秒 | {r['samples_per_sec']:.1f}枚/秒")
+    print(f"  BOX文字列の一致: {matched}/{compared}")
+    for m in mismatches:
+        print(f"    {m['sample']}: text2image={m['text2image']} pillow={m['pillow']}")
+    return {'renderers': results, 'parity': parity}
+
+
+def time_lstm_train(output_dir, names):
+    """各サンプルの lstm.train 生成にかかった合計秒数"""
+    start = time.perf_counter()
+    for name in names:
+        base = os.path.join(output_dir, name)
+        subprocess.run(['tesseract', base + '.tif', base, '--psm', '6', 'lstm.train'],
+                       capture_output=True, check=False)
+    return time.perf_counter() - start
+
+
+def bench_postprocess(args):
+    """切り詰め・圧縮の前後で出力サイズと lstm.train の生成時間を比較"""
+    from image_postprocess import autocrop_sample
+
+    texts = list(itertools.islice(gen.iter_training_texts(), args.lines))
+    fonts = gen.get_available_fonts()[:args.fonts]
+
+    gen.RENDER_CACHE_DIR = ''
+    gen.METRICS_DIR = ''
+    gen.AUTOCROP = False
+
+    raw_dir = gen.OUTPUT_DIR = tempfile.mkdtemp(prefix='bench_raw_')
+    cropped_dir = None
+    try:
+        gen.generate_training_data_with_text2image(texts, fonts, max_workers=args.workers)
+        names = sorted(name[:-len('.tif')] for name in os.listdir(raw_dir) if name.endswith('.tif'))
+        cropped_dir = tempfile.mkdtemp(prefix='bench_cropped_')
+        for name in names:
+            for ext in ('.tif', '.box'):
+                shutil.copy(os.path.join(raw_dir, name + ext), cropped_dir)
+
+        start = time.perf_counter()
+        raw_bytes = cropped_bytes = 0
+        for name in names:
+            before, after = autocrop_sample(os.path.join(cropped_dir, name), args.margin, args.compression)
+            raw_bytes += before
+            cropped_bytes += after
+        postprocess_sec = time.perf_counter() - start
+
+        results = {
+            'samples': len(names),
+            'margin': args.margin,
+            'compression': args.compression,
+            'raw_bytes': raw_bytes,
+            'cropped_bytes': cropped_bytes,
+            'postprocess_sec': round(postprocess_sec, 3),
+            'lstm_train_sec': {
+                'raw': round(time_lstm_train(raw_dir, names), 3),
+                'cropped': round(time_lstm_train(cropped_dir, names), 3),
+            },
+        }
+    finally:
+        shutil.rmtree(raw_dir, ignore_errors=True)
+        if cropped_dir:
+            shutil.rmtree(cropped_dir, ignore_errors=True)
+
+    ratio = results['cropped_bytes'] / results['raw_bytes'] if results['raw_bytes'] else 0
+    print("\n=== 後処理（切り詰め・圧縮）の比較 ===")
+    print(f"  サンプル数: {results['samples']} | 後処理: {results['postprocess_sec']:.1f}秒")
+    print(f"  出力サイズ: {results['raw_bytes'] / 1024 / 1024:.1f}MB → "
+          f"{results['cropped_bytes'] / 1024 / 1024:.1f}MB ({ratio:.1%})")
+    print(f"  lstm.train生成: {results['lstm_train_sec']['raw']:.1f}秒 → "
+          f"{results['lstm_train_sec']['cropped']:.1f}秒")
+    return results
+
+
+def bench_augment(args):
+    """描画し直す場合と、描画済みのサンプルから派生サンプルを作る場合の枚数/秒を比較"""
+    from augment import augment_sample
+
+    texts = list(itertools.islice(gen.iter_training_texts(), args.lines))
+    fonts = gen.get_available_fonts()[:args.fonts]
+
+    gen.RENDER_CACHE_DIR = ''
+    gen.METRICS_DIR = ''
+    gen.AUGMENT_VARIANTS = 0
+
+    gen.OUTPUT_DIR = tempfile.mkdtemp(prefix='bench_augment_')
+    try:
+        start = time.perf_counter()
+        gen.generate_training_data_with_text2image(texts, fonts, max_workers=1, backend='thread')
+        render_sec = time.perf_counter() - start
+
+        names = sorted(name[:-len('.tif')] for name in os.listdir(gen.OUTPUT_DIR) if name.endswith('.tif'))
+        start = time.perf_counter()
+        for name in names:
+            base = os.path.join(gen.OUTPUT_DIR, name)
+            augment_sample(base, [f"{base}_aug{k}" for k in range(1, args.variants + 1)], 0)
+        augment_sec = time.perf_counter() - start
+    finally:
+        shutil.rmtree(gen.OUTPUT_DIR, ignore_errors=True)
+
+    results = {
+        'samples': len(names),
+        'variants': args.variants,
+        'render_per_sec': round(len(names) / render_sec, 2) if render_sec > 0 else 0,
+        'augment_per_sec': round(len(names) * args.variants / augment_sec, 2) if augment_sec > 0 else 0,
+    }
+
+    print("\n=== 描画と画像拡張の比較（1ワーカー） ===")
+    print(f"  描画:     {results['render_per_sec']:.1f}枚/秒")
+    print(f"  画像拡張: {results['augment_per_sec']:.1f}枚/秒（1枚あたり{args.variants}枚）")
+    return results
+
+
+def bench_expansion(args):
+    """コーパス拡張の各生成関数と、正規化・書き出しの行/秒"""
+    import random
+    import numpy as np
+    import expand_training_texts as expand
+    from fast_corpus import FAST_GENERATORS
+
+    generators = dict(expand.GENERATORS, amount=expand.generate_amounts)
+    results = []
+    for category, generate in generators.items():
+        random.seed(0)
+        start = time.perf_counter()
+        generate(args.lines)
+        elapsed = time.perf_counter() - start
+        results.append({'name': f"random.{category}", 'lines': args.lines, 'seconds': round(elapsed, 4),
+                        'lines_per_sec': round(args.lines / elapsed, 1) if elapsed > 0 else 0})
+    for category, generate in FAST_GENERATORS.items():
+        rng = np.random.default_rng(0)
+        start = time.perf_counter()
+        generate(rng, args.lines)
+        elapsed = time.perf_counter() - start
+        results.append({'name': f"numpy.{category}", 'lines': args.lines, 'seconds': round(elapsed, 4),
+                        'lines_per_sec': round(args.lines / elapsed, 1) if elapsed > 0 else 0})
+
+    # main() の後半（シャッフルしながらの混合・正規化・書き出し）
+    counts = {category: args.lines // len(expand.CATEGORY_COUNTS) for category in expand.CATEGORY_COUNTS}
+    total = sum(counts.values())
+    with tempfile.TemporaryDirectory(prefix='bench_expand_') as tmp_dir:
+        start = time.perf_counter()
+        expand.write_texts(os.path.join(tmp_dir, 'expanded.txt'), expand.iter_expanded_texts([], counts), total)
+        elapsed = time.perf_counter() - start
+    results.append({'name': 'main.write_texts', 'lines': total, 'seconds': round(elapsed, 4),
+                    'lines_per_sec': round(total / elapsed, 1) if elapsed > 0 else 0})
+
+    print("\n=== コーパス拡張（行/秒） ===")
+    for r in results:
+        print(f"  {r['name']:28s} {r['lines_per_sec']:12.1f}")
+    return {'expansion': results}
+
+
+# 描画せずに決まった時間だけ待ち、決まったサイズの .tif と .box を書く text2image の偽物
+FAKE_TEXT2IMAGE = """#!/bin/sh
+while [ $# -gt 0 ]; do
+    [ "$1" = "--outputbase" ] && base="$2"
+    shift
+done
+[ "$FAKE_SLEEP" != "0" ] && sleep "$FAKE_SLEEP"
+head -c "$FAKE_BYTES" /dev/zero > "$base.tif"
+printf 'a 0 0 1 1 0\n\t 1 0 2 1 0\n' > "$base.box"
+"""
+
+
+def peak_rss_mb():
+    """このプロセスの最大常駐メモリ（MB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_scheduler(args):
+    """偽のtext2imageでスケジューラー自体のタスク/秒と親プロセスのメモリを計測"""
+    tmp_dir = tempfile.mkdtemp(prefix='bench_scheduler_')
+    fake = os.path.join(tmp_dir, 'fake_text2image')
+    with open(fake, 'w') as f:
+        f.write(FAKE_TEXT2IMAGE)
+    os.chmod(fake, 0o755)
+    os.environ['FAKE_SLEEP'] = str(args.sleep_ms / 1000)
+    os.environ['FAKE_BYTES'] = str(args.bytes)
+
+    real_text2image = gen.TEXT2IMAGE_BIN
+    gen.TEXT2IMAGE_BIN = fake
+    gen.RENDERER = 'text2image'
+    gen.RENDER_CACHE_DIR = ''
+    gen.METRICS_DIR = ''
+    gen.FONT_COVERAGE = False
+    gen.BATCH_SIZE = 1
+
+    fonts = [f"font{i}" for i in range(args.fonts)]
+    lines = max(1, args.tasks // len(fonts))
+    results = []
+    try:
+        for backend in args.backends:
+            gen.OUTPUT_DIR = os.path.join(tmp_dir, backend)
+            texts = (f"ベンチマーク{i}" for i in range(lines))
+            rss_before = peak_rss_mb()
+            start = time.perf_counter()
+            succeeded, failed = gen.generate_training_data_with_text2image(
+                texts, fonts, max_workers=args.workers, total_texts=lines, backend=backend)
+            elapsed = time.perf_counter() - start
+            shutil.rmtree(gen.OUTPUT_DIR, ignore_errors=True)
+            results.append({
+                'backend': backend,
+                'tasks': lines * len(fonts),
+                'succeeded': succeeded,
+                'failed': failed,
+                'seconds': round(elapsed, 3),
+                'tasks_per_sec': round(lines * len(fonts) / elapsed, 1) if elapsed > 0 else 0,
+                'parent_peak_rss_mb': round(peak_rss_mb(), 1),
+                'parent_rss_growth_mb': round(peak_rss_mb() - rss_before, 1),
+            })
+    finally:
+        gen.TEXT2IMAGE_BIN = real_text2image
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"\n=== スケジューラー（偽のtext2image: {args.sleep_ms}ms, {args.bytes}バイト） ===")
+    for r in results:
+        print(f"  {r['backend']:8s} {r['tasks']}タスク {r['seconds']:.1f}秒 | {r['tasks_per_sec']:.1f}タスク/秒 "
+              f"| 親プロセスの最大メモリ: {r['parent_peak_rss_mb']:.1f}MB")
+    return {'scheduler': results, 'sleep_ms': args.sleep_ms, 'bytes': args.bytes}
+
+
+def bench_e2e(args):
+    """実際のtext2imageでコーパスの先頭を描画する（インストールされていなければ省略）"""
+    if shutil.which(gen.TEXT2IMAGE_BIN) is None:
+        print(f"\n{gen.TEXT2IMAGE_BIN} が見つからないため e2e は省略します")
+        return {'e2e': {'skipped': True}}
+
+    texts = list(itertools.islice(gen.iter_training_texts(), args.lines))
+    fonts = gen.get_available_fonts()[:args.fonts]
+    gen.RENDER_CACHE_DIR = ''
+    gen.METRICS_DIR = ''
+    gen.OUTPUT_DIR = tempfile.mkdtemp(prefix='bench_e2e_')
+    try:
+        start = time.perf_counter()
+        succeeded, failed = gen.generate_training_data_with_text2image(texts, fonts, max_workers=args.workers)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(gen.OUTPUT_DIR, ignore_errors=True)
+
+    total = len(texts) * len(fonts)
+    result = {'samples': total, 'succeeded': succeeded, 'failed': failed, 'seconds': round(elapsed, 3),
+              'samples_per_sec': round(total / elapsed, 2) if elapsed > 0 else 0}
+    print(f"\n=== e2e（text2image） ===\n  {total}枚 {elapsed:.1f}秒 | {result['samples_per_sec']:.1f}枚/秒")
+    return {'e2e': result}
+
+
+def iterations_to_target(list_file, model_output, target_error, max_iterations):
+    """
+    lstmtraining を回し、学習時のBCERが target_error 以下になったイテレーションを返す
+
+    (イテレーション（到達しなければNone）, 最後のイテレーション, 秒数) を返す。
+    """
+    cmd = [
+        'lstmtraining',
+        '--model_output', model_output,
+        '--continue_from', os.path.join(supervise_training.OUTPUT_DIR, f"{supervise_training.START_MODEL}_extracted.lstm"),
+        '--traineddata', os.path.join(supervise_training.TESSDATA, f"{supervise_training.START_MODEL}.traineddata"),
+        '--train_listfile', list_file,
+        '--max_iterations', str(max_iterations),
+        '--debug_interval', '-1',
+        '--learning_rate', supervise_training.LEARNING_RATE,
+    ]
+    start = time.perf_counter()
+    reached = None
+    iteration = 0
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+    for line in proc.stdout:
+        progress = supervise_training.PROGRESS_RE.search(line)
+        if progress:
+            iteration = int(progress.group(2))
+            if float(progress.group(4)) <= target_error:
+                reached = iteration
+                proc.terminate()
+                break
+    proc.wait()
+    return reached, iteration, time.perf_counter() - start
+
+
+def bench_convergence(args):
+    """トレーニングリストの並び順ごとに、目標の誤り率に届くまでのイテレーション数を比べる"""
+    list_file = args.list or supervise_training.TRAINING_LIST_FILE
+    if shutil.which('lstmtraining') is None or not os.path.exists(list_file):
+        print(f"\nlstmtraining または {list_file} が見つからないため convergence は省略します")
+        return {'convergence': {'skipped': True}}
+
+    with open(list_file, 'r', encoding='utf-8') as f:
+        lstmfs = [line.strip() for line in f if line.strip()]
+    samples = build_training_list.describe_samples(lstmfs, build_training_list.load_sample_info())
+
+    work_dir = tempfile.mkdtemp(prefix='bench_convergence_')
+    results = []
+    try:
+        for order in args.orders:
+            order_list = os.path.join(work_dir, f"{order}.txt")
+            with open(order_list, 'w', encoding='utf-8') as f:
+                f.writelines(path + '\n' for path in build_training_list.build_order(samples, order, args.seed))
+            reached, iteration, elapsed = iterations_to_target(
+                order_list, os.path.join(work_dir, order), args.target_error, args.max_iterations)
+            results.append({'name': order, 'iterations_to_target': reached, 'iterations': iteration,
+                            'seconds': round(elapsed, 1)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n=== 収束（BCER {args.target_error}% 以下まで, 上限 {args.max_iterations}イテレーション, "
+          f"{len(samples)}サンプル） ===")
+    for r in results:
+        reached = r['iterations_to_target']
+        print(f"  {r['name']:12s} {reached if reached is not None else '未到達':>8}イテレーション "
+              f"| {r['seconds']:.0f}秒")
+    return {'convergence': results, 'target_error': args.target_error}
+
+
+def bench_suite(args):
+    """拡張・スケジューラー・e2eをまとめて実行"""
+    results = {}
+    for bench in (bench_expansion, bench_scheduler, bench_e2e):
+        results.update(bench(args))
+    return results
+
+
+def git_revision():
+    """スクリプトのあるリポジトリのコミット（取得できなければNone）"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def flatten_metrics(value, prefix=''):
+    """結果のJSONを「パス → 数値」に平たくする（リストの要素は名前の項目で区別する）"""
+    flat = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flat.update(flatten_metrics(item, f"{prefix}{key}."))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            label = i
+            if isinstance(item, dict):
+                label = next((item[k] for k in ('name', 'backend', 'renderer') if k in item), i)
+            flat.update(flatten_metrics(item, f"{prefix}{label}."))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix.rstrip('.')] = value
+    return flat
+
+
+def metric_direction(path):
+    """大きいほど良い指標は1、小さいほど良い指標は-1、比較しない指標は0"""
+    name = path.rsplit('.', 1)[-1]
+    if name.endswith('_per_sec'):
+        return 1
+    if name in ('seconds', 'parent_peak_rss_mb', 'parent_rss_growth_mb', 'iterations_to_target'):
+        return -1
+    return 0
+
+
+def compare_results(args):
+    """2つの結果ファイルを比べ、しきい値を超えて悪化した指標があれば終了コード1"""
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    base_flat = flatten_metrics(base.get('results', base))
+    new_flat = flatten_metrics(new.get('results', new))
+
+    rows = []
+    for path in sorted(base_flat.keys() & new_flat.keys()):
+        direction = metric_direction(path)
+        old, cur = base_flat[path], new_flat[path]
+        if direction == 0 or old == 0:
+            continue
+        change = (cur - old) / abs(old)
+        regressed = direction * change < -args.threshold
+        rows.append({'metric': path, 'base': old, 'new': cur, 'change': round(change, 4), 'regressed': regressed})
+
+    print(f"\n=== 比較: {base.get('label') or args.base} → {new.get('label') or args.new} "
+          f"（しきい値 {args.threshold:.0%}） ===")
+    for r in rows:
+        mark = '悪化' if r['regressed'] else ''
+        print(f"  {r['metric']:50s} {r['base']:12.3f} → {r['new']:12.3f} ({r['change']:+.1%}) {mark}")
+    regressions = [r for r in rows if r['regressed']]
+    print(f"\n悪化: {len(regressions)}件 / 比較: {len(rows)}件")
+    return {'comparison': rows, 'regressions': len(regressions)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('backends', help='実行バックエンド（process/thread）の比較')
+    p.add_argument('--lines', type=int, default=200, help='使用するテキスト行数')
+    p.add_argument('--fonts', type=int, default=7, help='使用するフォント数')
+    p.add_argument('--workers', type=int, default=None, help='ワーカー数（省略時はバックエンドごとのデフォルト）')
+    p.add_argument('--backends', nargs='+', default=['process', 'thread'])
+    p.add_argument('--output', help='結果を保存するJSONファイル')
+    p.set_defaults(func=bench_backends)
+
+    p = subparsers.add_parser('renderers', help='text2imageとPillowレンダラーの比較（速度・BOXの一致）')
+    p.add_argument('--lines', type=int, default=100, help='使用するテキスト行数')
+    p.add_argument('--fonts', type=int, default=7, help='使用するフォント数')
+    p.add_argument('--workers', type=int, default=None, help='ワーカー数')
+    p.add_argument('--output', help='結果を保存するJSONファイル')
+    p.set_defaults(func=bench_renderers)
+
+    p = subparsers.add_parser('postprocess', help='切り詰め・圧縮の前後の比較（出力サイズ・lstm.train生成時間）')
+    p.add_argument('--lines', type=int, default=100, help='使用するテキスト行数')
+    p.add_argument('--fonts', type=int, default=7, help='使用するフォント数')
+    p.add_argument('--workers', type=int, default=None, help='ワーカー数')
+    p.add_argument('--margin', type=int, default=gen.AUTOCROP_MARGIN, help='切り詰め時の余白（ピクセル）')
+    p.add_argument('--compression', default=gen.TIFF_COMPRESSION, help='TIFF圧縮（group4 / tiff_lzw）')
+    p.add_argument('--output', help='結果を保存するJSONファイル')
+    p.set_defaults(func=bench_postprocess)
+
+    p = subparsers.add_parser('augment', help='描画と画像拡張（派生サンプル）の枚数/秒の比較')
+    p.add_argument('--lines', type=int, default=100, help='使用するテキスト行数')
+    p.add_argument('--fonts', type=int, default=2, help='使用するフォント数')
+    p.add_argument('--variants', type=int, default=4, help='1枚あたりの派生サンプル数')
+    p.add_argument('--output', help='結果を保存するJSONファイル')
+    p.set_defaults(func=bench_augment)
+
+    def add_suite_args(p, expansion=True, scheduler=True, e2e=True):
+        if expansion:
+            p.add_argument('--lines', type=int, default=20000, help='生成関数ごとの生成行数（e2eでは描画する行数）')
+        if scheduler:
+            p.add_argument('--tasks', type=int, default=2000, help='スケジューラーに流すタスク数')
+            p.add_argument('--sleep-ms', type=float, default=20, help='偽のtext2imageが待つ時間（ミリ秒）')
+            p.add_argument('--bytes', type=int, default=100000, help='偽のtext2imageが書く.tifのサイズ')
+            p.add_argument('--backends', nargs='+', default=['process', 'thread'])
+        if e2e and not expansion:
+            p.add_argument('--lines', type=int, default=50, help='描画する行数')
+        p.add_argument('--fonts', type=int, default=2, help='使用するフォント数')
+        p.add_argument('--workers', type=int, default=None, help='ワーカー数')
+        p.add_argument('--label', help='結果に付けるラベル（省略時はgitのコミット）')
+        p.add_argument('--output', help='結果を保存するJSONファイル')
+
+    p = subparsers.add_parser('expansion', help='コーパス拡張の生成関数・書き出しの行/秒')
+    add_suite_args(p, scheduler=False, e2e=False)
+    p.set_defaults(func=bench_expansion)
+
+    p = subparsers.add_parser('scheduler', help='偽のtext2imageでのスケジューラーのタスク/秒とメモリ')
+    add_suite_args(p, expansion=False, e2e=False)
+    p.set_defaults(func=bench_scheduler)
+
+    p = subparsers.add_parser('e2e', help='実際のtext2imageでの描画枚数/秒（無ければ省略）')
+    add_suite_args(p, expansion=False, scheduler=False)
+    p.set_defaults(func=bench_e2e)
+
+    p = subparsers.add_parser('convergence', help='トレーニングリストの並び順ごとの目標誤り率までのイテレーション数')
+    p.add_argument('--list', help='元のトレーニングリスト（省略時は training_files.txt）')
+    p.add_argument('--orders', nargs='+', default=['sorted', 'interleave', 'curriculum'],
+                   choices=build_training_list.ORDERS)
+    p.add_argument('--target-error', type=float, default=10.0, help='目標のBCER（%%）')
+    p.add_argument('--max-iterations', type=int, default=5000, help='並び順ごとのイテレーション数の上限')
+    p.add_argument('--seed', type=int, default=0, help='並び替えのシード値')
+    p.add_argument('--label', help='結果に付けるラベル（省略時はgitのコミット）')
+    p.add_argument('--output', help='結果を保存するJSONファイル')
+    p.set_defaults(func=bench_convergence)
+
+    p = subparsers.add_parser('suite', help='expansion・scheduler・e2eをまとめて実行')
+    add_suite_args(p)
+    p.set_defaults(func=bench_suite)
+
+    p = subparsers.add_parser('compare', help='2つの結果ファイルを比較して悪化を検出')
+    p.add_argument('base', help='基準の結果ファイル')
+    p.add_argument('new', help='比較する結果ファイル')
+    p.add_argument('--threshold', type=float, default=0.1, help='悪化とみなす変化率（既定: 10%%）')
+    p.add_argument('--output', help='比較結果を保存するJSONファイル')
+    p.set_defaults(func=compare_results)
+
+    args = parser.parse_args()
+    results = args.func(args)
+
+    if args.output:
+        if args.command != 'compare':
+            results = {
+                'command': args.command,
+                'label': getattr(args, 'label', None) or git_revision(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'cpus': gen.available_cpus(),
+                'results': results,
+            }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"結果を保存しました: {args.output}")
+
+    if args.command == 'compare' and results['regressions']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+.box / .lstmf ファイルを並列・差分生成し、training_files.txt を作成するスクリプト
+
+入力（.tif と .box）のハッシュをマニフェストに記録し、
+入力が変わったもの・途中で止まったもの・失敗したものだけを作り直す。
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from autoscale import available_cpus
+
+# 設定
+DATA_DIR = "/workspace/data"
+OUTPUT_DIR = "/workspace/output"
+START_MODEL = "jpn"
+MANIFEST_FILE = os.path.join(DATA_DIR, "lstmf_manifest.json")
+TRAINING_LIST_FILE = os.path.join(OUTPUT_DIR, "training_files.txt")
+
+# 途中で止まっても進捗が残るよう、この件数ごとにマニフェストを保存
+MANIFEST_SAVE_INTERVAL = 200
+
+
+def load_manifest():
+    """マニフェストを読み込む（無い・壊れている場合は空）"""
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest):
+    """マニフェストを書き出す（一時ファイル経由で置き換え）"""
+    tmp_file = MANIFEST_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+
+def hash_inputs(*paths):
+    """入力ファイルの内容ハッシュ"""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def is_up_to_date(entry, input_hash, lstmf):
+    """前回の生成結果がそのまま使えるか"""
+    return (
+        entry is not None
+        and entry.get('status') == 0
+        and entry.get('input_hash') == input_hash
+        and os.path.exists(lstmf)
+        and os.path.getsize(lstmf) == entry.get('size')
+    )
+
+
+def run_tesseract(tif, base, config):
+    """tesseractを実行して (終了コード, エラー出力) を返す"""
+    cmd = ['tesseract', tif, base, '-l', START_MODEL, '--psm', '6', config]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return result.returncode, result.stderr
+
+
+def process_sample(args):
+    """1サンプル分の .box と .lstmf を必要なら生成（並列処理用）"""
+    tif, entry = args
+    base = tif[:-len('.tif')]
+    box = base + '.box'
+    lstmf = base + '.lstmf'
+
+    # text2imageの出力には.boxがあるが、無ければmakeboxで作る
+    if not os.path.exists(box):
+        status, error = run_tesseract(tif, base, 'makebox')
+        if status != 0:
+            return tif, {'status': status, 'error': error.strip()[-500:], 'timestamp': time.time()}, False
+
+    input_hash = hash_inputs(tif, box)
+    if is_up_to_date(entry, input_hash, lstmf):
+        return tif, entry, True
+
+    # 途中で止まった古い出力を残さない
+    if os.path.exists(lstmf):
+        os.unlink(lstmf)
+
+    status, error = run_tesseract(tif, base, 'lstm.train')
+    if status == 0 and not os.path.exists(lstmf):
+        status, error = -1, 'lstmf was not written'
+
+    result = {
+        'input_hash': input_hash,
+        'output': lstmf,
+        'size': os.path.getsize(lstmf) if status == 0 else None,
+        'status': status,
+        'timestamp': time.time(),
+    }
+    if status != 0:
+        result['error'] = error.strip()[-500:]
+    return tif, result, False
+
+
+def build_lstmf(parallel_jobs=None):
+    """全ての.tifについて.lstmfを差分生成し、training_files.txtを書く"""
+    if parallel_jobs is None:
+        parallel_jobs = int(os.environ.get('PARALLEL_JOBS') or available_cpus())
+    parallel_jobs = max(1, parallel_jobs)
+
+    tifs = sorted(entry.path for entry in os.scandir(DATA_DIR) if entry.name.endswith('.tif'))
+    manifest = load_manifest()
+    print(f"対象ファイル数: {len(tifs)}（並列ジョブ数: {parallel_jobs}）", flush=True)
+
+    built = skipped = failed = 0
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=parallel_jobs) as executor:
+        tasks = ((tif, manifest.get(os.path.basename(tif))) for tif in tifs)
+        for completed, (tif, entry, up_to_date) in enumerate(executor.map(process_sample, tasks), 1):
+            manifest[os.path.basename(tif)] = entry
+            if up_to_date:
+                skipped += 1
+            elif entry['status'] == 0:
+                built += 1
+            else:
+                failed += 1
+                if failed <= 5:  # 最初の5件のみ表示
+                    print(f"  失敗: {os.path.basename(tif)}: {entry.get('error', '')}", flush=True)
+
+            if completed % MANIFEST_SAVE_INTERVAL == 0 or completed == len(tifs):
+                save_manifest(manifest)
+                elapsed = time.time() - start_time
+                print(f"進捗: {completed}/{len(tifs)} | 生成: {built}, 最新: {skipped}, 失敗: {failed} "
+                      f"| {elapsed:.0f}秒", flush=True)
+
+    # 消えた.tifのエントリは落とす
+    names = {os.path.basename(tif) for tif in tifs}
+    for name in list(manifest):
+        if name not in names:
+            del manifest[name]
+    save_manifest(manifest)
+
+    # トレーニングリストの作成
+    lstmfs = sorted(entry['output'] for entry in manifest.values() if entry.get('status') == 0)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with open(TRAINING_LIST_FILE, 'w', encoding='utf-8') as f:
+        f.writelines(path + '\n' for path in lstmfs)
+
+    print(f"トレーニングリストを作成しました: {TRAINING_LIST_FILE}（{len(lstmfs)}件）")
+    return built, skipped, failed
+
+
+def main():
+    """メイン処理"""
+    print("=== .box / .lstmf ファイルの生成 ===\n")
+    built, skipped, failed = build_lstmf()
+    print(f"\n生成: {built}件, 最新のためスキップ: {skipped}件, 失敗: {failed}件")
+
+
+if __name__ == "__main__":
+    main()
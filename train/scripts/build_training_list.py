@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+training_files.txt の並び順を作り直すスクリプト
+
+lstmtraining はリストの順に1件ずつ学習するので、画像番号順のままだと同じテキストの全フォント分が連続し、
+カテゴリの偏りも拡張時のシャッフル次第になる。
+サンプルごとのカテゴリとフォント（生成時のサンプル一覧、無ければ .box の文面から判定）で層に分け、
+シード値で決まる順に層を均等に混ぜて並べる。
+
+並び順（TRAINING_ORDER）:
+  interleave: カテゴリ × フォントの層を均等に混ぜる（デフォルト）
+  curriculum: 短い行から長い行へ CURRICULUM_STAGES 段階に分け、各段階の中で層を混ぜる
+  sorted:     ファイル名順（従来どおり）
+WEIGHT_BY_ERROR=1 で評価レポート（eval_report.json）の文字誤り率が高いカテゴリ・フォントのサンプルを
+最大 MAX_WEIGHT 倍まで繰り返して入れる。
+
+使い方:
+  python3 scripts/build_training_list.py
+"""
+
+import json
+import os
+import random
+import re
+from collections import Counter, defaultdict
+
+from corpus_utils import classify_text
+from sample_manifest import DEFAULT_MANIFEST_DIR, load_manifest
+from tess_box import read_box_file, box_text
+
+# 設定
+OUTPUT_DIR = "/workspace/output"
+TRAINING_LIST_FILE = os.path.join(OUTPUT_DIR, "training_files.txt")
+MANIFEST_DIR = os.environ.get('MANIFEST_DIR', DEFAULT_MANIFEST_DIR)
+EVAL_REPORT_FILE = os.path.join(OUTPUT_DIR, "eval", "eval_report.json")
+
+TRAINING_ORDER = os.environ.get('TRAINING_ORDER', 'interleave')
+TRAINING_ORDER_SEED = int(os.environ.get('TRAINING_ORDER_SEED', '0'))
+CURRICULUM_STAGES = int(os.environ.get('CURRICULUM_STAGES', '3'))
+WEIGHT_BY_ERROR = os.environ.get('WEIGHT_BY_ERROR', '0') == '1'
+MAX_WEIGHT = float(os.environ.get('MAX_WEIGHT', '3'))
+
+ORDERS = ('interleave', 'curriculum', 'sorted')
+
+SAMPLE_RE = re.compile(r'\.train_(\d+)(?:_aug\d+)?\.lstmf$')
+
+
+def sample_index(lstmf):
+    """ファイル名から画像番号を取り出す（派生サンプルは元のサンプルの番号）"""
+    match = SAMPLE_RE.search(lstmf)
+    return int(match.group(1)) if match else None
+
+
+def load_sample_info(manifest_dir=MANIFEST_DIR):
+    """生成時のサンプル一覧（sample_manifest.py）から 画像番号 → (フォント, カテゴリ, 文字数) を読む（無ければ空）"""
+    return {
+        index: (sample['font'], sample['category'], sample['length'])
+        for index, sample in load_manifest(manifest_dir).items()
+    }
+
+
+def describe_samples(lstmfs, info):
+    """各 .lstmf のカテゴリ・フォント・文字数（一覧に無ければ .box の文面から判定）"""
+    samples = []
+    for lstmf in lstmfs:
+        index = sample_index(lstmf)
+        if index in info:
+            font_name, category, length = info[index]
+        else:
+            box_file = lstmf[:-len('.lstmf')] + '.box'
+            text = box_text(read_box_file(box_file)) if os.path.exists(box_file) else ''
+            font_name, category, length = 'unknown', classify_text(text), len(text)
+        samples.append({'path': lstmf, 'font': font_name, 'category': category, 'length': length})
+    return samples
+
+
+def interleave(samples, rng):
+    """
+    カテゴリ × フォントの層を均等に混ぜて並べる
+
+    層の中をシャッフルし、n件の層のk番目に (k + 乱数) / n の位置を割り当てて全体を並べ替える。
+    どの区間を切り出しても各層がほぼ件数の比率どおりに現れる。
+    """
+    strata = defaultdict(list)
+    for sample in samples:
+        strata[(sample['category'], sample['font'])].append(sample)
+
+    keyed = []
+    for members in strata.values():
+        rng.shuffle(members)
+        count = len(members)
+        keyed.extend(((k + rng.random()) / count, sample) for k, sample in enumerate(members))
+    keyed.sort(key=lambda item: item[0])
+    return [sample for _, sample in keyed]
+
+
+def curriculum(samples, rng, stages=CURRICULUM_STAGES):
+    """文字数の短い順に stages 段階に分け、各段階の中で層を混ぜてつなげる"""
+    by_length = sorted(samples, key=lambda sample: sample['length'])
+    stages = max(1, min(stages, len(by_length)))
+    ordered = []
+    for stage in range(stages):
+        start = stage * len(by_length) // stages
+        end = (stage + 1) * len(by_length) // stages
+        ordered.extend(interleave(by_length[start:end], rng))
+    return ordered
+
+
+def error_weights(report_file=EVAL_REPORT_FILE, max_weight=MAX_WEIGHT):
+    """
+    評価レポートからカテゴリ・フォントごとの重み（全体の文字誤り率に対する比, 1〜max_weight）を作る
+
+    レポートが無ければ None。
+    """
+    if not os.path.exists(report_file):
+        return None
+    with open(report_file, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    entry = report['models'][report['candidate']]
+    overall = entry['all'].get('cer')
+    if not overall:
+        return None
+
+    weights = {}
+    for kind in ('category', 'font'):
+        for name, summary in entry[kind].items():
+            if summary.get('cer') is not None:
+                weights[(kind, name)] = min(max_weight, max(1.0, summary['cer'] / overall))
+    return weights
+
+
+def apply_weights(samples, weights, rng, max_weight=MAX_WEIGHT):
+    """重み（カテゴリとフォントの積）の分だけサンプルを繰り返す（端数は確率的に切り上げ）"""
+    weighted = []
+    for sample in samples:
+        weight = weights.get(('category', sample['category']), 1.0) * weights.get(('font', sample['font']), 1.0)
+        weight = min(max_weight, weight)
+        copies = int(weight) + (rng.random() < weight - int(weight))
+        weighted.extend([sample] * copies)
+    return weighted
+
+
+def build_order(samples, order=TRAINING_ORDER, seed=TRAINING_ORDER_SEED, weights=None):
+    """並び順に従って .lstmf のパスのリストを作る"""
+    if order not in ORDERS:
+        raise ValueError(f"unknown TRAINING_ORDER: {order}")
+    rng = random.Random(seed)
+    if weights:
+        samples = apply_weights(samples, weights, rng)
+    if order == 'sorted':
+        ordered = sorted(samples, key=lambda sample: sample['path'])
+    elif order == 'curriculum':
+        ordered = curriculum(samples, rng)
+    else:
+        ordered = interleave(samples, rng)
+    return [sample['path'] for sample in ordered]
+
+
+def main():
+    """メイン処理"""
+    print(f"=== トレーニングリストの並び替え（{TRAINING_ORDER}, シード値: {TRAINING_ORDER_SEED}） ===")
+    with open(TRAINING_LIST_FILE, 'r', encoding='utf-8') as f:
+        lstmfs = [line.strip() for line in f if line.strip()]
+
+    info = load_sample_info()
+    samples = describe_samples(lstmfs, info)
+    print(f"サンプル数: {len(samples)}（一覧から判定: {sum(1 for s in lstmfs if sample_index(s) in info)}件）")
+
+    weights = None
+    if WEIGHT_BY_ERROR:
+        weights = error_weights()
+        if weights is None:
+            print(f"注意: {EVAL_REPORT_FILE} が無いため重み付けは行いません")
+        else:
+            for (kind, name), weight in sorted(weights.items()):
+                if weight > 1.0:
+                    print(f"  重み {kind}/{name}: {weight:.2f}")
+
+    paths = build_order(samples, weights=weights)
+    tmp_file = TRAINING_LIST_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.writelines(path + '\n' for path in paths)
+    os.replace(tmp_file, TRAINING_LIST_FILE)
+
+    categories = Counter(sample['category'] for sample in samples)
+    print("カテゴリ: " + ', '.join(f"{name} {count}" for name, count in categories.most_common()))
+    print(f"トレーニングリストを書き出しました: {TRAINING_LIST_FILE}（{len(paths)}件）")
+
+
+if __name__ == "__main__":
+    main()
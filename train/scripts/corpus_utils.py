@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+トレーニングテキストに関する共通処理
+"""
+
+import os
+import re
+import zlib
+
+# expand_training_texts.py の生成カテゴリ（mixed は1行ずつに分かれるので name/address になる）
+CATEGORIES = ['address', 'postal_address', 'name', 'company', 'phone', 'date', 'other']
+
+# 評価用に学習から外す行の割合（%）。行の内容から決めるので、コーパスの並びや件数が変わっても同じ行が外れる
+HOLDOUT_PERCENT = int(os.environ.get('HOLDOUT_PERCENT', '5'))
+
+_POSTAL = re.compile(r'〒\s*\d{3}-\d{4}')
+_PHONE = re.compile(r'(電話番号|TEL)?[:：]?\s*\d{2,4}-\d{4}-\d{4}$')
+_DATE = re.compile(r'((令和|平成|昭和|大正)?\d{1,4}年\d{1,2}月\d{1,2}日|\d{4}[/.]\d{1,2}[/.]\d{1,2})$')
+_COMPANY = re.compile(r'(株式会社|有限会社|合同会社|一般社団法人)')
+_ADDRESS = re.compile(r'(都|道|府|県).*(市|区|町|村).*\d')
+_NAME = re.compile(r'^[^\d\s]{1,4}\s?[^\d\s]{1,3}(\s?様)?$')
+
+
+def classify_text(text):
+    """テキスト1行のカテゴリを推定（生成元が分からない行にも使えるよう文面から判定）"""
+    text = text.strip()
+    if _POSTAL.search(text):
+        return 'postal_address'
+    if _PHONE.match(text):
+        return 'phone'
+    if _DATE.match(text):
+        return 'date'
+    if _COMPANY.search(text):
+        return 'company'
+    if _ADDRESS.search(text):
+        return 'address'
+    if _NAME.match(text):
+        return 'name'
+    return 'other'
+
+
+def is_holdout(text):
+    """評価用（学習に使わない）行かどうか"""
+    return zlib.crc32(text.strip().encode('utf-8')) % 100 < HOLDOUT_PERCENT
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+学習済みモデルの精度（文字誤り率）と認識時間の評価
+
+training_texts_expanded.txt のうち学習に使わない行（corpus_utils.is_holdout）を描画し、
+ベースモデルとカスタムモデルで並列に認識して、カテゴリ別・フォント別に比較する。
+カスタムモデルの文字誤り率がベースモデルより --min-improvement 以上良くなければ終了コード1を返す。
+
+使い方:
+  python3 scripts/evaluate_model.py
+  python3 scripts/evaluate_model.py --models jpn jpn_custom --max-lines 300 --min-improvement 0.01
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import generate_training_data as gen
+from corpus_utils import classify_text
+from pipeline_metrics import summarize
+
+TESSDATA_DIR = "/usr/local/share/tessdata"
+MODEL_DIR = "/workspace/output"
+EVAL_DIR = "/workspace/output/eval"
+
+
+def normalize_for_cer(text):
+    """比較用の正規化（全角/半角の揺れと空白を無視）"""
+    return ''.join(unicodedata.normalize('NFKC', text).split())
+
+
+def edit_distances(refs, hyps):
+    """
+    文字列の組ごとのレーベンシュタイン距離をまとめて計算
+
+    全ての組を同じ長さに詰めた配列で、正解の1文字ごとにDPの1行を一括で更新する。
+    行内の挿入の連鎖は D[j] = j + cummin(tmp[k] - k) で求めるので、Pythonのループは正解の長さ分だけ。
+    """
+    count = len(refs)
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    ref_lens = np.array([len(r) for r in refs])
+    hyp_lens = np.array([len(h) for h in hyps])
+    max_ref, max_hyp = int(ref_lens.max()), int(hyp_lens.max())
+
+    # 詰め物は正解側と認識結果側で別の値にして一致させない
+    ref_codes = np.full((count, max_ref), -1, dtype=np.int64)
+    hyp_codes = np.full((count, max_hyp), -2, dtype=np.int64)
+    for i, (ref, hyp) in enumerate(zip(refs, hyps)):
+        ref_codes[i, :len(ref)] = [ord(c) for c in ref]
+        hyp_codes[i, :len(hyp)] = [ord(c) for c in hyp]
+
+    positions = np.arange(max_hyp + 1)
+    row = np.broadcast_to(positions, (count, max_hyp + 1)).copy()
+    result = row[np.arange(count), hyp_lens].copy()  # 正解が空の場合
+
+    for i in range(1, max_ref + 1):
+        cost = (hyp_codes != ref_codes[:, i - 1:i]).astype(np.int64)
+        tmp = np.empty_like(row)
+        tmp[:, 0] = i
+        tmp[:, 1:] = np.minimum(row[:, 1:] + 1, row[:, :-1] + cost)
+        row = positions + np.minimum.accumulate(tmp - positions, axis=1)
+        finished = ref_lens == i
+        result[finished] = row[finished, hyp_lens[finished]]
+
+    return result
+
+
+def model_tessdata_dir(model):
+    """モデルのあるtessdataディレクトリ（学習の出力先にあればそちらを優先）"""
+    if os.path.exists(os.path.join(MODEL_DIR, f"{model}.traineddata")):
+        return MODEL_DIR
+    return TESSDATA_DIR
+
+
+def recognize(image_path, model, tessdata_dir):
+    """1枚を認識して (認識結果, 秒数) を返す"""
+    env = dict(os.environ, OMP_THREAD_LIMIT='1')
+    started = time.perf_counter()
+    result = subprocess.run(
+        ['tesseract', image_path, 'stdout', '--tessdata-dir', tessdata_dir, '-l', model, '--psm', '7'],
+        capture_output=True, text=True, env=env,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        return None, elapsed
+    return result.stdout.strip(), elapsed
+
+
+def render_holdout(texts, fonts, image_dir, workers):
+    """評価用の行を描画し、(画像パス, テキスト, フォント) のリストを返す"""
+    gen.OUTPUT_DIR = image_dir
+    gen.METRICS_DIR = ''
+    gen.JOB_QUEUE = False
+    gen.OUTPUT_FORMAT = 'files'
+    gen.AUGMENT_VARIANTS = 0
+    gen.generate_training_data_with_text2image(texts, fonts, max_workers=workers)
+
+    samples = []
+    for text, font_name, image_index in gen.iter_samples(texts, fonts):
+        image_path = os.path.join(image_dir, gen.sample_base_name(image_index) + '.tif')
+        if os.path.exists(image_path):
+            samples.append((image_path, text, font_name))
+    return samples
+
+
+def cer_summary(rows):
+    """行のリストから文字誤り率・認識時間の集計を作る"""
+    errors = sum(r['distance'] for r in rows)
+    chars = sum(r['ref_len'] for r in rows)
+    return {
+        'samples': len(rows),
+        'failed': sum(1 for r in rows if r['failed']),
+        'cer': round(errors / chars, 4) if chars else None,
+        'exact_match': round(sum(1 for r in rows if r['distance'] == 0) / len(rows), 4) if rows else None,
+        'latency_sec': summarize([r['latency_sec'] for r in rows]),
+    }
+
+
+def evaluate(samples, models, workers, tessdata_dirs=None):
+    """全モデルで全サンプルを並列に認識し、サンプルごとの結果を返す（tessdata_dirs でモデルの置き場所を指定できる）"""
+    tessdata_dirs = tessdata_dirs or {}
+    jobs = [(model, tessdata_dirs.get(model) or model_tessdata_dir(model), sample)
+            for model in models for sample in samples]
+
+    def run(job):
+        model, tessdata_dir, (image_path, text, font_name) = job
+        hyp, latency = recognize(image_path, model, tessdata_dir)
+        return model, image_path, text, font_name, hyp, latency
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outputs = list(executor.map(run, jobs))
+
+    refs = [normalize_for_cer(o[2]) for o in outputs]
+    hyps = [normalize_for_cer(o[4] or '') for o in outputs]
+    distances = edit_distances(refs, hyps)
+
+    rows = []
+    for (model, image_path, text, font_name, hyp, latency), ref, distance in zip(outputs, refs, distances):
+        rows.append({
+            'model': model,
+            'image': os.path.basename(image_path),
+            'font': font_name,
+            'category': classify_text(text),
+            'text': text,
+            'recognized': hyp or '',
+            'failed': hyp is None,
+            'ref_len': len(ref),
+            'distance': int(distance),
+            'latency_sec': round(latency, 4),
+        })
+    return rows
+
+
+def build_report(rows, models):
+    """モデルごとに全体・カテゴリ別・フォント別の集計を作る"""
+    report = {}
+    for model in models:
+        model_rows = [r for r in rows if r['model'] == model]
+        entry = {'all': cer_summary(model_rows), 'category': {}, 'font': {}}
+        for kind in ('category', 'font'):
+            for name, group in itertools.groupby(sorted(model_rows, key=lambda r: r[kind]), key=lambda r: r[kind]):
+                entry[kind][name] = cer_summary(list(group))
+        report[model] = entry
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=['jpn', gen.MODEL_NAME],
+                        help='比較するモデル（先頭がベースライン、最後が評価対象）')
+    parser.add_argument('--max-lines', type=int, default=300, help='評価に使う行数の上限')
+    parser.add_argument('--fonts', type=int, default=None, help='使用するフォント数（省略時は全て）')
+    parser.add_argument('--workers', type=int, default=None, help='並列数（省略時は使用可能なCPU数）')
+    parser.add_argument('--min-improvement', type=float, default=0.0,
+                        help='採用に必要な文字誤り率の改善幅（ベースライン − 評価対象）')
+    parser.add_argument('--output-dir', default=EVAL_DIR, help='レポートの出力先')
+    args = parser.parse_args()
+
+    workers = args.workers or gen.available_cpus()
+    texts = list(itertools.islice(gen.iter_training_texts(holdout=True), args.max_lines))
+    if not texts:
+        print("エラー: 評価用の行がありません（HOLDOUT_PERCENTを確認してください）")
+        sys.exit(1)
+    fonts = gen.get_available_fonts()[:args.fonts]
+
+    print(f"\n=== 評価用の行を描画（{len(texts)}行 × {len(fonts)}フォント） ===")
+    samples = render_holdout(texts, fonts, os.path.join(args.output_dir, 'images'), workers)
+
+    print(f"\n=== 認識（{', '.join(args.models)}, 並列数: {workers}） ===", flush=True)
+    started = time.perf_counter()
+    rows = evaluate(samples, args.models, workers)
+    print(f"{len(rows)}件を{time.perf_counter() - started:.1f}秒で認識しました")
+
+    report = build_report(rows, args.models)
+    baseline, candidate = args.models[0], args.models[-1]
+    base_cer = report[baseline]['all']['cer']
+    cand_cer = report[candidate]['all']['cer']
+    passed = base_cer is not None and cand_cer is not None and base_cer - cand_cer >= args.min_improvement
+    report_file = os.path.join(args.output_dir, 'eval_report.json')
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump({'models': report, 'baseline': baseline, 'candidate': candidate,
+                   'min_improvement': args.min_improvement, 'passed': passed},
+                  f, ensure_ascii=False, indent=2)
+    with open(os.path.join(args.output_dir, 'eval_samples.csv'), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ['model'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print("\n=== 文字誤り率（CER） ===")
+    print(f"  {'':20s} " + ' '.join(f"{m:>12s}" for m in args.models))
+    for kind in ('all', 'category', 'font'):
+        groups = [('全体', {m: report[m]['all'] for m in args.models})] if kind == 'all' else [
+            (name, {m: report[m][kind].get(name, {}) for m in args.models})
+            for name in sorted({name for m in args.models for name in report[m][kind]})
+        ]
+        for name, entries in groups:
+            cells = ' '.join(
+                f"{entries[m]['cer']:12.4f}" if entries[m].get('cer') is not None else f"{'-':>12s}"
+                for m in args.models)
+            print(f"  {name:20s} {cells}")
+    print("\n=== 認識時間（秒/枚） ===")
+    for m in args.models:
+        latency = report[m]['all']['latency_sec']
+        if latency['count']:
+            print(f"  {m:20s} p50: {latency['p50']:.3f} p95: {latency['p95']:.3f} p99: {latency['p99']:.3f}")
+
+    print(f"\nレポート: {report_file}")
+    print(f"判定: {'採用' if passed else '不採用'}（{candidate}: {cand_cer} / {baseline}: {base_cer}）")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
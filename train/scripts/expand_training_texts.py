@@ -4,8 +4,44 @@
 training_texts.txt を拡張して、より多くのトレーニングテキストを生成
 """
 
+import hashlib
+import heapq
+import os
 import random
 import itertools
+from collections import Counter
+
+# 生成エンジン
+#   random: 標準ライブラリのrandomで1件ずつ生成（従来方式）
+#   numpy:  fast_corpus.py で乱数を一括生成（大量生成向け）
+ENGINE = os.environ.get('EXPAND_ENGINE', 'random')
+# 乱数シード（指定すると同じ内容のコーパスを再生成できる）
+SEED = int(os.environ['EXPAND_SEED']) if os.environ.get('EXPAND_SEED') else None
+# 生成件数の倍率
+SCALE = float(os.environ.get('EXPAND_SCALE', '1'))
+
+# 文字カバレッジ重視モード: 各文字の目標出現回数（0で無効）
+COVERAGE_TARGET = int(os.environ.get('EXPAND_COVERAGE_TARGET', '0'))
+# カバレッジ重視モードで候補として生成する件数の倍率
+COVERAGE_OVERSAMPLE = float(os.environ.get('EXPAND_COVERAGE_OVERSAMPLE', '5'))
+
+# 弱点文字モード: 誤認識しやすい文字（EXPAND_TARGET_CHARS）または混同ペアのファイル（EXPAND_TARGET_FILE）を
+# 受け取り、その文字を含む行だけを EXPAND_TARGET_LINES 行生成して TARGETED_TEXT_FILE に書き出す
+TARGET_CHARS = os.environ.get('EXPAND_TARGET_CHARS', '')
+TARGET_FILE = os.environ.get('EXPAND_TARGET_FILE', '')
+TARGET_LINES = int(os.environ.get('EXPAND_TARGET_LINES', '1000'))
+
+SOURCE_TEXT_FILE = '/workspace/source/training_texts.txt'
+OUTPUT_TEXT_FILE = '/workspace/source/training_texts_expanded.txt'
+TARGETED_TEXT_FILE = '/workspace/source/training_texts_targeted.txt'
+
+# 生成器から一度に取り出す件数・ファイルへ一度に書き出す行数
+CHUNK_SIZE = 10000
+
+# 全角ASCII（0xFF01-0xFF5E）と全角スペースを半角に変換するテーブル（モデルの文字セット対応）
+FULLWIDTH_TABLE = str.maketrans(
+    {chr(code): chr(code - 0xFEE0) for code in range(0xFF01, 0xFF5F)} | {'　': ' '}
+)
 
 # 都道府県
 PREFECTURES = [
@@ -114,6 +150,14 @@ CITY_WARDS = [
     "中央区", "東区", "西区", "南区", "北区",
 ]
 
+# 区を持つ政令指定都市（CITY_WARDS と組み合わせて使う）
+DESIGNATED_CITIES = [
+    "札幌市", "仙台市", "さいたま市", "千葉市", "横浜市", "川崎市",
+    "相模原市", "新潟市", "静岡市", "浜松市", "名古屋市", "京都市",
+    "大阪市", "堺市", "神戸市", "岡山市", "広島市", "北九州市",
+    "福岡市", "熊本市"
+]
+
 # 町名（住所認識精度向上のため大幅に拡充）
 TOWNS = [
     # 方角系
@@ -178,11 +222,7 @@ def generate_addresses(n=200):
             city = random.choice(CITIES)
         else:
             # 政令指定都市名 + 区名
-            base_cities = ["札幌市", "仙台市", "さいたま市", "千葉市", "横浜市", "川崎市",
-                          "相模原市", "新潟市", "静岡市", "浜松市", "名古屋市", "京都市",
-                          "大阪市", "堺市", "神戸市", "岡山市", "広島市", "北九州市",
-                          "福岡市", "熊本市"]
-            city = random.choice(base_cities) + random.choice(CITY_WARDS)
+            city = random.choice(DESIGNATED_CITIES) + random.choice(CITY_WARDS)
 
         town = random.choice(TOWNS)
         chome = random.randint(1, 10)
@@ -211,11 +251,8 @@ def generate_addresses_with_postal(n=100):
         if random.random() < 0.5:
             city = random.choice(CITIES)
         else:
-            base_cities = ["札幌市", "仙台市", "さいたま市", "千葉市", "横浜市", "川崎市",
-                          "相模原市", "新潟市", "静岡市", "浜松市", "名古屋市", "京都市",
-                          "大阪市", "堺市", "神戸市", "岡山市", "広島市", "北九州市",
-                          "福岡市", "熊本市"]
-            city = random.choice(base_cities) + random.choice(CITY_WARDS)
+            # 政令指定都市名 + 区名
+            city = random.choice(DESIGNATED_CITIES) + random.choice(CITY_WARDS)
 
         town = random.choice(TOWNS)
         chome = random.randint(1, 10)
@@ -356,11 +393,8 @@ def generate_mixed_texts(n=100):
         if random.random() < 0.5:
             city = random.choice(CITIES)
         else:
-            base_cities = ["札幌市", "仙台市", "さいたま市", "千葉市", "横浜市", "川崎市",
-                          "相模原市", "新潟市", "静岡市", "浜松市", "名古屋市", "京都市",
-                          "大阪市", "堺市", "神戸市", "岡山市", "広島市", "北九州市",
-                          "福岡市", "熊本市"]
-            city = random.choice(base_cities) + random.choice(CITY_WARDS)
+            # 政令指定都市名 + 区名
+            city = random.choice(DESIGNATED_CITIES) + random.choice(CITY_WARDS)
 
         town = random.choice(TOWNS)
         chome = random.randint(1, 10)
@@ -371,26 +405,40 @@ def generate_mixed_texts(n=100):
 
     return texts
 
-def main():
-    """メイン処理"""
-    print("トレーニングテキストを拡張中...")
-
-    all_texts = []
-
-    # 各種テキストを生成（サンプル数を大幅に増やす）
-    all_texts.extend(generate_addresses(500))        # 200 → 500
-    all_texts.extend(generate_addresses_with_postal(300))  # 100 → 300
-    all_texts.extend(generate_full_names(300))       # 100 → 300
-    all_texts.extend(generate_companies(200))        # 100 → 200
-    all_texts.extend(generate_phone_numbers(150))    # 50 → 150
-    all_texts.extend(generate_dates(150))            # 50 → 150
-    # all_texts.extend(generate_amounts(150))        # 価格は除外（¥記号のエンコードエラー）
-    all_texts.extend(generate_mixed_texts(300))      # 100 → 300
-
-    # 既存のtraining_texts.txtを読み込む（sourceフォルダから）
+# カテゴリごとの生成関数
+GENERATORS = {
+    'address': generate_addresses,
+    'postal_address': generate_addresses_with_postal,
+    'name': generate_full_names,
+    'company': generate_companies,
+    'phone': generate_phone_numbers,
+    'date': generate_dates,
+    'mixed': generate_mixed_texts,
+}
+
+# カテゴリごとの生成件数（サンプル数を大幅に増やす）
+# 価格（generate_amounts）は除外（¥記号のエンコードエラー）
+CATEGORY_COUNTS = {
+    'address': 500,         # 200 → 500
+    'postal_address': 300,  # 100 → 300
+    'name': 300,            # 100 → 300
+    'company': 200,         # 100 → 200
+    'phone': 150,           # 50 → 150
+    'date': 150,            # 50 → 150
+    'mixed': 300,           # 100 → 300
+}
+
+
+def normalize_text(text):
+    """全角ASCII文字と全角スペースを半角に変換"""
+    return text.translate(FULLWIDTH_TABLE)
+
+
+def load_existing_texts():
+    """既存のtraining_texts.txtを読み込む（sourceフォルダから）"""
     existing_texts = []
     try:
-        with open('/workspace/source/training_texts.txt', 'r', encoding='utf-8') as f:
+        with open(SOURCE_TEXT_FILE, 'r', encoding='utf-8') as f:
             for line in f:
                 line = line.strip()
                 if line and not line.startswith('#'):
@@ -398,37 +446,308 @@ def main():
         print(f"既存のテキスト: {len(existing_texts)}行")
     except FileNotFoundError:
         print("既存のtraining_texts.txtが見つかりません")
+    return existing_texts
+
+
+def iter_category(category, n, rng=None):
+    """カテゴリのテキストをCHUNK_SIZE件ずつ生成して1件ずつ流す（rng指定時はNumPyエンジン）"""
+    if rng is not None:
+        from fast_corpus import FAST_GENERATORS
+        generate = lambda size: FAST_GENERATORS[category](rng, size)
+    else:
+        generate = GENERATORS[category]
+
+    for start in range(0, n, CHUNK_SIZE):
+        yield from generate(min(CHUNK_SIZE, n - start))
+
+
+def iter_interleaved(streams, shuffle_rng):
+    """
+    複数のストリームを残り件数に比例した確率で混ぜ合わせる
+
+    各ストリームの中身が独立に生成されていれば、全件をメモリに載せてシャッフルしたのと同じ分布になる。
+    streams は (件数, イテレータ) のリスト。
+    """
+    remaining = [n for n, _ in streams]
+    iterators = [iter(it) for _, it in streams]
+    total = sum(remaining)
+    while total > 0:
+        r = shuffle_rng.random() * total
+        for i, n in enumerate(remaining):
+            if r < n:
+                break
+            r -= n
+        else:
+            i = max(range(len(remaining)), key=remaining.__getitem__)
+        remaining[i] -= 1
+        total -= 1
+        yield next(iterators[i])
+
+
+def iter_expanded_texts(existing_texts, counts):
+    """既存テキストと生成テキストをシャッフルしながら逐次生成"""
+    shuffle_rng = random.Random(SEED)
+    existing_texts = list(existing_texts)
+    shuffle_rng.shuffle(existing_texts)
+    streams = [(len(existing_texts), existing_texts)]
+
+    # 各種テキストを生成
+    if ENGINE == 'numpy':
+        import numpy as np
+        seeds = np.random.SeedSequence(SEED).spawn(len(counts))
+        for seed, (category, n) in zip(seeds, counts.items()):
+            streams.append((n, iter_category(category, n, np.random.default_rng(seed))))
+    else:
+        random.seed(SEED)
+        for category, n in counts.items():
+            streams.append((n, iter_category(category, n)))
+
+    yield from iter_interleaved(streams, shuffle_rng)
+
+
+def iter_unique(texts, stats):
+    """重複行を除く（メモリ節約のため8バイトのハッシュだけを保持）"""
+    seen = set()
+    for text in texts:
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+        if key in seen:
+            stats['duplicates'] += 1
+            continue
+        seen.add(key)
+        yield text
+
+
+def char_counts(text):
+    """カバレッジ計算用の文字数（空白・改行は数えない）"""
+    return Counter(c for c in text if not c.isspace())
+
+
+def coverage_gain(counts, need):
+    """その行を採用したときに目標に近づく文字数"""
+    return sum(min(n, need.get(c, 0)) for c, n in counts.items())
+
+
+def select_by_coverage(required, candidates, target):
+    """
+    各文字の出現回数がtargetに達するまで、不足している文字を最も多く含む行から貪欲に選ぶ
+
+    requiredは必ず採用する行。候補のうちrequiredと同じ行や重複した行は選ばない（行数を消費するだけなので）。
+    利得は行を選ぶごとに減る一方なので、ヒープに古い利得を残しておき、取り出した時点で再計算する（遅延評価の貪欲法）。
+    戻り値は (選んだ行, 目標に届かなかった文字 → 不足している回数)。
+    """
+    required_set = set(required)
+    candidates = [text for text in dict.fromkeys(candidates) if text not in required_set]
+
+    need = {}
+    candidate_counts = [char_counts(text) for text in candidates]
+    for counts in candidate_counts + [char_counts(text) for text in required]:
+        for c in counts:
+            need[c] = target
+
+    def take(counts):
+        for c, n in counts.items():
+            if need[c] > 0:
+                need[c] = max(0, need[c] - n)
+
+    selected = list(required)
+    for text in required:
+        take(char_counts(text))
+
+    heap = [(-coverage_gain(counts, need), i) for i, counts in enumerate(candidate_counts)]
+    heapq.heapify(heap)
+    while heap:
+        _, i = heapq.heappop(heap)
+        gain = coverage_gain(candidate_counts[i], need)
+        if gain <= 0:
+            continue
+        if heap and gain < -heap[0][0]:
+            heapq.heappush(heap, (-gain, i))
+            continue
+        selected.append(candidates[i])
+        take(candidate_counts[i])
+
+    shortfall = {c: n for c, n in need.items() if n > 0}
+    return selected, shortfall
+
+
+# 文字 → 構成要素の索引の対象（要素の種類 → 語のリスト）
+COMPONENT_LISTS = {
+    'prefecture': PREFECTURES,
+    'city': CITIES,
+    'designated_city': DESIGNATED_CITIES,
+    'ward': CITY_WARDS,
+    'town': TOWNS,
+    'surname': SURNAMES,
+    'given_name': GIVEN_NAMES,
+    'company_type': COMPANY_TYPES,
+    'company_prefix': COMPANY_PREFIXES,
+    'company_word': COMPANY_WORDS,
+}
+
+
+def build_char_index():
+    """文字から、その文字を含む (要素の種類, 語) のリストを引く索引を作る"""
+    index = {}
+    for kind, words in COMPONENT_LISTS.items():
+        for word in dict.fromkeys(words):
+            for char in set(word):
+                index.setdefault(char, []).append((kind, word))
+    return index
+
+
+def load_target_chars(chars, target_file):
+    """
+    弱点文字を集める（重複を除き、指定順を保つ）
+
+    ファイルは1行に文字列を1つ、または空白/タブ区切りの混同ペア（正解 誤認識）を書く。
+    混同ペアは両方の文字を対象にする。
+    """
+    targets = list(chars)
+    if target_file:
+        with open(target_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    targets.extend(''.join(line.split()))
+    return list(dict.fromkeys(c for c in targets if not c.isspace()))
+
+
+def compose_line(rng, kind, word):
+    """指定した要素に語を固定し、残りを乱数で埋めた1行を作る"""
+    if kind in ('surname', 'given_name'):
+        surname = word if kind == 'surname' else rng.choice(SURNAMES)
+        given = word if kind == 'given_name' else rng.choice(GIVEN_NAMES)
+        return rng.choice([f"{surname}　{given}", f"{surname}{given}", f"{surname}　{given}　様"])
+
+    if kind.startswith('company_'):
+        company_type = word if kind == 'company_type' else rng.choice(COMPANY_TYPES)
+        prefix = word if kind == 'company_prefix' else rng.choice(COMPANY_PREFIXES)
+        company_word = word if kind == 'company_word' else rng.choice(COMPANY_WORDS)
+        return f"{company_type}{prefix}{company_word}"
+
+    pref = word if kind == 'prefecture' else rng.choice(PREFECTURES)
+    if kind == 'city':
+        city = word
+    elif kind in ('designated_city', 'ward'):
+        city = (word if kind == 'designated_city' else rng.choice(DESIGNATED_CITIES)) + \
+               (word if kind == 'ward' else rng.choice(CITY_WARDS))
+    else:
+        city = rng.choice(CITIES)
+    town = word if kind == 'town' else rng.choice(TOWNS)
+    chome, banchi, go = rng.randint(1, 10), rng.randint(1, 50), rng.randint(1, 30)
+    return rng.choice([
+        f"{pref}{city}{town}{chome}丁目{banchi}番{go}号",
+        f"{pref}{city}{town}{chome}－{banchi}－{go}",
+        f"〒{rng.randint(100, 999):03d}-{rng.randint(0, 9999):04d}　{pref}{city}{town}{chome}－{banchi}－{go}",
+    ])
+
+
+def iter_targeted_texts(targets, index, n, rng):
+    """
+    弱点文字を順番に1文字ずつ選び、その文字を含む語を使った行を合計n行生成
+
+    どの弱点文字も同じくらいの行数になる。重複した行は作り直す（上限あり）。
+    """
+    reachable = [c for c in targets if c in index]
+    if not reachable:
+        return
+    seen = set()
+    produced = attempts = 0
+    while produced < n and attempts < n * 20:
+        char = reachable[attempts % len(reachable)]
+        attempts += 1
+        text = normalize_text(compose_line(rng, *rng.choice(index[char])))
+        if text in seen:
+            continue
+        seen.add(text)
+        produced += 1
+        yield text
+
+
+def write_texts(output_file, texts, total):
+    """テキストを正規化してCHUNK_SIZE行ずつまとめて書き出す"""
+    with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write("# 拡張されたトレーニングテキスト\n")
+        f.write(f"# 総行数: {total}\n\n")
 
-    # 結合してシャッフル
-    all_texts = existing_texts + all_texts
-    random.shuffle(all_texts)
+        chunk = []
+        for text in texts:
+            chunk.append(normalize_text(text))
+            if len(chunk) >= CHUNK_SIZE:
+                f.write('\n'.join(chunk) + '\n')
+                chunk = []
+        if chunk:
+            f.write('\n'.join(chunk) + '\n')
 
-    # 保存（sourceフォルダに保存）
-    output_file = '/workspace/source/training_texts_expanded.txt'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("# 拡張されたトレーニングテキスト\n")
-        f.write(f"# 総行数: {len(all_texts)}\n\n")
-
-        for text in all_texts:
-            # 全角ASCII文字を半角に変換（モデルの文字セット対応）
-            converted = ''
-            for char in text:
-                # 全角ASCII範囲（0xFF01-0xFF5E）を半角に変換
-                if 0xFF01 <= ord(char) <= 0xFF5E:
-                    converted += chr(ord(char) - 0xFEE0)
-                elif char == '　':  # 全角スペース
-                    converted += ' '
-                else:
-                    converted += char
-            f.write(converted + '\n')
+
+def main():
+    """メイン処理"""
+    if TARGET_CHARS or TARGET_FILE:
+        main_targeted()
+        return
+
+    print("トレーニングテキストを拡張中...")
+    print(f"エンジン: {ENGINE}, シード: {SEED}, 倍率: {SCALE}")
+
+    counts = {category: int(n * SCALE) for category, n in CATEGORY_COUNTS.items()}
+    existing_texts = load_existing_texts()
+    generated = sum(counts.values())
+    total = len(existing_texts) + generated
+
+    output_file = OUTPUT_TEXT_FILE
+    if COVERAGE_TARGET > 0:
+        # 多めに生成した候補から重複を除き、文字カバレッジが目標に届くだけの行を選ぶ
+        print(f"文字カバレッジ重視モード（目標: 各文字{COVERAGE_TARGET}回, 候補倍率: {COVERAGE_OVERSAMPLE}）")
+        pool_counts = {category: int(n * COVERAGE_OVERSAMPLE) for category, n in counts.items()}
+        stats = {'duplicates': 0}
+        required = [normalize_text(text) for text in existing_texts]
+        candidates = list(iter_unique(
+            (normalize_text(text) for text in iter_expanded_texts([], pool_counts)), stats))
+        selected, shortfall = select_by_coverage(required, candidates, COVERAGE_TARGET)
+        random.Random(SEED).shuffle(selected)
+
+        print(f"候補: {sum(pool_counts.values())}行（重複除外: {stats['duplicates']}行）")
+        print(f"採用: {len(selected)}行 / 目標未達の文字: {len(shortfall)}種")
+        if shortfall:
+            rare = sorted(shortfall.items(), key=lambda item: -item[1])[:20]
+            print("  " + " ".join(f"{c}(不足{n})" for c, n in rare))
+
+        generated = len(selected) - len(existing_texts)
+        total = len(selected)
+        write_texts(output_file, selected, total)
+    else:
+        # 生成しながらシャッフルして保存（sourceフォルダに保存）
+        write_texts(output_file, iter_expanded_texts(existing_texts, counts), total)
 
     print(f"\n完了！")
     print(f"元のファイル: {len(existing_texts)}行")
-    print(f"追加生成: {len(all_texts) - len(existing_texts)}行")
-    print(f"合計: {len(all_texts)}行")
+    print(f"追加生成: {generated}行")
+    print(f"合計: {total}行")
     print(f"出力ファイル: {output_file}")
     print(f"\n次のステップ:")
     print(f"  mv {output_file} /workspace/data/training_texts.txt")
 
+def main_targeted():
+    """弱点文字モード: 指定した文字を含む行だけを生成（追加学習用の小さなコーパス）"""
+    targets = load_target_chars(TARGET_CHARS, TARGET_FILE)
+    index = build_char_index()
+    unreachable = [c for c in targets if c not in index]
+    print(f"弱点文字モード: {len(targets)}文字, 目標 {TARGET_LINES}行, シード: {SEED}")
+    if unreachable:
+        print(f"  構成要素の語に含まれない文字（生成できません）: {''.join(unreachable)}")
+
+    texts = list(iter_targeted_texts(targets, index, TARGET_LINES, random.Random(SEED)))
+    write_texts(TARGETED_TEXT_FILE, texts, len(texts))
+
+    per_char = Counter(c for text in texts for c in set(text) if c in set(targets))
+    print(f"\n完了！ {len(texts)}行を生成しました")
+    for char in targets:
+        if char in index:
+            print(f"  {char}: {per_char[char]}行（候補の語: {len(index[char])}）")
+    print(f"出力ファイル: {TARGETED_TEXT_FILE}")
+    print(f"\n次のステップ（追加学習用のデータ生成）:")
+    print(f"  TRAINING_TEXT_FILE={TARGETED_TEXT_FILE} python3 scripts/generate_training_data.py")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+学習済みモデルを配布用に書き出すスクリプト（整数化・圧縮の比較と選択）
+
+jpn_custom.traineddata（浮動小数点, best）に加え、最良のチェックポイントから
+lstmtraining --convert_to_int で整数化した版（fast）を作る。
+それぞれをgzipの複数の圧縮レベルで圧縮し、ファイルサイズ・展開時間・モデルの読み込み時間・
+評価用の行での認識時間と文字誤り率を測る。
+文字誤り率が best から --max-cer-increase 以内の版のうち、ダウンロードと展開にかかる時間
+（--bandwidth-mbps で換算）が最も短い組み合わせを /workspace/output/publish に置く。
+
+使い方:
+  python3 scripts/export_model.py
+  python3 scripts/export_model.py --levels 1 6 9 --max-cer-increase 0.005 --bandwidth-mbps 20
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from PIL import Image
+
+import evaluate_model
+import generate_training_data as gen
+import supervise_training
+
+MODEL_DIR = "/workspace/output"
+EXPORT_DIR = "/workspace/output/export"
+PUBLISH_DIR = "/workspace/output/publish"
+
+# 読み込み時間の計測回数（最小値を使う）
+LOAD_REPEATS = 3
+# 展開時間の計測回数（最小値を使う）
+DECOMPRESS_REPEATS = 3
+
+
+def best_checkpoint():
+    """整数化の元にするチェックポイント（早期終了の概要にあればそれ、無ければ最新）"""
+    try:
+        with open(supervise_training.SUMMARY_FILE, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f).get('checkpoint')
+        if checkpoint and os.path.exists(checkpoint):
+            return checkpoint
+    except (OSError, ValueError):
+        pass
+    return os.path.join(MODEL_DIR, f"{gen.MODEL_NAME}_checkpoint")
+
+
+def build_variants(export_dir):
+    """best（そのままコピー）と fast（整数化）の traineddata を作り、{名前: パス} を返す"""
+    variants = {}
+    source = os.path.join(MODEL_DIR, f"{gen.MODEL_NAME}.traineddata")
+    best = os.path.join(export_dir, f"{gen.MODEL_NAME}_best.traineddata")
+    shutil.copyfile(source, best)
+    variants['best'] = best
+
+    fast = os.path.join(export_dir, f"{gen.MODEL_NAME}_fast.traineddata")
+    checkpoint = best_checkpoint()
+    result = subprocess.run([
+        'lstmtraining',
+        '--stop_training',
+        '--convert_to_int',
+        '--continue_from', checkpoint,
+        '--traineddata', os.path.join(supervise_training.TESSDATA, f"{supervise_training.START_MODEL}.traineddata"),
+        '--model_output', fast,
+    ], capture_output=True, text=True)
+    if result.returncode == 0 and os.path.exists(fast):
+        variants['fast'] = fast
+    else:
+        print(f"注意: 整数化に失敗しました（{os.path.basename(checkpoint)}）: {result.stderr.strip()[-300:]}")
+    return variants
+
+
+def compress_variants(variants, levels, export_dir):
+    """各版を各圧縮レベルでgzip圧縮し、サイズと展開時間を測る"""
+    results = []
+    for name, path in variants.items():
+        with open(path, 'rb') as f:
+            raw = f.read()
+        for level in levels:
+            compressed = gzip.compress(raw, compresslevel=level, mtime=0)
+            gz_path = os.path.join(export_dir, f"{os.path.basename(path)}.{level}.gz")
+            with open(gz_path, 'wb') as f:
+                f.write(compressed)
+
+            timings = []
+            for _ in range(DECOMPRESS_REPEATS):
+                started = time.perf_counter()
+                gzip.decompress(compressed)
+                timings.append(time.perf_counter() - started)
+            results.append({
+                'variant': name,
+                'level': level,
+                'path': gz_path,
+                'bytes': len(raw),
+                'gz_bytes': len(compressed),
+                'decompress_sec': round(min(timings), 4),
+            })
+    return results
+
+
+def measure_load(model, tessdata_dir, blank_image):
+    """空白の画像の認識にかかる時間（≒モデルの読み込み時間）"""
+    timings = [evaluate_model.recognize(blank_image, model, tessdata_dir)[1] for _ in range(LOAD_REPEATS)]
+    return round(min(timings), 4)
+
+
+def page_load_sec(entry, bandwidth_mbps):
+    """アプリでの取得と展開にかかる時間の目安"""
+    return entry['gz_bytes'] * 8 / (bandwidth_mbps * 1e6) + entry['decompress_sec']
+
+
+def choose(compressed, accuracy, max_cer_increase, bandwidth_mbps):
+    """精度の条件を満たす版のうち、取得と展開が最も速い組み合わせ（無ければNone）"""
+    base_cer = accuracy['best']['cer']
+    eligible = [
+        entry for entry in compressed
+        if accuracy.get(entry['variant'], {}).get('cer') is not None and base_cer is not None
+        and accuracy[entry['variant']]['cer'] - base_cer <= max_cer_increase
+    ]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda entry: (page_load_sec(entry, bandwidth_mbps),
+                                            accuracy[entry['variant']]['latency_sec'].get('p50') or 0))
+
+
+def publish(entry, variants, publish_dir):
+    """選んだ版を配布用の名前で置く（アプリは .gz を取得する）"""
+    os.makedirs(publish_dir, exist_ok=True)
+    name = f"{gen.MODEL_NAME}.traineddata"
+    shutil.copyfile(variants[entry['variant']], os.path.join(publish_dir, name))
+    shutil.copyfile(entry['path'], os.path.join(publish_dir, name + '.gz'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 6, 9], help='比較するgzipの圧縮レベル')
+    parser.add_argument('--max-cer-increase', type=float, default=0.005,
+                        help='best に対して許容する文字誤り率の増加幅')
+    parser.add_argument('--bandwidth-mbps', type=float, default=20.0, help='取得時間の換算に使う回線速度（Mbps）')
+    parser.add_argument('--max-lines', type=int, default=300, help='評価に使う行数の上限')
+    parser.add_argument('--fonts', type=int, default=None, help='使用するフォント数（省略時は全て）')
+    parser.add_argument('--workers', type=int, default=None, help='並列数（省略時は使用可能なCPU数）')
+    parser.add_argument('--export-dir', default=EXPORT_DIR, help='比較用の書き出し先')
+    parser.add_argument('--publish-dir', default=PUBLISH_DIR, help='採用した版の置き場所')
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(MODEL_DIR, f"{gen.MODEL_NAME}.traineddata")):
+        print(f"エラー: {gen.MODEL_NAME}.traineddata がありません（先に train_model.sh を実行してください）")
+        sys.exit(1)
+    os.makedirs(args.export_dir, exist_ok=True)
+    workers = args.workers or gen.available_cpus()
+
+    print("=== 書き出す版の作成 ===", flush=True)
+    variants = build_variants(args.export_dir)
+    compressed = compress_variants(variants, args.levels, args.export_dir)
+
+    texts = list(itertools.islice(gen.iter_training_texts(holdout=True), args.max_lines))
+    if not texts:
+        print("エラー: 評価用の行がありません（HOLDOUT_PERCENTを確認してください）")
+        sys.exit(1)
+    fonts = gen.get_available_fonts()[:args.fonts]
+    print(f"\n=== 評価用の行を描画（{len(texts)}行 × {len(fonts)}フォント） ===", flush=True)
+    samples = evaluate_model.render_holdout(
+        texts, fonts, os.path.join(evaluate_model.EVAL_DIR, 'images'), workers)
+
+    models = [os.path.basename(path)[:-len('.traineddata')] for path in variants.values()]
+    print(f"\n=== 認識（{', '.join(models)}） ===", flush=True)
+    tessdata_dirs = {model: args.export_dir for model in models}
+    rows = evaluate_model.evaluate(samples, models, workers, tessdata_dirs)
+    report = evaluate_model.build_report(rows, models)
+
+    blank_image = os.path.join(args.export_dir, 'blank.tif')
+    Image.new('L', (200, 60), 255).save(blank_image)
+    accuracy = {}
+    for name, model in zip(variants, models):
+        entry = report[model]['all']
+        accuracy[name] = {
+            'cer': entry['cer'],
+            'exact_match': entry['exact_match'],
+            'latency_sec': entry['latency_sec'],
+            'load_sec': measure_load(model, args.export_dir, blank_image),
+        }
+    base_cer = accuracy['best']['cer']
+    for entry in accuracy.values():
+        entry['cer_change'] = round(entry['cer'] - base_cer, 4) if entry['cer'] is not None and base_cer is not None else None
+
+    chosen = choose(compressed, accuracy, args.max_cer_increase, args.bandwidth_mbps)
+    if chosen:
+        publish(chosen, variants, args.publish_dir)
+
+    for entry in compressed:
+        entry['page_load_sec'] = round(page_load_sec(entry, args.bandwidth_mbps), 3)
+    export_report = {
+        'variants': accuracy,
+        'compressed': compressed,
+        'max_cer_increase': args.max_cer_increase,
+        'bandwidth_mbps': args.bandwidth_mbps,
+        'chosen': {'variant': chosen['variant'], 'level': chosen['level']} if chosen else None,
+        'samples': len(samples),
+    }
+    report_file = os.path.join(args.export_dir, 'export_report.json')
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(export_report, f, ensure_ascii=False, indent=2)
+
+    print("\n=== 版ごとの精度と速度 ===")
+    for name, entry in accuracy.items():
+        latency = entry['latency_sec']
+        cer = f"{entry['cer']:.4f}" if entry['cer'] is not None else '-'
+        change = f"{entry['cer_change']:+.4f}" if entry['cer_change'] is not None else '-'
+        p50 = f"{latency['p50']:.3f}" if latency.get('count') else '-'
+        print(f"  {name:6s} CER: {cer} ({change}) | 読み込み: {entry['load_sec']:.3f}秒 | 認識 p50: {p50}秒")
+    print(f"\n=== 圧縮（回線 {args.bandwidth_mbps:g}Mbps で換算） ===")
+    for entry in compressed:
+        mark = ' ← 採用' if chosen is entry else ''
+        print(f"  {entry['variant']:6s} gzip -{entry['level']} {entry['bytes'] / 1024 / 1024:7.1f}MB → "
+              f"{entry['gz_bytes'] / 1024 / 1024:6.1f}MB | 展開: {entry['decompress_sec']:.3f}秒 "
+              f"| 取得+展開: {entry['page_load_sec']:.2f}秒{mark}")
+
+    print(f"\nレポート: {report_file}")
+    if not chosen:
+        print(f"精度の条件（best から +{args.max_cer_increase}）を満たす版がないため、配布用には置きませんでした")
+        sys.exit(1)
+    print(f"配布用: {args.publish_dir}/{gen.MODEL_NAME}.traineddata(.gz)（{chosen['variant']}, gzip -{chosen['level']}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NumPyで乱数をまとめて引く高速・再現可能なコーパス生成エンジン
+
+expand_training_texts.py の各 generate_* と同じテンプレートで文字列を組み立てる。
+乱数は numpy.random.Generator から一括で引くので、同じシードなら出力は完全に一致する。
+"""
+
+import numpy as np
+
+from expand_training_texts import (
+    PREFECTURES, CITIES, CITY_WARDS, DESIGNATED_CITIES, TOWNS,
+    SURNAMES, GIVEN_NAMES, COMPANY_TYPES, COMPANY_WORDS, COMPANY_PREFIXES,
+)
+
+PHONE_AREA_CODES = ["03", "06", "052", "092", "011", "022", "045", "075"]
+
+# 元号ごとの (元号名, 西暦の範囲, 元年の前年)
+DATE_ERAS = [
+    ("令和", 2020, 2025, 2018),
+    ("平成", 1990, 2019, 1988),
+    ("昭和", 1950, 1989, 1925),
+    (None, 1950, 2025, 0),  # 西暦のみ
+]
+
+
+def _pick(rng, values, n):
+    """valuesからn個を復元抽出してPythonのリストで返す"""
+    return [values[i] for i in rng.integers(0, len(values), n).tolist()]
+
+
+def _ints(rng, low, high, n):
+    """[low, high] の整数をn個引く"""
+    return rng.integers(low, high + 1, n).tolist()
+
+
+def _cities(rng, n):
+    """50%の確率で一般の市区町村、それ以外は政令指定都市 + 区名"""
+    plain = (rng.random(n) < 0.5).tolist()
+    cities = _pick(rng, CITIES, n)
+    bases = _pick(rng, DESIGNATED_CITIES, n)
+    wards = _pick(rng, CITY_WARDS, n)
+    return [c if p else b + w for p, c, b, w in zip(plain, cities, bases, wards)]
+
+
+def fast_addresses(rng, n):
+    """住所を生成（generate_addresses と同じパターン）"""
+    templates = [
+        "{0}{1}{2}{3}丁目{4}番{5}号",
+        "{0}{1}{2}{3}－{4}－{5}",
+        "{0}{1}{2}{3}丁目{4}－{5}",
+        "{0}{1}{2}{3}－{4}",
+    ]
+    prefs = _pick(rng, PREFECTURES, n)
+    cities = _cities(rng, n)
+    towns = _pick(rng, TOWNS, n)
+    chomes = _ints(rng, 1, 10, n)
+    banchis = _ints(rng, 1, 50, n)
+    gos = _ints(rng, 1, 30, n)
+    patterns = _pick(rng, templates, n)
+    return [
+        t.format(p, c, tw, ch, b, g)
+        for t, p, c, tw, ch, b, g in zip(patterns, prefs, cities, towns, chomes, banchis, gos)
+    ]
+
+
+def fast_addresses_with_postal(rng, n):
+    """郵便番号付き住所を生成"""
+    upper = _ints(rng, 100, 999, n)
+    lower = _ints(rng, 0, 9999, n)
+    prefs = _pick(rng, PREFECTURES, n)
+    cities = _cities(rng, n)
+    towns = _pick(rng, TOWNS, n)
+    chomes = _ints(rng, 1, 10, n)
+    banchis = _ints(rng, 1, 50, n)
+    gos = _ints(rng, 1, 30, n)
+    return [
+        f"〒{u:03d}-{l:04d}　{p}{c}{tw}{ch}－{b}－{g}"
+        for u, l, p, c, tw, ch, b, g in zip(upper, lower, prefs, cities, towns, chomes, banchis, gos)
+    ]
+
+
+def fast_full_names(rng, n):
+    """フルネームを生成"""
+    templates = ["{0}　{1}", "{0}{1}", "{0}　{1}　様"]
+    surnames = _pick(rng, SURNAMES, n)
+    givens = _pick(rng, GIVEN_NAMES, n)
+    patterns = _pick(rng, templates, n)
+    return [t.format(s, g) for t, s, g in zip(patterns, surnames, givens)]
+
+
+def fast_companies(rng, n):
+    """会社名を生成（70%は接頭語付き）"""
+    with_prefix = (rng.random(n) > 0.3).tolist()
+    types = _pick(rng, COMPANY_TYPES, n)
+    prefixes = _pick(rng, COMPANY_PREFIXES, n)
+    words = _pick(rng, COMPANY_WORDS, n)
+    return [
+        f"{t}{p}{w}" if wp else f"{t}{w}"
+        for wp, t, p, w in zip(with_prefix, types, prefixes, words)
+    ]
+
+
+def fast_phone_numbers(rng, n):
+    """電話番号を生成"""
+    templates = ["{0}-{1}-{2}", "電話番号：{0}-{1}-{2}", "TEL：{0}-{1}-{2}"]
+    areas = _pick(rng, PHONE_AREA_CODES, n)
+    mids = _ints(rng, 1000, 9999, n)
+    lasts = _ints(rng, 1000, 9999, n)
+    patterns = _pick(rng, templates, n)
+    return [t.format(a, m, l) for t, a, m, l in zip(patterns, areas, mids, lasts)]
+
+
+def fast_dates(rng, n):
+    """日付を生成（令和・平成・昭和・西暦のみ）"""
+    eras = rng.integers(0, len(DATE_ERAS), n)
+    lows = np.array([era[1] for era in DATE_ERAS])[eras]
+    highs = np.array([era[2] for era in DATE_ERAS])[eras]
+    years = (lows + np.floor(rng.random(n) * (highs - lows + 1)).astype(np.int64)).tolist()
+    months = _ints(rng, 1, 12, n)
+    days = _ints(rng, 1, 28, n)
+    # 元号付きは4パターン、西暦のみは3パターン
+    counts = np.array([4 if era[0] else 3 for era in DATE_ERAS])[eras]
+    patterns = np.floor(rng.random(n) * counts).astype(np.int64).tolist()
+
+    dates = []
+    for era, y, m, d, p in zip(eras.tolist(), years, months, days, patterns):
+        era_name, _, _, offset = DATE_ERAS[era]
+        if not era_name and p >= 1:
+            p += 1  # 元号表記のパターンを飛ばす
+        if p == 0:
+            dates.append(f"{y}年{m}月{d}日")
+        elif p == 1:
+            dates.append(f"{era_name}{y - offset}年{m}月{d}日")
+        elif p == 2:
+            dates.append(f"{y}/{m:02d}/{d:02d}")
+        else:
+            dates.append(f"{y}.{m}.{d}")
+    return dates
+
+
+def fast_mixed_texts(rng, n):
+    """住所と名前を組み合わせたテキストを生成"""
+    surnames = _pick(rng, SURNAMES, n)
+    givens = _pick(rng, GIVEN_NAMES, n)
+    prefs = _pick(rng, PREFECTURES, n)
+    cities = _cities(rng, n)
+    towns = _pick(rng, TOWNS, n)
+    chomes = _ints(rng, 1, 10, n)
+    banchis = _ints(rng, 1, 50, n)
+    return [
+        f"{s}　{g}\n{p}{c}{tw}{ch}－{b}"
+        for s, g, p, c, tw, ch, b in zip(surnames, givens, prefs, cities, towns, chomes, banchis)
+    ]
+
+
+FAST_GENERATORS = {
+    'address': fast_addresses,
+    'postal_address': fast_addresses_with_postal,
+    'name': fast_full_names,
+    'company': fast_companies,
+    'phone': fast_phone_numbers,
+    'date': fast_dates,
+    'mixed': fast_mixed_texts,
+}
+
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+フォントごとの対応文字（コードポイント）の索引
+
+fontconfigの fc-query で文字集合を取り出し、フォントファイルのハッシュをキーにしてディスクにキャッシュする。
+描画を始める前に (テキスト, フォント) の組を照合し、描画できない組を除外するために使う。
+
+使い方:
+  python3 scripts/font_coverage.py "IPAexGothic" "TakaoGothic"
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+from pillow_renderer import resolve_font_file
+
+# 索引のキャッシュ先
+COVERAGE_CACHE_DIR = os.environ.get('FONT_COVERAGE_CACHE_DIR', '/workspace/cache/font_coverage')
+
+
+def is_font_installed(font_name):
+    """fontconfigにそのファミリー名のフォントがあるか（fc-listが無い環境ではNone）"""
+    try:
+        result = subprocess.run(
+            ['fc-list', '--format', '%{file}\n', f':family={font_name}'],
+            capture_output=True, text=True,
+        )
+    except OSError:
+        return None
+    return bool(result.stdout.strip())
+
+
+def file_hash(path):
+    """フォントファイルの内容のハッシュ"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_charset(charset):
+    """fc-query の %{charset} 出力（"20-7e a0 ..." の16進の範囲）を [(開始, 終了), ...] に変換"""
+    ranges = []
+    for token in charset.split():
+        start, _, end = token.partition('-')
+        ranges.append((int(start, 16), int(end or start, 16)))
+    return ranges
+
+
+def query_charset(font_file, index):
+    """フォントファイルの対応文字の範囲を fc-query で取得"""
+    result = subprocess.run(
+        ['fc-query', '--index', str(index), '--format', '%{charset}\n', font_file],
+        check=True, capture_output=True, text=True,
+    )
+    return parse_charset(result.stdout)
+
+
+def load_ranges(font_file, index, cache_dir=COVERAGE_CACHE_DIR):
+    """対応文字の範囲をキャッシュから読む（無ければ作って保存）"""
+    cache_file = None
+    if cache_dir:
+        cache_file = os.path.join(cache_dir, f"{file_hash(font_file)}_{index}.json")
+        if os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                return [tuple(r) for r in json.load(f)['ranges']]
+
+    ranges = query_charset(font_file, index)
+    if cache_file:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'file': font_file, 'index': index, 'ranges': ranges}, f)
+        os.replace(tmp_file, cache_file)
+    return ranges
+
+
+class FontCoverage:
+    """フォント名から対応文字の集合を引く索引（索引を作れなかったフォントは照合しない）"""
+
+    def __init__(self, fonts, cache_dir=COVERAGE_CACHE_DIR):
+        self.codepoints = {}
+        self.unavailable = []
+        for font_name in fonts:
+            try:
+                font_file, index = resolve_font_file(font_name)
+                ranges = load_ranges(font_file, index, cache_dir)
+            except (OSError, subprocess.CalledProcessError, ValueError):
+                self.unavailable.append(font_name)
+                continue
+            self.codepoints[font_name] = frozenset(
+                cp for start, end in ranges for cp in range(start, end + 1))
+
+    def missing_chars(self, font_name, text):
+        """テキストのうちフォントが対応していない文字（空白は除く）"""
+        codepoints = self.codepoints.get(font_name)
+        if codepoints is None:
+            return set()
+        return {char for char in set(text) if not char.isspace() and ord(char) not in codepoints}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    coverage = FontCoverage(sys.argv[1:])
+    for font_name in sys.argv[1:]:
+        if font_name in coverage.codepoints:
+            print(f"{font_name}: {len(coverage.codepoints[font_name])}文字")
+        else:
+            print(f"{font_name}: 索引を作成できませんでした")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,85 @@ Tesseract用の日本語トレーニングデータを生成するスクリプ
 import os
 import subprocess
 import multiprocessing
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import Counter
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import shutil
 import tempfile
 import time
 
+import render_cache
+from autoscale import ConcurrencyController, available_cpus
+from corpus_utils import is_holdout
+from font_coverage import FontCoverage, is_font_installed
+from pipeline_metrics import MetricsRecorder
+from job_queue import JobQueue, Heartbeat, iter_lease_rounds, worker_id
+from sample_manifest import ManifestWriter, clear_manifest
+from shard_archive import ShardWriter, remove_shards
+from text_store import TextFileStore
+from tess_box import read_box_file, write_box_file, split_textlines, box_text, crop_region
+
 # 設定
 OUTPUT_DIR = "/workspace/data"
 FONT_DIR = "/workspace/fonts"
-TRAINING_TEXT_FILE = "/workspace/source/training_texts_expanded.txt"
+TRAINING_TEXT_FILE = os.environ.get('TRAINING_TEXT_FILE', "/workspace/source/training_texts_expanded.txt")
 MODEL_NAME = "jpn_custom"
 FONT_SIZE = 48
+LEADING = 48
+RESOLUTION = 300
+
+# text2imageの実行ファイル（ベンチマークでは描画を模した偽物に差し替える）
+TEXT2IMAGE_BIN = os.environ.get('TEXT2IMAGE_BIN', 'text2image')
+
+# 実行バックエンド
+#   process: Pythonワーカープロセスからtext2imageを起動（従来方式）
+#   thread:  スレッドからtext2imageを起動（Python側のプロセスを持たない）
+EXECUTOR_BACKEND = os.environ.get('EXECUTOR_BACKEND', 'process')
+
+# 同時に投入しておくタスク数の上限（未指定時はワーカー数×4）
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', '0'))
+
+# サンプルごとの計測値とレポートの出力先（空文字で無効化）
+METRICS_DIR = os.environ.get('METRICS_DIR', '/workspace/output/metrics')
+
+# AUTOCROP=1 で描画後に文字の範囲 + AUTOCROP_MARGIN ピクセルへ切り詰め、圧縮して保存し直す
+AUTOCROP = os.environ.get('AUTOCROP', '0') == '1'
+AUTOCROP_MARGIN = int(os.environ.get('AUTOCROP_MARGIN', '20'))
+# 切り詰め時のTIFF圧縮（group4 / tiff_lzw）
+TIFF_COMPRESSION = os.environ.get('TIFF_COMPRESSION', 'group4')
+
+# 1枚の描画から作る劣化させた派生サンプルの数（0で無効, augment.py）と乱数のシード値
+AUGMENT_VARIANTS = int(os.environ.get('AUGMENT_VARIANTS', '0'))
+AUGMENT_SEED = int(os.environ.get('AUGMENT_SEED', '0'))
+
+# FONT_COVERAGE=1 でフォントが対応していない文字を含む (テキスト, フォント) の組を描画前に除外
+FONT_COVERAGE = os.environ.get('FONT_COVERAGE', '1') == '1'
+
+# JOB_QUEUE=1 でデータディレクトリ上のジョブキュー（job_queue.py）から処理する。
+# 中断しても未完了のジョブだけを再開でき、同じボリュームを共有するコンテナを増やせば分担して処理する
+JOB_QUEUE = os.environ.get('JOB_QUEUE', '0') == '1'
+JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH', '')
+# 1回に借りるジョブ数（未指定時は同時投入数）
+JOB_LEASE_BATCH = int(os.environ.get('JOB_LEASE_BATCH', '0'))
+
+# 出力形式
+#   files:  OUTPUT_DIR に .tif/.box をばらで置く（従来方式）
+#   shards: OUTPUT_DIR/shards にサイズ上限付きのtarシャード + インデックスとしてまとめる
+OUTPUT_FORMAT = os.environ.get('OUTPUT_FORMAT', 'files')
+SHARD_MAX_BYTES = int(os.environ.get('SHARD_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# 描画済みサンプルのキャッシュ（空文字で無効化）
+RENDER_CACHE_DIR = os.environ.get('RENDER_CACHE_DIR', '/workspace/cache/render')
+
+# 描画方式
+#   text2image: text2imageコマンドを起動（従来方式）
+#   pillow:     Pillow（FreeType）でプロセス内で描画（pillow_renderer.py）
+RENDERER = os.environ.get('RENDERER', 'text2image')
+
+# バッチモード: 1回のtext2image呼び出しで描画する行数（1以下で従来の1行ずつのモード）
+BATCH_SIZE = int(os.environ.get('BATCH_SIZE', '1'))
+# バッチ出力から1行ずつ切り出すときの余白（ピクセル）
+BATCH_CROP_MARGIN = 20
 
 
 def get_available_fonts():
@@ -32,24 +101,50 @@ def get_available_fonts():
         "Noto Serif CJK JP",
     ]
 
+    # インストールされていないフォントは除外（fc-listが使えなければそのまま）
+    missing = [font for font in fonts if is_font_installed(font) is False]
+    fonts = [font for font in fonts if font not in missing]
+
     print("Available fonts:")
     for font in fonts:
         print(f"  - {font}")
+    for font in missing:
+        print(f"  - {font}（インストールされていないため除外）")
 
     return fonts
 
 
+def iter_training_texts(holdout=False):
+    """
+    トレーニング用テキストを1行ずつ読み込む（コーパス全体をメモリに載せない）
+
+    評価用に取り分けた行（corpus_utils.is_holdout）は除く。holdout=True ならその行だけを返す。
+    """
+    with open(TRAINING_TEXT_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            # 空行とコメント行をスキップ
+            if line and not line.startswith('#') and is_holdout(line) == holdout:
+                yield line
+
+
+def count_training_texts():
+    """トレーニング用テキストの行数を数える（見つからなければ0）"""
+    if not os.path.exists(TRAINING_TEXT_FILE):
+        print(f"Error: {TRAINING_TEXT_FILE} not found")
+        return 0
+
+    count = sum(1 for _ in iter_training_texts())
+    print(f"Found {count} texts in {TRAINING_TEXT_FILE}")
+    return count
+
+
 def load_training_texts():
     """トレーニング用テキストを読み込む"""
     texts = []
 
     if os.path.exists(TRAINING_TEXT_FILE):
-        with open(TRAINING_TEXT_FILE, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                # 空行とコメント行をスキップ
-                if line and not line.startswith('#'):
-                    texts.append(line)
+        texts = list(iter_training_texts())
         print(f"Loaded {len(texts)} texts from {TRAINING_TEXT_FILE}")
     else:
         print(f"Error: {TRAINING_TEXT_FILE} not found")
@@ -57,67 +152,474 @@ def load_training_texts():
     return texts
 
 
+def build_text2image_cmd(text_file, output_base, font_name):
+    """text2imageのコマンドラインを組み立てる"""
+    return [
+        TEXT2IMAGE_BIN,
+        '--text', text_file,
+        '--outputbase', output_base,
+        '--font', font_name,
+        '--fonts_dir', '/usr/share/fonts',
+        '--ptsize', str(FONT_SIZE),
+        '--leading', str(LEADING),
+        '--char_spacing', '1.0',
+        '--exposure', '0',
+        '--resolution', str(RESOLUTION),
+    ]
+
+
+def renderer_version():
+    """描画方式とそのバージョン（キャッシュキーに含める）"""
+    if RENDERER == 'pillow':
+        import PIL
+        import pillow_renderer
+        return f"pillow {PIL.__version__} r{pillow_renderer.RENDER_REVISION}"
+    return render_cache.get_text2image_version(TEXT2IMAGE_BIN)
+
+
+def render_params():
+    """描画結果に影響するパラメータ（キャッシュキーに含める）"""
+    return {
+        'ptsize': FONT_SIZE,
+        'leading': LEADING,
+        'resolution': RESOLUTION,
+        'char_spacing': 1.0,
+        'exposure': 0,
+        'autocrop': AUTOCROP_MARGIN if AUTOCROP else None,
+        'compression': TIFF_COMPRESSION if AUTOCROP else None,
+        'augment': [AUGMENT_VARIANTS, AUGMENT_SEED] if AUGMENT_VARIANTS > 0 else None,
+        # バッチモードでは行ごとに切り出した画像を保存するので、1ページの画像とは座標系が異なる
+        'batch_crop': BATCH_CROP_MARGIN if is_batch_mode() else None,
+    }
+
+
+def is_batch_mode():
+    """バッチモードで描画するか（pillowでは使わない）"""
+    return RENDERER == 'text2image' and BATCH_SIZE > 1
+
+
+def sample_base_name(image_index):
+    """サンプル番号から出力ファイルのベース名を作る"""
+    return f"{MODEL_NAME}.train_{image_index:04d}"
+
+
+def sample_variants(base):
+    """サンプルのベースパスと、その派生サンプル（_aug1, _aug2, ...）のベースパス"""
+    return [base] + [f"{base}_aug{k}" for k in range(1, AUGMENT_VARIANTS + 1)]
+
+
+def render_target(image_index, cache_base):
+    """描画先のベースパスを決める（キャッシュ有効時はキャッシュ内の一時パス）"""
+    if cache_base:
+        return render_cache.partial_base(cache_base)
+    return os.path.join(OUTPUT_DIR, sample_base_name(image_index))
+
+
+def publish_sample(image_index, cache_base, target):
+    """キャッシュに描画したサンプルを確定し、出力ディレクトリにリンク"""
+    if cache_base:
+        output_base = os.path.join(OUTPUT_DIR, sample_base_name(image_index))
+        # 元のサンプルを最後に確定するので、キャッシュ済みと判定された時点で派生サンプルも揃っている
+        for partial, base, output in reversed(list(zip(
+                sample_variants(target), sample_variants(cache_base), sample_variants(output_base)))):
+            render_cache.commit_partial(partial, base)
+            render_cache.link_into(base, output)
+
+
+def discard_sample(cache_base, target):
+    """失敗したサンプルの描画途中のファイルを削除"""
+    if cache_base:
+        for partial in sample_variants(target):
+            render_cache.discard_partial(partial)
+
+
+def finish_sample(base, metrics):
+    """描画直後のサンプルを後処理し、出力サイズを計測値に記録"""
+    if AUTOCROP:
+        from image_postprocess import autocrop_sample
+        before, after = autocrop_sample(base, AUTOCROP_MARGIN, TIFF_COMPRESSION)
+        metrics['bytes'] = after
+        metrics['bytes_saved'] = before - after
+    else:
+        metrics['bytes'] = sample_bytes(base)
+
+    if AUGMENT_VARIANTS > 0:
+        from augment import augment_sample
+        started = time.time()
+        variant_bases = sample_variants(base)[1:]
+        augment_sample(base, variant_bases, AUGMENT_SEED)
+        metrics['augment_sec'] = time.time() - started
+        metrics['bytes'] += sum(sample_bytes(variant_base) for variant_base in variant_bases)
+    return metrics
+
+
+def sample_bytes(base):
+    """サンプル1枚分の出力サイズ（.tif + .box）"""
+    return sum(os.path.getsize(base + ext) for ext in render_cache.SAMPLE_EXTENSIONS)
+
+
 def generate_single_image(args):
-    """単一の画像を生成（並列処理用）"""
-    text, font_name, image_index = args
+    """
+    単一の画像を生成（並列処理用）
 
-    base_name = f"{MODEL_NAME}.train_{image_index:04d}"
-    output_base = os.path.join(OUTPUT_DIR, base_name)
+    戻り値は (成否, エラー, 画像番号, 計測値)。計測値は開始時刻・描画時間・出力サイズ。
+    """
+    text, font_name, image_index, cache_base, text_file = args
+    started = time.time()
 
-    # テキストを一時ファイルに書き出す
-    with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.txt', delete=False) as f:
-        f.write(text)
-        text_file = f.name
+    output_base = render_target(image_index, cache_base)
+
+    # 親プロセスがテキストファイルを用意していなければ一時ファイルに書き出す
+    temp_file = None
+    if text_file is None and RENDERER == 'text2image':
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.txt', delete=False) as f:
+            f.write(text)
+            text_file = temp_file = f.name
 
     try:
-        # text2imageコマンドで画像とボックスファイルを生成
-        cmd = [
-            'text2image',
-            '--text', text_file,
-            '--outputbase', output_base,
-            '--font', font_name,
-            '--fonts_dir', '/usr/share/fonts',
-            '--ptsize', str(FONT_SIZE),
-            '--leading', '48',
-            '--char_spacing', '1.0',
-            '--exposure', '0',
-            '--resolution', '300',
-        ]
-
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        return (True, None, image_index)
+        if RENDERER == 'pillow':
+            import pillow_renderer
+            pillow_renderer.render_sample(text, font_name, output_base, FONT_SIZE, RESOLUTION)
+        else:
+            # text2imageコマンドで画像とボックスファイルを生成
+            cmd = build_text2image_cmd(text_file, output_base, font_name)
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+            if is_batch_mode():
+                # バッチから1行ずつ生成し直した場合も、バッチ出力と同じ範囲に切り出す
+                crop_line_sample(output_base)
+        metrics = finish_sample(output_base, {'started': started, 'render_sec': time.time() - started})
+        publish_sample(image_index, cache_base, output_base)
+        return (True, None, image_index, metrics)
 
     except subprocess.CalledProcessError as e:
-        return (False, f"Text: {text[:30]}..., Font: {font_name}, Error: {e.stderr}", image_index)
+        discard_sample(cache_base, output_base)
+        metrics = {'started': started, 'render_sec': time.time() - started}
+        return (False, f"Text: {text[:30]}..., Font: {font_name}, Error: {e.stderr}", image_index, metrics)
+    except (OSError, ValueError) as e:
+        # Pillowでフォントが読めない場合、切り出せない場合など
+        discard_sample(cache_base, output_base)
+        metrics = {'started': started, 'render_sec': time.time() - started}
+        return (False, f"Text: {text[:30]}..., Font: {font_name}, Error: {e}", image_index, metrics)
     finally:
         # 一時ファイルを削除
-        if os.path.exists(text_file):
-            os.unlink(text_file)
-
-
-def generate_training_data_with_text2image(texts, fonts, max_workers=None):
-    """text2imageコマンドでトレーニングデータを並列生成"""
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+        if temp_file and os.path.exists(temp_file):
+            os.unlink(temp_file)
+
+
+def crop_line_sample(base):
+    """1ページに描画したサンプルを、文字の範囲 + BATCH_CROP_MARGIN に切り出す（split_batch_outputと同じ切り出し方）"""
+    from PIL import Image
+
+    boxes = read_box_file(base + '.box')
+    if not boxes or len({box[5] for box in boxes}) != 1:
+        raise ValueError(f"cannot crop {base}: text spans multiple pages")
+
+    with Image.open(base + '.tif') as tif:
+        tif.seek(boxes[0][5])
+        crop_rect, boxes = crop_region(boxes, tif.size, BATCH_CROP_MARGIN)
+        image = tif.crop(crop_rect)
+    image.save(base + '.tif')
+    write_box_file(base + '.box', boxes)
+
+
+def split_batch_output(items, batch_base):
+    """
+    バッチで生成したマルチページTIFFと結合BOXファイルを1行ずつのサンプルに分割
+
+    text2imageは長い行を折り返すため、期待する文字列と一致するまで
+    テキスト行を連結して1サンプルとする。
+    戻り値は分割に成功したサンプル番号から計測値（出力サイズ）への辞書。
+    """
+    from PIL import Image
+
+    textlines = split_textlines(read_box_file(batch_base + '.box'))
+    done = {}
+
+    with Image.open(batch_base + '.tif') as tif:
+        line_pos = 0
+        for text, image_index, cache_base in items:
+            expected = ''.join(text.split())
+            sample_boxes = []
+            collected = ''
+            while line_pos < len(textlines) and len(collected) < len(expected):
+                sample_boxes.extend(textlines[line_pos])
+                collected += box_text(textlines[line_pos])
+                line_pos += 1
+
+            # 文字が欠落した等で対応が取れなくなったら、残りは1行ずつ生成し直す
+            if collected != expected or len({box[5] for box in sample_boxes}) != 1:
+                break
+
+            tif.seek(sample_boxes[0][5])
+            crop_rect, boxes = crop_region(sample_boxes, tif.size, BATCH_CROP_MARGIN)
+            output_base = render_target(image_index, cache_base)
+            tif.crop(crop_rect).save(output_base + '.tif')
+            write_box_file(output_base + '.box', boxes)
+            done[image_index] = finish_sample(output_base, {})
+            publish_sample(image_index, cache_base, output_base)
+
+    return done
+
+
+def generate_batch_images(args):
+    """複数行を1回のtext2imageで生成し、サンプルごとに分割（並列処理用）"""
+    font_name, items = args
+    started = time.time()
+
+    work_dir = tempfile.mkdtemp(prefix='text2image_batch_')
+    text_file = os.path.join(work_dir, 'batch.txt')
+    batch_base = os.path.join(work_dir, 'batch')
+
+    with open(text_file, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(item[0] for item in items) + '\n')
+
+    done = {}
+    try:
+        cmd = build_text2image_cmd(text_file, batch_base, font_name)
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        done = split_batch_output(items, batch_base)
+    except (subprocess.CalledProcessError, OSError, ValueError):
+        # バッチ全体が失敗した場合も、下で1行ずつ生成し直す
+        pass
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-    # CPU数を取得
-    if max_workers is None:
-        # 環境変数で指定可能、デフォルトはCPU数の2倍（I/O待ちが多いため）
-        max_workers = int(os.environ.get('MAX_WORKERS', multiprocessing.cpu_count() * 2))
-        max_workers = max(1, max_workers)
+    # 描画時間はバッチ全体をサンプル数で按分する
+    render_sec = (time.time() - started) / len(items)
+    results = [
+        (True, None, idx, dict(done[idx], started=started, render_sec=render_sec))
+        for _, idx, _ in items if idx in done
+    ]
+    for text, image_index, cache_base in items:
+        if image_index not in done:
+            results.append(generate_single_image((text, font_name, image_index, cache_base, None)))
+    return results
 
-    print(f"並列処理を開始（ワーカー数: {max_workers}）", flush=True)
 
-    # タスクリストを作成
-    tasks = []
+def iter_samples(texts, fonts):
+    """(テキスト, フォント名, 画像番号) を遅延生成（画像番号は テキスト番号 × フォント数 + フォント番号）"""
     image_index = 0
     for text in texts:
         for font_name in fonts:
-            tasks.append((text, font_name, image_index))
+            yield text, font_name, image_index
             image_index += 1
 
-    total_tasks = len(tasks)
+
+def iter_covered(samples, coverage, stats):
+    """フォントが対応していない文字を含むサンプルを除外し、除外した文字とフォントを数える"""
+    for text, font_name, image_index in samples:
+        missing = coverage.missing_chars(font_name, text)
+        if missing:
+            stats['skipped'] += 1
+            stats['skipped_fonts'][font_name] += 1
+            stats['skipped_chars'].update(missing)
+            continue
+        yield text, font_name, image_index
+
+
+def iter_pending(samples, version, stats, shards=None, on_cached=None, manifest=None):
+    """キャッシュ済みのサンプルをリンク（シャード出力時は追記）して一覧に記録し、描画が必要なものだけを流す"""
+    for text, font_name, image_index in samples:
+        cache_base = None
+        if RENDER_CACHE_DIR:
+            key = render_cache.cache_key(text, font_name, render_params(), version)
+            cache_base = render_cache.cache_base(RENDER_CACHE_DIR, key)
+            if render_cache.is_cached(cache_base):
+                output_base = os.path.join(OUTPUT_DIR, sample_base_name(image_index))
+                for base, output in zip(sample_variants(cache_base), sample_variants(output_base)):
+                    render_cache.link_into(base, output)
+                if shards:
+                    add_to_shards(shards, image_index)
+                if manifest:
+                    manifest.add(image_index, text, font_name)
+                if on_cached:
+                    on_cached(image_index)
+                stats['cached'] += 1
+                continue
+        yield text, font_name, image_index, cache_base
+
+
+def add_to_shards(shards, image_index):
+    """出力ディレクトリのサンプル（と派生サンプル）をシャードに移す"""
+    name = sample_base_name(image_index)
+    for base, base_name in zip(sample_variants(os.path.join(OUTPUT_DIR, name)), sample_variants(name)):
+        shards.add_sample(base, base_name)
+
+
+def iter_with_text_files(pending, store, font_count):
+    """各タスクにtmpfs上のテキストファイルを割り当てる（テキスト1行につき1ファイル）"""
+    for text, font_name, image_index, cache_base in pending:
+        text_file = store.acquire(image_index // font_count, text)
+        yield text, font_name, image_index, cache_base, text_file
+
+
+def iter_batches(pending, batch_size):
+    """描画対象をフォントごとにbatch_size件ずつまとめる（保持するのはフォント数×batch_size件まで）"""
+    buffers = {}
+    for text, font_name, image_index, cache_base in pending:
+        items = buffers.setdefault(font_name, [])
+        items.append((text, image_index, cache_base))
+        if len(items) >= batch_size:
+            yield font_name, items
+            buffers[font_name] = []
+
+    for font_name, items in buffers.items():
+        if items:
+            yield font_name, items
+
+
+def iter_tasks(pending, store, font_count):
+    """描画方式に応じてワーカーに渡すタスクを作る（storeはテキストファイルを使う場合のみ）"""
+    if RENDERER == 'pillow':
+        # プロセス内で描画するのでテキストファイルは不要
+        return ((*task, None) for task in pending)
+    if is_batch_mode():
+        # フォントごとにBATCH_SIZE行ずつまとめる
+        return iter_batches(pending, BATCH_SIZE)
+    return iter_with_text_files(pending, store, font_count)
+
+
+def run_bounded(executor, worker, tasks, max_in_flight):
+    """
+    遅延生成されるタスクを、実行中の件数をmax_in_flightに抑えながら投入
+
+    完了したものから順に (タスク, 結果, 投入時刻) を返すので、タスク数が増えても親プロセスのメモリは一定。
+    max_in_flight には上限を返す関数も渡せる（実行中に上限を変える場合）。
+    """
+    limit = max_in_flight if callable(max_in_flight) else lambda: max_in_flight
+    in_flight = {}
+    for task in tasks:
+        while len(in_flight) >= limit():
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_done, submitted_at = in_flight.pop(future)
+                yield task_done, future.result(), submitted_at
+        in_flight[executor.submit(worker, task)] = (task, time.time())
+
+    for future in as_completed(in_flight):
+        task_done, submitted_at = in_flight[future]
+        yield task_done, future.result(), submitted_at
+
+
+def default_max_workers(backend):
+    """バックエンドごとのデフォルトのワーカー数"""
+    if backend == 'thread':
+        # スレッドは待つだけなので、同時に動くtext2imageの数＝使えるCPU数に合わせる
+        return available_cpus()
+    # I/O待ちが多いためCPU数の2倍
+    return multiprocessing.cpu_count() * 2
+
+
+def make_executor(backend, max_workers):
+    """実行バックエンドに応じたExecutorを作成"""
+    if backend == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers)
+    if backend == 'process':
+        return ProcessPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"未知の実行バックエンドです: {backend}")
+
+
+def generate_training_data_with_text2image(texts, fonts, max_workers=None, total_texts=None, backend=None):
+    """
+    text2imageコマンドでトレーニングデータを並列生成
+
+    textsはイテレータでもよい（その場合は進捗表示用にtotal_textsを渡す）。
+    """
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    if backend is None:
+        backend = EXECUTOR_BACKEND
+
+    # CPU数を取得
+    autoscale = None
+    if max_workers is None:
+        # 環境変数で指定可能（auto なら枚数/秒と空きメモリを見ながら同時実行数を決める）
+        env_workers = os.environ.get('MAX_WORKERS', str(default_max_workers(backend)))
+        if env_workers == 'auto':
+            max_workers = default_max_workers(backend)
+            autoscale = ConcurrencyController(max_workers, log=lambda message: print(message, flush=True))
+        else:
+            max_workers = max(1, int(env_workers))
+    max_in_flight = MAX_IN_FLIGHT if MAX_IN_FLIGHT > 0 else max_workers * 4
+
+    in_flight_limit = max_in_flight
+    if autoscale:
+        # プールは上限の大きさで作り、実行中のタスク数で同時実行数を絞る
+        in_flight_limit = autoscale.limit
+        print(f"並列処理を開始（バックエンド: {backend}, 同時実行数: 自動調整 {autoscale.level}〜{max_workers}）",
+              flush=True)
+    else:
+        print(f"並列処理を開始（バックエンド: {backend}, ワーカー数: {max_workers}, "
+              f"同時投入数: {max_in_flight}）", flush=True)
+
+    # キャッシュ済みのサンプルはリンクするだけで済ませる
+    version = renderer_version() if RENDER_CACHE_DIR else None
+    if RENDER_CACHE_DIR:
+        print(f"描画キャッシュ: {RENDER_CACHE_DIR}（{version}）", flush=True)
+
+    if total_texts is None:
+        total_texts = len(texts)
+    total_tasks = total_texts * len(fonts)
     print(f"総タスク数: {total_tasks}", flush=True)
 
+    # タスクは必要になった時点で生成する
+    stats = {'cached': 0, 'skipped': 0, 'skipped_fonts': Counter(), 'skipped_chars': Counter()}
+    samples = iter_samples(texts, fonts)
+    if FONT_COVERAGE:
+        coverage = FontCoverage(fonts)
+        print(f"文字の対応表: {len(coverage.codepoints)}/{len(fonts)}フォント", flush=True)
+        for font_name in coverage.unavailable:
+            print(f"  {font_name}: 対応表を作成できないため照合しません", flush=True)
+        samples = iter_covered(samples, coverage, stats)
+
+    shard_dir = os.path.join(OUTPUT_DIR, 'shards')
+    shard_prefix = MODEL_NAME
+    # サンプルの一覧（キャッシュから取り出した分も含む）。build_training_list.py などが読む
+    manifest_dir = os.path.join(OUTPUT_DIR, 'manifest')
+    queue = None
+    owner = None
+    rounds = [samples]
+    if JOB_QUEUE:
+        # 全タスクをキューに登録し（内容が前回と同じなら完了状態を引き継ぐ）、借りたジョブだけを処理する
+        queue = JobQueue(JOB_QUEUE_PATH or os.path.join(OUTPUT_DIR, 'job_queue.sqlite'))
+        owner = worker_id()
+        if queue.seed(samples, {'fonts': fonts, 'render': render_params(), 'renderer': RENDERER}):
+            print("ジョブキュー: 新しいコーパスで登録し直しました", flush=True)
+            remove_shards(shard_dir, MODEL_NAME)
+            clear_manifest(manifest_dir)
+        counts = queue.counts()
+        unfinished = counts.get('pending', 0) + counts.get('leased', 0)
+        print(f"ジョブキュー: {queue.path}（ワーカー: {owner}） | 未完了: {unfinished}, "
+              f"完了: {counts.get('done', 0)}, 失敗: {counts.get('failed', 0)}", flush=True)
+        total_tasks = unfinished + stats['skipped']
+        rounds = iter_lease_rounds(queue, owner, JOB_LEASE_BATCH if JOB_LEASE_BATCH > 0 else max_in_flight)
+        # ワーカーごとに別のシャードに書く（他のワーカーや前回の実行のシャードを消さない）
+        shard_prefix = f"{MODEL_NAME}-{owner}"
+        # 一覧もワーカーごとに別のファイルに追記する
+        manifest = ManifestWriter(manifest_dir, owner)
+    else:
+        # 全サンプルを記録し直すので前回の一覧は消す
+        clear_manifest(manifest_dir)
+        manifest = ManifestWriter(manifest_dir)
+
+    shards = None
+    if OUTPUT_FORMAT == 'shards':
+        shards = ShardWriter(shard_dir, shard_prefix, SHARD_MAX_BYTES)
+        print(f"出力形式: シャード（上限 {SHARD_MAX_BYTES // (1024 * 1024)}MB）", flush=True)
+
+    store = None
+    if RENDERER == 'pillow':
+        print("描画方式: pillow", flush=True)
+        worker = generate_single_image
+    elif is_batch_mode():
+        print(f"バッチモード（1回あたり{BATCH_SIZE}行）", flush=True)
+        worker = generate_batch_images
+    else:
+        store = TextFileStore()
+        worker = generate_single_image
+
+    metrics = MetricsRecorder(METRICS_DIR) if METRICS_DIR else None
+
     # 並列処理
     total_images = 0
     failed_images = 0
@@ -128,39 +630,88 @@ def generate_training_data_with_text2image(texts, fonts, max_workers=None):
 
     print("処理を開始しています...\n", flush=True)
 
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        # タスクを投入
-        futures = {executor.submit(generate_single_image, task): task for task in tasks}
-
+    heartbeat = Heartbeat(queue.path, owner) if queue else nullcontext()
+    with make_executor(backend, max_workers) as executor, heartbeat:
         # 進捗表示
-        completed = 0
-        for future in as_completed(futures):
-            completed += 1
-            success, error, idx = future.result()
-
-            if success:
-                total_images += 1
-            else:
-                failed_images += 1
-                if len(failed_details) < 5:  # 最初の5件のみ保存
-                    failed_details.append(error)
-
-            # 進捗を表示（50個ごと、または3秒ごと、または完了時）
-            current_time = time.time()
-            should_print = (
-                completed % 50 == 0 or
-                completed == total_tasks or
-                (current_time - last_print_time) >= 3.0
-            )
-
-            if should_print:
-                elapsed = time.time() - start_time
-                rate = completed / elapsed if elapsed > 0 else 0
-                remaining = (total_tasks - completed) / rate if rate > 0 else 0
-                print(f"進捗: {completed}/{total_tasks} ({completed*100/total_tasks:.1f}%) "
-                      f"| 成功: {total_images}, 失敗: {failed_images} "
-                      f"| 速度: {rate:.1f}枚/秒 | 残り時間: {remaining/60:.1f}分", flush=True)
-                last_print_time = current_time
+        rendered = 0
+        # ジョブキューでは1周ごとに実行中のタスクを書き戻してから、失敗して戻されたジョブや期限切れのリースを借り直す
+        for round_samples in rounds:
+            pending = iter_pending(round_samples, version, stats, shards,
+                                   on_cached=queue.complete if queue else None, manifest=manifest)
+            tasks = iter_tasks(pending, store, len(fonts))
+            for task, results, submitted_at in run_bounded(executor, worker, tasks, in_flight_limit):
+                if worker is generate_single_image:
+                    results = [results]
+                    sample_info = {task[2]: (task[0], task[1])}
+                else:
+                    sample_info = {idx: (text, task[0]) for text, idx, _ in task[1]}
+
+                for success, error, idx, sample_metrics in results:
+                    rendered += 1
+                    if store:
+                        store.release(idx // len(fonts))
+                    if metrics:
+                        text, font_name = sample_info[idx]
+                        metrics.record(idx, text, font_name, success, error, submitted_at, sample_metrics)
+                    if success:
+                        total_images += 1
+                        if shards:
+                            add_to_shards(shards, idx)
+                        manifest.add(idx, *sample_info[idx])
+                    else:
+                        failed_images += 1
+                        if len(failed_details) < 5:  # 最初の5件のみ保存
+                            failed_details.append(error)
+                    # シャードに書き終えてから完了にする（途中で止まっても、完了のジョブは必ずシャードにある）
+                    if queue:
+                        if success:
+                            queue.complete(idx)
+                        else:
+                            queue.fail(idx, error)
+                completed = rendered + stats['cached'] + stats['skipped']
+                if autoscale:
+                    autoscale.observe(rendered)
+
+                # 進捗を表示（50個ごと、または3秒ごと、または完了時）
+                current_time = time.time()
+                should_print = (
+                    completed % 50 == 0 or
+                    completed == total_tasks or
+                    (current_time - last_print_time) >= 3.0
+                )
+
+                if should_print:
+                    elapsed = time.time() - start_time
+                    rate = rendered / elapsed if elapsed > 0 else 0
+                    remaining = (total_tasks - completed) / rate if rate > 0 else 0
+                    print(f"進捗: {completed}/{total_tasks} ({completed*100/total_tasks:.1f}%) "
+                          f"| 成功: {total_images}, 失敗: {failed_images}, キャッシュ: {stats['cached']}, "
+                          f"除外: {stats['skipped']} "
+                          f"| 速度: {rate:.1f}枚/秒 | 残り時間: {remaining/60:.1f}分", flush=True)
+                    last_print_time = current_time
+
+    if autoscale:
+        print(f"\n最終的な同時実行数: {autoscale.level}（MAX_WORKERS={autoscale.level} で固定できます）", flush=True)
+    if store:
+        store.close()
+    if queue:
+        queue.close()
+    manifest.close()
+    if shards:
+        shards.close()
+        print(f"\nシャード: {len(shards.shard_paths)}個（{shards.shard_dir}）", flush=True)
+
+    if RENDER_CACHE_DIR:
+        print(f"\nキャッシュ利用: {stats['cached']}枚 / 描画: {rendered}枚", flush=True)
+    if stats['skipped']:
+        print(f"\nフォントが対応していない文字のため除外: {stats['skipped']}枚", flush=True)
+        for font_name, count in stats['skipped_fonts'].most_common():
+            print(f"  {font_name}: {count}枚", flush=True)
+        chars = ' '.join(f"{char}({count})" for char, count in stats['skipped_chars'].most_common(20))
+        print(f"  原因の文字: {chars}", flush=True)
+    if AUGMENT_VARIANTS > 0:
+        print(f"派生サンプル: 1枚あたり{AUGMENT_VARIANTS}枚"
+              f"（計{(total_images + stats['cached']) * AUGMENT_VARIANTS}枚）", flush=True)
 
     # エラー詳細を表示
     if failed_details:
@@ -168,7 +719,26 @@ def generate_training_data_with_text2image(texts, fonts, max_workers=None):
         for detail in failed_details:
             print(f"  - {detail}")
 
-    return total_images, failed_images
+    if metrics:
+        metrics.cached = stats['cached']
+        metrics.skipped = {
+            'total': stats['skipped'],
+            'by_font': dict(stats['skipped_fonts']),
+            'by_char': dict(stats['skipped_chars'].most_common()),
+        }
+        summary_file, report = metrics.write_report()
+        print("\n描画時間（フォント別, 秒）:")
+        for font_name, entry in sorted(report['font'].items(),
+                                       key=lambda item: -(item[1]['render_sec'].get('p95') or 0)):
+            render = entry['render_sec']
+            if render['count']:
+                print(f"  {font_name:20s} p50: {render['p50']:.3f} p95: {render['p95']:.3f} "
+                      f"p99: {render['p99']:.3f} | 失敗: {entry['failed']}")
+        if AUTOCROP:
+            print(f"後処理で削減した容量: {report['all'].get('bytes_saved', 0) / 1024 / 1024:.1f}MB")
+        print(f"計測レポート: {summary_file}")
+
+    return total_images + stats['cached'], failed_images
 
 
 def main():
@@ -184,20 +754,21 @@ def main():
 
     print(f"\nFound {len(fonts)} Japanese fonts\n")
 
-    # テキストの読み込み
-    texts = load_training_texts()
-    if not texts:
+    # テキストの読み込み（件数だけ数えて、本体は生成中に逐次読み込む）
+    text_count = count_training_texts()
+    if not text_count:
         print("Error: No training texts loaded!")
         return
 
     print(f"\n=== トレーニングデータ生成開始 ===")
-    print(f"テキスト数: {len(texts)}")
+    print(f"テキスト数: {text_count}")
     print(f"フォント数: {len(fonts)}")
-    print(f"予想画像数: 約{len(texts) * len(fonts)}枚")
+    print(f"予想画像数: 約{text_count * len(fonts)}枚")
+    print("（所要時間・ディスク使用量の見積もり: python3 scripts/plan_generation.py）")
     print()
 
     # データ生成
-    total, failed = generate_training_data_with_text2image(texts, fonts)
+    total, failed = generate_training_data_with_text2image(iter_training_texts(), fonts, total_texts=text_count)
 
     print(f"\n=== 完了 ===")
     print(f"成功: {total}枚")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+描画後のサンプルを文字の範囲 + 余白に切り詰め、可逆圧縮のTIFFで保存し直す
+
+text2imageはページ全体を出力するため、1行だけのサンプルでは大半が余白になる。
+BOXの座標は切り出した位置に合わせてずらす。
+"""
+
+import os
+
+from PIL import Image, ImageOps
+
+from tess_box import read_box_file, write_box_file, bounding_box, shift_boxes
+
+
+def content_bbox(image, boxes):
+    """インクとボックスの両方を含む範囲（Pillowの座標系: left, upper, right, lower）"""
+    ink = ImageOps.invert(image.convert('L')).getbbox()
+    width, height = image.size
+    if boxes:
+        left, bottom, right, top = bounding_box(boxes)
+        box_rect = (left, height - top, right, height - bottom)
+        if ink is None:
+            return box_rect
+        return (min(ink[0], box_rect[0]), min(ink[1], box_rect[1]),
+                max(ink[2], box_rect[2]), max(ink[3], box_rect[3]))
+    return ink
+
+
+def save_compressed(image, path, compression):
+    """2値画像はGroup 4、それ以外はLZWで保存"""
+    if compression == 'group4' and image.mode != '1':
+        compression = 'tiff_lzw'
+    image.save(path, compression=compression, dpi=image.info.get('dpi', (300, 300)))
+
+
+def crop_to_content(image, boxes, margin):
+    """文字の範囲 + margin ピクセルに切り詰めた (画像, ボックス) を返す（文字が無ければそのまま）"""
+    rect = content_bbox(image, boxes)
+    if rect is None:
+        return image, boxes
+    dpi = image.info.get('dpi')
+    width, height = image.size
+    left = max(0, rect[0] - margin)
+    upper = max(0, rect[1] - margin)
+    right = min(width, rect[2] + margin)
+    lower = min(height, rect[3] + margin)
+    image = image.crop((left, upper, right, lower))
+    if dpi:
+        image.info['dpi'] = dpi
+    # BOXは左下原点なので、下端からの切り落とし量だけずらす
+    return image, shift_boxes(boxes, -left, -(height - lower))
+
+
+def autocrop_sample(base, margin, compression='group4'):
+    """
+    base.tif / base.box を切り詰めて上書きし、(処理前のバイト数, 処理後のバイト数) を返す
+
+    marginがNoneなら切り詰めずに圧縮だけ行う。
+    """
+    tif_path = base + '.tif'
+    box_path = base + '.box'
+    before = os.path.getsize(tif_path) + os.path.getsize(box_path)
+
+    boxes = read_box_file(box_path)
+    with Image.open(tif_path) as image:
+        image.load()
+
+    if margin is not None:
+        image, boxes = crop_to_content(image, boxes, margin)
+        write_box_file(box_path, boxes)
+
+    save_compressed(image, tif_path, compression)
+    after = os.path.getsize(tif_path) + os.path.getsize(box_path)
+    return before, after
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+トレーニングデータ生成の再開可能なジョブキュー（SQLite, WALモード）
+
+(テキスト, フォント) の組を1ジョブとしてデータディレクトリ上のSQLiteに登録し、
+ワーカーはジョブを期限付きで借りて（リース）、完了・失敗を書き戻す。
+期限切れのリースは他のワーカーが回収するので、途中で止まっても未完了のジョブだけを再開でき、
+同じボリュームを共有する同一ホスト上のコンテナを増やせばそのまま並列に処理できる。
+
+使い方:
+  python3 scripts/job_queue.py status [/workspace/data/job_queue.sqlite]
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+DEFAULT_QUEUE_PATH = '/workspace/data/job_queue.sqlite'
+# リースの有効期限（秒）。ハートビートはこの1/3ごと
+LEASE_SEC = float(os.environ.get('JOB_LEASE_SEC', '60'))
+# 失敗したジョブを再試行する回数の上限
+MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+# 他のワーカーのリースしか残っていないときに期限切れを確かめる間隔（秒）
+POLL_SEC = float(os.environ.get('JOB_POLL_SEC', '5'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    image_index INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    font TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def worker_id():
+    """ワーカーの識別子（ホスト名 + プロセスID + 乱数。再起動したコンテナで前回と重ならないように）"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class JobQueue:
+    """SQLite上のジョブキュー（接続はスレッドごとに別のインスタンスを使う）"""
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def seed(self, samples, params):
+        """
+        (テキスト, フォント名, 画像番号) の列と描画パラメータからジョブを登録
+
+        登録済みの内容と同じなら何もしない（完了状態を引き継ぐ）。異なれば作り直して True を返す。
+        複数のワーカーが同時に呼んでも、登録するのは最初の1つだけ。
+        """
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        conn = self.conn
+
+        # ジョブの行はこの接続だけの一時テーブルに書き出す（データベース本体の書き込みロックは取らない）
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS staging (image_index INTEGER PRIMARY KEY, text TEXT, font TEXT)')
+
+        def rows():
+            for text, font_name, image_index in samples:
+                digest.update(f"{image_index}\t{font_name}\t{text}\n".encode('utf-8'))
+                yield image_index, text, font_name
+
+        conn.execute('BEGIN')
+        try:
+            conn.execute('DELETE FROM staging')
+            conn.executemany('INSERT INTO staging VALUES (?, ?, ?)', rows())
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        corpus_hash = digest.hexdigest()
+
+        # 書き込みロックは登録済みの内容との比較と入れ替えの間だけ取る
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            stored = conn.execute("SELECT value FROM meta WHERE key = 'corpus_hash'").fetchone()
+            reseeded = stored is None or stored[0] != corpus_hash
+            if reseeded:
+                conn.execute('DELETE FROM jobs')
+                conn.execute('INSERT INTO jobs (image_index, text, font, updated) '
+                             'SELECT image_index, text, font, ? FROM staging', (time.time(),))
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('corpus_hash', ?)", (corpus_hash,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('DELETE FROM staging')
+        return reseeded
+
+    def lease(self, owner, count, lease_sec=LEASE_SEC):
+        """未処理または期限切れのジョブを最大count件借りて (テキスト, フォント名, 画像番号) のリストを返す"""
+        now = time.time()
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                "SELECT image_index, text, font FROM jobs "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY image_index LIMIT ?", (now, count)).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE image_index = ?",
+                [(owner, now + lease_sec, now, row[0]) for row in rows])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [(text, font_name, image_index) for image_index, text, font_name in rows]
+
+    def heartbeat(self, owner, lease_sec=LEASE_SEC):
+        """このワーカーが借りているジョブの期限を延ばす"""
+        self.conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE status = 'leased' AND lease_owner = ?",
+            (time.time() + lease_sec, owner))
+
+    def complete(self, image_index):
+        self.conn.execute(
+            "UPDATE jobs SET status = 'done', lease_owner = NULL, error = NULL, updated = ? "
+            "WHERE image_index = ?", (time.time(), image_index))
+
+    def fail(self, image_index, error, max_attempts=MAX_ATTEMPTS):
+        """失敗を記録（試行回数が上限未満なら再び未処理に戻す）"""
+        self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_owner = NULL, error = ?, updated = ? WHERE image_index = ?",
+            (max_attempts, (error or '')[:1000], time.time(), image_index))
+
+    def leasable(self):
+        """今すぐ借りられるジョブ（未処理・期限切れのリース）の数"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'pending' "
+            "OR (status = 'leased' AND lease_expires < ?)", (time.time(),)).fetchone()[0]
+
+    def remaining_for_others(self, owner):
+        """このワーカー以外が処理すべきジョブ（未処理・他のワーカーが借りている）の数"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'pending' "
+            "OR (status = 'leased' AND lease_owner != ?)", (owner,)).fetchone()[0]
+
+    def counts(self):
+        """状態ごとのジョブ数"""
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+
+def iter_leased(queue, owner, batch_size):
+    """
+    ジョブを batch_size 件ずつ借りて流す
+
+    借りられるジョブ（未処理・期限切れのリース）が無くなったら待たずに終了する。
+    待つのは iter_lease_rounds の役目（ここで待つと、実行中のタスクの結果を書き戻せなくなる）。
+    """
+    while True:
+        leased = queue.lease(owner, batch_size)
+        if not leased:
+            return
+        yield from leased
+
+
+def iter_lease_rounds(queue, owner, batch_size, poll_sec=POLL_SEC):
+    """
+    iter_leased を1周ずつ返す
+
+    呼び出し側は1周分のタスクを全て完了・失敗として書き戻してから次の周を取り出す。
+    失敗して未処理に戻されたジョブや期限切れのリースがあればすぐ次の周へ進み、
+    他のワーカーのリースしか残っていなければ poll_sec 待ってから回収を試みる。何も残っていなければ終了する。
+    """
+    while True:
+        yield iter_leased(queue, owner, batch_size)
+        if queue.remaining_for_others(owner) == 0:
+            return
+        if queue.leasable() == 0:
+            time.sleep(poll_sec)
+
+
+class Heartbeat:
+    """別スレッドから定期的にリースを延長する（プロセスが止まればリースは期限切れになる）"""
+
+    def __init__(self, path, owner, lease_sec=LEASE_SEC):
+        self.path = path
+        self.owner = owner
+        self.lease_sec = lease_sec
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        queue = JobQueue(self.path)
+        try:
+            while not self.stopped.wait(self.lease_sec / 3):
+                queue.heartbeat(self.owner, self.lease_sec)
+        finally:
+            queue.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != 'status':
+        print(__doc__)
+        sys.exit(1)
+
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_QUEUE_PATH
+    queue = JobQueue(path)
+    counts = queue.counts()
+    total = sum(counts.values())
+    print(f"{path}: {total}ジョブ")
+    for status in ('pending', 'leased', 'done', 'failed'):
+        print(f"  {status:8s} {counts.get(status, 0)}")
+    for image_index, attempts, error in queue.conn.execute(
+            "SELECT image_index, attempts, error FROM jobs WHERE status = 'failed' LIMIT 5"):
+        print(f"  失敗 #{image_index}（{attempts}回）: {(error or '').strip()[:100]}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
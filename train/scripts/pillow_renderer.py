@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pillow（FreeType）でテキストを直接描画し、.tif と .box を書き出すレンダラー
+
+text2imageのプロセスを起動せず、フォントはワーカー（スレッド）ごとに一度だけ読み込んで使い回す。
+BOXファイルはtext2imageと同じ形式（文字ごとのボックス + 行末のタブ）で出力する。
+"""
+
+import subprocess
+import threading
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from tess_box import TEXTLINE_END, write_box_file
+
+# 文字の周囲の余白（ピクセル）
+MARGIN = 50
+# 描画結果が変わる修正をしたら上げる（キャッシュキーに含め、古い描画結果を使わないようにする）
+RENDER_REVISION = 2
+
+_local = threading.local()
+
+
+def normalize_family(name):
+    """ファミリー名の比較用（fontconfigと同じく大文字小文字と空白を区別しない）"""
+    return ''.join(name.split()).lower()
+
+
+@lru_cache(maxsize=None)
+def resolve_font_file(font_name):
+    """
+    fontconfigでフォントファミリー名から (ファイルパス, コレクション内の番号) を求める
+
+    fc-matchは該当するフォントが無くても代わりのフォントを返すので、
+    返ってきたファミリー名が一致しなければOSErrorを送出する（別の書体で描画しないように）。
+    """
+    result = subprocess.run(
+        ['fc-match', '-f', '%{family}\n%{file}\n%{index}', font_name],
+        check=True, capture_output=True, text=True,
+    )
+    family, path, index = (result.stdout.split('\n') + ['', ''])[:3]
+    if normalize_family(font_name) not in {normalize_family(name) for name in family.split(',')}:
+        raise OSError(f"font not installed: {font_name} (fc-match returned {family or 'nothing'})")
+    return path, int(index or 0)
+
+
+def load_font(font_name, size_px):
+    """フォントを読み込む（FreeTypeのフェイスはスレッド間で共有しないのでスレッドごとにキャッシュ）"""
+    fonts = getattr(_local, 'fonts', None)
+    if fonts is None:
+        fonts = _local.fonts = {}
+    key = (font_name, size_px)
+    if key not in fonts:
+        path, index = resolve_font_file(font_name)
+        fonts[key] = ImageFont.truetype(path, size_px, index=index)
+    return fonts[key]
+
+
+def glyph_ink_box(font, char):
+    """文字のインク部分の矩形（描画原点からの相対座標）。getbboxは送り幅を含むのでマスクで詰める"""
+    left, top, right, bottom = font.getbbox(char)
+    ink = font.getmask(char).getbbox()
+    if ink is None:
+        return left, top, right, bottom
+    return left + ink[0], top + ink[1], left + ink[2], top + ink[3]
+
+
+def layout_boxes(text, font, origin, image_height):
+    """文字ごとのボックスをBOX形式（左下原点）で計算"""
+    x0, y0 = origin
+    ascent, descent = font.getmetrics()
+    line_bottom = image_height - (y0 + ascent + descent)
+    line_top = image_height - y0
+
+    # 文字ごとの送り幅（直前の文字とのカーニングを含む）を足していく。行頭からの長さを毎回測ると文字数の2乗に比例する
+    boxes = []
+    x = x0
+    prev = ''
+    for char in text:
+        advance = font.getlength(prev + char) - font.getlength(prev)
+        prev = char
+        if char.isspace():
+            boxes.append((' ', round(x), line_bottom, round(x + advance), line_top, 0))
+        else:
+            left, top, right, bottom = glyph_ink_box(font, char)
+            boxes.append((
+                char,
+                round(x + left),
+                image_height - (y0 + bottom),
+                round(x + right),
+                image_height - (y0 + top),
+                0,
+            ))
+        x += advance
+
+    end = round(x)
+    boxes.append((TEXTLINE_END, end, line_bottom, end + 1, line_top, 0))
+    return boxes
+
+
+def render_sample(text, font_name, output_base, font_size, resolution):
+    """1行を描画して output_base.tif / output_base.box を書き出す"""
+    size_px = round(font_size * resolution / 72)
+    font = load_font(font_name, size_px)
+    ascent, descent = font.getmetrics()
+
+    width = round(font.getlength(text)) + MARGIN * 2
+    height = ascent + descent + MARGIN * 2
+    image = Image.new('L', (width, height), 255)
+    ImageDraw.Draw(image).text((MARGIN, MARGIN), text, font=font, fill=0)
+
+    # text2imageと同じく2値画像で保存（既定の誤差拡散だと輪郭のアンチエイリアスが点状のノイズになるので、しきい値で2値化）
+    image.convert('1', dither=Image.Dither.NONE).save(output_base + '.tif', dpi=(resolution, resolution))
+    write_box_file(output_base + '.box', layout_boxes(text, font, (MARGIN, MARGIN), height))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+コーパスの拡張と画像の描画をつなげて実行するスクリプト
+
+expand_training_texts.py の生成器が作った行を上限付きのキューで直接描画側へ渡すので、
+拡張が終わるのを待たずに描画が始まる。描画側が詰まればキューが埋まって生成も止まる。
+拡張したテキストは再現用に training_texts_expanded.txt へも書き出す（内容は単体で実行した場合と同じ）。
+
+文字カバレッジ重視モード（EXPAND_COVERAGE_TARGET）は全ての候補が揃わないと行を選べないため、
+選び終えてから描画を始める。
+
+使い方:
+  python3 scripts/pipeline.py
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+
+import expand_training_texts as expand
+import generate_training_data as gen
+from corpus_utils import HOLDOUT_PERCENT, is_holdout
+
+# 拡張側と描画側の間に溜めておく行数の上限
+PIPELINE_QUEUE_LINES = int(os.environ.get('PIPELINE_QUEUE_LINES', '10000'))
+
+_END = object()
+
+
+class TextStream:
+    """
+    別スレッドで拡張した行を上限付きのキューで受け取るイテレータ
+
+    拡張側で起きた例外は受け取り側で送出し直す。受け取り側が途中でやめた場合は close() で拡張を止める。
+    """
+
+    def __init__(self, texts, maxsize=PIPELINE_QUEUE_LINES):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.stopped = threading.Event()
+        self.error = None
+        self.produced = 0
+        self.thread = threading.Thread(target=self._run, args=(texts,), daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        # 受け取り側がやめていたら待ち続けない
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, texts):
+        try:
+            for text in texts:
+                if not self._put(text):
+                    return
+                self.produced += 1
+        except BaseException as e:
+            self.error = e
+        self._put(_END)
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is _END:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+def iter_side_output(texts, output_file, total):
+    """正規化した行を流しつつ、拡張したテキストとしてファイルにも書き出す（形式は write_texts と同じ）"""
+    with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write("# 拡張されたトレーニングテキスト\n")
+        f.write(f"# 総行数: {total}\n\n")
+        for text in texts:
+            text = expand.normalize_text(text)
+            f.write(text + '\n')
+            yield text
+
+
+def iter_render_texts(texts):
+    """
+    描画に使う行（iter_training_texts と同じく空行・コメント行・評価用の行を除く）
+
+    改行を含む項目（mixed カテゴリ）はファイルでは複数行になるので、同じく1行ずつに分けてから判定する。
+    """
+    for text in texts:
+        for line in text.split('\n'):
+            line = line.strip()
+            if line and not line.startswith('#') and not is_holdout(line):
+                yield line
+
+
+def expanded_source():
+    """拡張したテキストの生成器と総行数（カバレッジ重視モードでは選び終えてから返す）"""
+    counts = {category: int(n * expand.SCALE) for category, n in expand.CATEGORY_COUNTS.items()}
+    existing_texts = expand.load_existing_texts()
+
+    if expand.COVERAGE_TARGET > 0:
+        print("文字カバレッジ重視モード: 行を選び終えてから描画を始めます", flush=True)
+        pool_counts = {category: int(n * expand.COVERAGE_OVERSAMPLE) for category, n in counts.items()}
+        required = [expand.normalize_text(text) for text in existing_texts]
+        candidates = list(expand.iter_unique(
+            (expand.normalize_text(text) for text in expand.iter_expanded_texts([], pool_counts)),
+            {'duplicates': 0}))
+        selected, _ = expand.select_by_coverage(required, candidates, expand.COVERAGE_TARGET)
+        random.Random(expand.SEED).shuffle(selected)
+        return iter(selected), len(selected)
+
+    return expand.iter_expanded_texts(existing_texts, counts), len(existing_texts) + sum(counts.values())
+
+
+def main():
+    """メイン処理"""
+    print("=== コーパス拡張 → トレーニングデータ生成（パイプライン） ===\n")
+    started = time.time()
+
+    fonts = gen.get_available_fonts()
+    if not fonts:
+        print("Error: No Japanese fonts found!")
+        return
+
+    print(f"エンジン: {expand.ENGINE}, シード: {expand.SEED}, 倍率: {expand.SCALE}", flush=True)
+    texts, total = expanded_source()
+    output_file = expand.OUTPUT_TEXT_FILE
+
+    # 行数は拡張前に分かるので、評価用に除く分を見込んだ概算を進捗表示に使う
+    total_texts = round(total * (100 - HOLDOUT_PERCENT) / 100)
+    print(f"拡張後の行数: {total}（描画: 約{total_texts}行 × {len(fonts)}フォント, "
+          f"キュー: {PIPELINE_QUEUE_LINES}行）", flush=True)
+    print(f"拡張したテキストの保存先: {output_file}\n", flush=True)
+
+    stream = TextStream(iter_side_output(texts, output_file, total))
+    try:
+        succeeded, failed = gen.generate_training_data_with_text2image(
+            iter_render_texts(stream), fonts, total_texts=total_texts)
+    finally:
+        stream.close()
+
+    print(f"\n=== 完了（{time.time() - started:.0f}秒） ===")
+    print(f"拡張: {stream.produced}行 → {output_file}")
+    print(f"成功: {succeeded}枚")
+    print(f"失敗: {failed}枚")
+    print(f"Output directory: {gen.OUTPUT_DIR}")
+    print("\n次のステップ: train_model.sh を実行してモデルトレーニング")
+
+
+if __name__ == "__main__":
+    main()
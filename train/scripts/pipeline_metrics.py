@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+トレーニングデータ生成のサンプル単位の計測とレポート出力
+
+サンプルごとにキュー待ち時間・描画時間・出力サイズを samples.csv に追記し、
+フォント別・カテゴリ別のp50/p95/p99を summary.json / summary.csv にまとめる。
+"""
+
+import csv
+import json
+import math
+import os
+from array import array
+
+from corpus_utils import classify_text
+
+SAMPLE_FIELDS = [
+    'image_index', 'font', 'category', 'length', 'success',
+    'queue_wait_sec', 'render_sec', 'augment_sec', 'output_bytes', 'bytes_saved', 'error',
+]
+
+
+def percentile(sorted_values, q):
+    """ソート済みの値のq分位点（最近傍法）"""
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize(values):
+    """値の列から件数・平均・p50/p95/p99を計算"""
+    values = sorted(values)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 4),
+        'p50': round(percentile(values, 50), 4),
+        'p95': round(percentile(values, 95), 4),
+        'p99': round(percentile(values, 99), 4),
+        'max': round(values[-1], 4),
+    }
+
+
+class MetricsRecorder:
+    """サンプルごとの計測値をCSVに流しつつ、グループ別の集計用に数値だけ保持する"""
+
+    def __init__(self, metrics_dir):
+        self.metrics_dir = metrics_dir
+        os.makedirs(metrics_dir, exist_ok=True)
+        self.samples_file = open(os.path.join(metrics_dir, 'samples.csv'), 'w', encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(self.samples_file, fieldnames=SAMPLE_FIELDS)
+        self.writer.writeheader()
+        self.groups = {}
+        self.cached = 0
+        self.skipped = {}
+
+    def _group(self, kind, name):
+        key = (kind, name)
+        if key not in self.groups:
+            self.groups[key] = {
+                'render_sec': array('d'), 'queue_wait_sec': array('d'),
+                'output_bytes': array('d'), 'bytes_saved': 0, 'failed': 0,
+            }
+        return self.groups[key]
+
+    def record(self, image_index, text, font_name, success, error, submitted_at, sample_metrics):
+        """1サンプル分を記録（sample_metrics はワーカーが返した計測値）"""
+        category = classify_text(text)
+        queue_wait = max(0.0, sample_metrics['started'] - submitted_at)
+        render_sec = sample_metrics['render_sec']
+        output_bytes = sample_metrics.get('bytes', 0)
+        bytes_saved = sample_metrics.get('bytes_saved', 0)
+
+        self.writer.writerow({
+            'image_index': image_index,
+            'font': font_name,
+            'category': category,
+            'length': len(text),
+            'success': int(success),
+            'queue_wait_sec': round(queue_wait, 4),
+            'render_sec': round(render_sec, 4),
+            'augment_sec': round(sample_metrics.get('augment_sec', 0), 4),
+            'output_bytes': output_bytes,
+            'bytes_saved': bytes_saved,
+            'error': (error or '').strip().replace('\n', ' ')[:300],
+        })
+
+        for group in (self._group('all', 'all'), self._group('font', font_name),
+                      self._group('category', category)):
+            if success:
+                group['render_sec'].append(render_sec)
+                group['queue_wait_sec'].append(queue_wait)
+                group['output_bytes'].append(output_bytes)
+                group['bytes_saved'] += bytes_saved
+            else:
+                group['failed'] += 1
+
+    def write_report(self):
+        """集計結果を summary.json / summary.csv に書き出してパスを返す"""
+        self.samples_file.close()
+
+        report = {'cached': self.cached, 'skipped': self.skipped, 'all': {}, 'font': {}, 'category': {}}
+        rows = []
+        for (kind, name), group in sorted(self.groups.items()):
+            render = summarize(group['render_sec'])
+            entry = {
+                'succeeded': render['count'],
+                'failed': group['failed'],
+                'render_sec': render,
+                'queue_wait_sec': summarize(group['queue_wait_sec']),
+                'output_bytes': summarize(group['output_bytes']),
+                'bytes_saved': group['bytes_saved'],
+            }
+            if kind == 'all':
+                report['all'] = entry
+            else:
+                report[kind][name] = entry
+            rows.append({
+                'group': kind, 'name': name,
+                'succeeded': entry['succeeded'], 'failed': entry['failed'],
+                'render_p50': render.get('p50'), 'render_p95': render.get('p95'),
+                'render_p99': render.get('p99'),
+                'queue_wait_p95': entry['queue_wait_sec'].get('p95'),
+                'bytes_mean': entry['output_bytes'].get('mean'),
+                'bytes_saved': entry['bytes_saved'],
+            })
+
+        summary_json = os.path.join(self.metrics_dir, 'summary.json')
+        with open(summary_json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        with open(os.path.join(self.metrics_dir, 'summary.csv'), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ['group'])
+            writer.writeheader()
+            writer.writerows(rows)
+
+        return summary_json, report
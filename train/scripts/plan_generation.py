@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+トレーニングデータ生成の見積もり（ドライラン）
+
+コーパスからカテゴリごとに数行ずつ抜き出して全フォントで実際に描画し（設定中の描画方式・バックエンド・後処理のまま）、
+フォント別の描画時間・出力サイズ・失敗率と .lstmf の生成時間・サイズを測る。
+その結果からコーパス全体を生成した場合の所要時間（ワーカー数ごと）、.tif/.box/.lstmf のディスク使用量、
+失敗・除外の件数を見積もり、全体の生成は行わずに終了する。
+所要時間はCPU数まではワーカー数に比例して速くなるものとして計算する。
+
+使い方:
+  python3 scripts/plan_generation.py
+  python3 scripts/plan_generation.py --lines-per-category 5 --workers 4 8 16 --output plan.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import generate_training_data as gen
+from build_lstmf import run_tesseract
+from corpus_utils import classify_text
+
+PLAN_FILE = "/workspace/output/plan.json"
+
+
+def sample_corpus(lines_per_category, seed):
+    """
+    コーパスを1回読み、カテゴリごとの行数と、カテゴリごとに lines_per_category 行の無作為抽出を返す
+
+    抽出はカテゴリごとのリザーバーサンプリングなので、コーパス全体をメモリに載せない。
+    """
+    rng = random.Random(seed)
+    counts = Counter()
+    reservoirs = defaultdict(list)
+    for text in gen.iter_training_texts():
+        category = classify_text(text)
+        counts[category] += 1
+        reservoir = reservoirs[category]
+        if len(reservoir) < lines_per_category:
+            reservoir.append(text)
+        else:
+            slot = rng.randrange(counts[category])
+            if slot < lines_per_category:
+                reservoir[slot] = text
+    return counts, reservoirs
+
+
+def read_samples(metrics_dir):
+    """計測値の samples.csv と summary.json（除外件数）を読む"""
+    with open(os.path.join(metrics_dir, 'samples.csv'), 'r', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    with open(os.path.join(metrics_dir, 'summary.json'), 'r', encoding='utf-8') as f:
+        skipped = json.load(f).get('skipped', {})
+    return rows, skipped
+
+
+def measure_lstmf(output_dir, limit):
+    """描画したサンプルのうち limit 件で lstm.train を実行し、(1件あたりの秒数, 1件あたりのバイト数) を返す"""
+    if shutil.which('tesseract') is None:
+        return None, None
+    tifs = sorted(name for name in os.listdir(output_dir) if name.endswith('.tif'))[:limit]
+    seconds, sizes = [], []
+    for name in tifs:
+        base = os.path.join(output_dir, name[:-len('.tif')])
+        started = time.perf_counter()
+        status, _ = run_tesseract(base + '.tif', base, 'lstm.train')
+        elapsed = time.perf_counter() - started
+        if status == 0 and os.path.exists(base + '.lstmf'):
+            seconds.append(elapsed)
+            sizes.append(os.path.getsize(base + '.lstmf'))
+    if not seconds:
+        return None, None
+    return sum(seconds) / len(seconds), sum(sizes) / len(sizes)
+
+
+def estimate(counts, fonts, rows, skipped, sampled_texts, measured_wall, measured_workers,
+             lstmf_sec, lstmf_bytes, worker_options, cpus):
+    """計測結果をコーパス全体に引き延ばす"""
+    total_texts = sum(counts.values())
+    total_tasks = total_texts * len(fonts)
+    sampled_tasks = sampled_texts * len(fonts)
+    # フォントごとの件数はテキスト数に等しい（除外の分は除外率で差し引く）
+    skip_rate = skipped.get('total', 0) / sampled_tasks if sampled_tasks else 0.0
+
+    by_font = {}
+    for font_name in fonts:
+        font_rows = [r for r in rows if r['font'] == font_name]
+        ok = [r for r in font_rows if r['success'] == '1']
+        font_skip_rate = skipped.get('by_font', {}).get(font_name, 0) / sampled_texts if sampled_texts else 0.0
+        tasks = total_texts * (1 - font_skip_rate)
+        fail_rate = (len(font_rows) - len(ok)) / len(font_rows) if font_rows else 0.0
+        mean_sec = sum(float(r['render_sec']) for r in ok) / len(ok) if ok else None
+        mean_bytes = sum(int(r['output_bytes'] or 0) for r in ok) / len(ok) if ok else 0
+        by_font[font_name] = {
+            'measured': len(font_rows),
+            'render_sec_mean': round(mean_sec, 4) if mean_sec is not None else None,
+            'output_bytes_mean': round(mean_bytes),
+            'failure_rate': round(fail_rate, 4),
+            'skip_rate': round(font_skip_rate, 4),
+            'expected_tasks': round(tasks),
+            'expected_failures': round(tasks * fail_rate),
+            'expected_bytes': round(tasks * (1 - fail_rate) * mean_bytes),
+        }
+
+    rendered = sum(1 for r in rows if r['success'] == '1')
+    expected_samples = sum(f['expected_tasks'] - f['expected_failures'] for f in by_font.values())
+    # 派生サンプルも1件ずつ .lstmf になる
+    lstmf_count = expected_samples * (1 + gen.AUGMENT_VARIANTS)
+    tif_box_bytes = sum(f['expected_bytes'] for f in by_font.values())
+    lstmf_total = round(lstmf_count * lstmf_bytes) if lstmf_bytes else None
+    # シャード形式では train_model.sh が展開するので、tar とばらのファイルが両方残る
+    peak_bytes = tif_box_bytes * (2 if gen.OUTPUT_FORMAT == 'shards' else 1) + (lstmf_total or 0)
+
+    # 計測時の枚数/秒から、CPU数まではワーカー数に比例するとして引き延ばす
+    rate = len(rows) / measured_wall if measured_wall > 0 else 0.0
+    effective = min(measured_workers, cpus)
+    generation = {}
+    for workers in worker_options:
+        scaled = rate * min(workers, cpus) / effective if effective else 0.0
+        generation[str(workers)] = round(total_tasks * (1 - skip_rate) / scaled) if scaled else None
+    lstmf_time = {}
+    if lstmf_sec:
+        for jobs in worker_options:
+            lstmf_time[str(jobs)] = round(lstmf_count * lstmf_sec / min(jobs, cpus))
+
+    return {
+        'corpus': {'texts': total_texts, 'fonts': len(fonts), 'tasks': total_tasks, 'by_category': dict(counts)},
+        'measured': {
+            'texts': sampled_texts, 'tasks': sampled_tasks, 'rendered': rendered,
+            'skipped': skipped.get('total', 0), 'wall_sec': round(measured_wall, 2),
+            'workers': measured_workers, 'samples_per_sec': round(rate, 2),
+            'lstmf_sec_mean': round(lstmf_sec, 4) if lstmf_sec else None,
+            'lstmf_bytes_mean': round(lstmf_bytes) if lstmf_bytes else None,
+        },
+        'font': by_font,
+        'expected': {
+            'samples': expected_samples,
+            'failures': sum(f['expected_failures'] for f in by_font.values()),
+            'skipped': round(total_tasks * skip_rate),
+            'lstmf_files': lstmf_count,
+        },
+        'disk_bytes': {'tif_box': tif_box_bytes, 'lstmf': lstmf_total, 'peak': peak_bytes},
+        'generation_sec_by_workers': generation,
+        'lstmf_sec_by_parallel_jobs': lstmf_time,
+        'cpus': cpus,
+    }
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '-'
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}時間"
+    if seconds >= 60:
+        return f"{seconds / 60:.0f}分"
+    return f"{seconds:.0f}秒"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines-per-category', type=int, default=3, help='カテゴリごとに描画する行数')
+    parser.add_argument('--fonts', type=int, default=None, help='使用するフォント数（省略時は全て）')
+    parser.add_argument('--measure-workers', type=int, default=None, help='計測時の並列数（省略時は使用可能なCPU数）')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='見積もるワーカー数・PARALLEL_JOBS（省略時は1からCPU数×2まで2倍ずつ）')
+    parser.add_argument('--lstmf-samples', type=int, default=20, help='lstm.train を計測する件数')
+    parser.add_argument('--seed', type=int, default=0, help='抽出のシード値')
+    parser.add_argument('--output', default=PLAN_FILE, help='見積もりを保存するJSONファイル')
+    args = parser.parse_args()
+
+    cpus = gen.available_cpus()
+    measure_workers = args.measure_workers or cpus
+    worker_options = args.workers or [2 ** k for k in range(0, (cpus * 2).bit_length())]
+
+    if not os.path.exists(gen.TRAINING_TEXT_FILE):
+        print(f"エラー: {gen.TRAINING_TEXT_FILE} が見つかりません")
+        sys.exit(1)
+    fonts = gen.get_available_fonts()[:args.fonts]
+    counts, reservoirs = sample_corpus(args.lines_per_category, args.seed)
+    texts = [text for category in sorted(reservoirs) for text in reservoirs[category]]
+    print(f"\n=== 見積もり用の描画（{len(texts)}行 × {len(fonts)}フォント, 描画方式: {gen.RENDERER}, "
+          f"バックエンド: {gen.EXECUTOR_BACKEND}, 並列数: {measure_workers}） ===", flush=True)
+
+    work_dir = tempfile.mkdtemp(prefix='plan_')
+    try:
+        # キャッシュ・ジョブキューは使わず、毎回描画する
+        gen.OUTPUT_DIR = os.path.join(work_dir, 'data')
+        gen.METRICS_DIR = os.path.join(work_dir, 'metrics')
+        gen.RENDER_CACHE_DIR = ''
+        gen.JOB_QUEUE = False
+        gen.OUTPUT_FORMAT = 'files'
+        os.makedirs(gen.OUTPUT_DIR)
+        started = time.perf_counter()
+        gen.generate_training_data_with_text2image(texts, fonts, max_workers=measure_workers)
+        measured_wall = time.perf_counter() - started
+
+        rows, skipped = read_samples(gen.METRICS_DIR)
+        print(f"\n.lstmf の生成時間を計測中（{args.lstmf_samples}件）...", flush=True)
+        lstmf_sec, lstmf_bytes = measure_lstmf(gen.OUTPUT_DIR, args.lstmf_samples)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    plan = estimate(counts, fonts, rows, skipped, len(texts), measured_wall, measure_workers,
+                    lstmf_sec, lstmf_bytes, worker_options, cpus)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False, indent=2)
+
+    corpus, expected, disk = plan['corpus'], plan['expected'], plan['disk_bytes']
+    print(f"\n=== 見積もり（{corpus['texts']}行 × {corpus['fonts']}フォント = {corpus['tasks']}枚） ===")
+    print(f"  生成できる見込み: {expected['samples']}枚（失敗: 約{expected['failures']}枚, "
+          f"フォント非対応で除外: 約{expected['skipped']}枚）")
+    print("\n  フォント別（計測値）:")
+    for font_name, entry in plan['font'].items():
+        sec = entry['render_sec_mean']
+        print(f"    {font_name:20s} {sec if sec is not None else '-':>8}秒/枚 "
+              f"{entry['output_bytes_mean'] / 1024:8.1f}KB/枚 | 失敗率: {entry['failure_rate']:.1%} "
+              f"除外率: {entry['skip_rate']:.1%}")
+    mb = 1024 * 1024
+    print(f"\n  ディスク: .tif/.box {disk['tif_box'] / mb:.0f}MB"
+          + (f", .lstmf {disk['lstmf'] / mb:.0f}MB" if disk['lstmf'] is not None else ", .lstmf 計測なし（tesseractが無い）")
+          + f" | ピーク: {disk['peak'] / mb:.0f}MB")
+    print(f"\n  所要時間（CPU数: {cpus}）:")
+    print(f"    {'並列数':>8s} {'生成（MAX_WORKERS）':>20s} {'.lstmf（PARALLEL_JOBS）':>24s}")
+    for workers in worker_options:
+        print(f"    {workers:>8d} {format_duration(plan['generation_sec_by_workers'][str(workers)]):>20s} "
+              f"{format_duration(plan['lstmf_sec_by_parallel_jobs'].get(str(workers))):>24s}")
+    print(f"\n見積もり: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
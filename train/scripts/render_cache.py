@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+描画済みトレーニングサンプル（.tif/.box）のコンテンツアドレス型キャッシュ
+
+キーは (テキスト, フォント名, 描画パラメータ, text2imageのバージョン) のハッシュ。
+画像番号に依存しないので、コーパスに行を挿入しても既存の描画結果を再利用できる。
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import threading
+
+SAMPLE_EXTENSIONS = ('.tif', '.box')
+
+
+def get_text2image_version(binary='text2image'):
+    """描画に使うtext2image（binary）のバージョン文字列を取得（キャッシュキーに含める）"""
+    try:
+        result = subprocess.run([binary, '--version'], capture_output=True, text=True)
+    except OSError:
+        return 'unknown'
+    return (result.stdout + result.stderr).strip() or 'unknown'
+
+
+def cache_key(text, font_name, render_params, version):
+    """サンプル1枚分のキャッシュキーを計算"""
+    payload = json.dumps(
+        [text, font_name, render_params, version],
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def cache_base(cache_dir, key):
+    """キャッシュ内のベースパス（1ディレクトリのファイル数を抑えるため先頭2文字で分ける）"""
+    return os.path.join(cache_dir, key[:2], key)
+
+
+def is_cached(base):
+    """.tifと.boxの両方が揃っていればキャッシュ済み"""
+    return all(os.path.exists(base + ext) for ext in SAMPLE_EXTENSIONS)
+
+
+def partial_base(base):
+    """描画途中のファイル用のベースパス（完了後に commit_partial で確定する）"""
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    return f"{base}.partial{os.getpid()}_{threading.get_ident()}"
+
+
+def commit_partial(partial, base):
+    """描画が完了したファイルをキャッシュに確定（.boxを最後に置くので途中状態は見えない）"""
+    for ext in SAMPLE_EXTENSIONS:
+        os.replace(partial + ext, base + ext)
+
+
+def discard_partial(partial):
+    """失敗した描画の残骸を削除"""
+    for ext in SAMPLE_EXTENSIONS:
+        if os.path.exists(partial + ext):
+            os.unlink(partial + ext)
+
+
+def link_into(base, output_base):
+    """キャッシュ済みファイルを出力ディレクトリにハードリンク（別ファイルシステムならシンボリックリンク）"""
+    for ext in SAMPLE_EXTENSIONS:
+        src = base + ext
+        dst = output_base + ext
+        if os.path.lexists(dst):
+            os.unlink(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            os.symlink(os.path.abspath(src), dst)
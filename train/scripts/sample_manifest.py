@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成したサンプルの一覧（画像番号 → フォント・カテゴリ・文字数・テキスト）
+
+描画したサンプルもキャッシュから取り出したサンプルも記録するので、再実行しても全サンプルが揃う。
+ジョブキューで複数のワーカーが処理する場合は、ワーカーごとに別のファイルへ追記する。
+トレーニングリストの並び替え（build_training_list.py）と評価用の分割（supervise_training.py）が読む。
+"""
+
+import csv
+import glob
+import os
+
+from corpus_utils import classify_text
+
+DEFAULT_MANIFEST_DIR = '/workspace/data/manifest'
+
+MANIFEST_FIELDS = ['image_index', 'font', 'category', 'length', 'text']
+
+
+def clear_manifest(manifest_dir):
+    """一覧を全て削除（コーパスを作り直したとき）"""
+    for path in glob.glob(os.path.join(manifest_dir, 'samples*.csv')):
+        os.unlink(path)
+
+
+class ManifestWriter:
+    """サンプルを1件ずつ追記する（1行ごとに書き出すので、途中で止まっても書いた分は残る）"""
+
+    def __init__(self, manifest_dir, worker=None):
+        os.makedirs(manifest_dir, exist_ok=True)
+        name = f"samples-{worker}.csv" if worker else 'samples.csv'
+        self.path = os.path.join(manifest_dir, name)
+        is_new = not os.path.exists(self.path)
+        self.file = open(self.path, 'a', encoding='utf-8', newline='', buffering=1)
+        self.writer = csv.DictWriter(self.file, fieldnames=MANIFEST_FIELDS)
+        if is_new:
+            self.writer.writeheader()
+
+    def add(self, image_index, text, font_name):
+        self.writer.writerow({
+            'image_index': image_index,
+            'font': font_name,
+            'category': classify_text(text),
+            'length': len(text),
+            'text': text,
+        })
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def load_manifest(manifest_dir=DEFAULT_MANIFEST_DIR):
+    """全ワーカーの一覧を読み、画像番号 → {font, category, length, text} を返す（無ければ空）"""
+    samples = {}
+    for path in sorted(glob.glob(os.path.join(manifest_dir, 'samples*.csv'))):
+        with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            # 書き込み中に止まったワーカーの途切れた最終行（改行で終わらない行）は読み飛ばす
+            lines = (line for line in f if line.endswith('\n'))
+            for row in csv.DictReader(lines):
+                samples[int(row['image_index'])] = {
+                    'font': row['font'],
+                    'category': row['category'],
+                    'length': int(row['length']),
+                    'text': row['text'],
+                }
+    return samples
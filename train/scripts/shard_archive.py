@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+トレーニングサンプルをサイズ上限付きのtarシャードにまとめる出力形式
+
+シャードごとにサイドカーのインデックス（JSON Lines: メンバー名・データ位置・サイズ）を書くので、
+先頭から順に読むことも、1サンプルだけシークして読むこともできる。
+
+使い方:
+  python3 scripts/shard_archive.py list /workspace/data/shards
+  python3 scripts/shard_archive.py expand /workspace/data/shards /workspace/data
+"""
+
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+
+INDEX_SUFFIX = '.idx.jsonl'
+
+
+def index_path(shard_path):
+    """シャードに対応するインデックスファイルのパス"""
+    return shard_path[:-len('.tar')] + INDEX_SUFFIX
+
+
+def remove_shards(shard_dir, prefix):
+    """prefix で始まるシャードとインデックスを削除"""
+    if not os.path.isdir(shard_dir):
+        return
+    for name in os.listdir(shard_dir):
+        if name.startswith(prefix + '-') and (name.endswith('.tar') or name.endswith(INDEX_SUFFIX)):
+            os.unlink(os.path.join(shard_dir, name))
+
+
+class ShardWriter:
+    """サンプルのファイルをシャードに追記し、サイズ上限を超えたら次のシャードに切り替える"""
+
+    def __init__(self, shard_dir, prefix, max_bytes):
+        self.shard_dir = shard_dir
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        os.makedirs(shard_dir, exist_ok=True)
+        # 前回の出力が残っていると展開時に混ざるので消しておく
+        remove_shards(shard_dir, prefix)
+        self.shard_no = 0
+        self.tar = None
+        self.index = None
+        self.shard_paths = []
+
+    def _open_next(self):
+        self.close()
+        path = os.path.join(self.shard_dir, f"{self.prefix}-{self.shard_no:05d}.tar")
+        self.shard_no += 1
+        self.tar = tarfile.open(path, 'w', format=tarfile.PAX_FORMAT)
+        self.index = open(index_path(path), 'w', encoding='utf-8')
+        self.shard_paths.append(path)
+
+    def add_file(self, path, arcname):
+        """ファイルを1つ追記"""
+        if self.tar is None:
+            self._open_next()
+        with open(path, 'rb') as f:
+            data = f.read()
+        info = tarfile.TarInfo(arcname)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.tar.addfile(info, io.BytesIO(data))
+        # データはヘッダの直後にあり、512バイト単位に切り上げて詰められる
+        padded_size = (info.size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+        offset_data = self.tar.offset - padded_size
+        self.index.write(json.dumps(
+            {'name': arcname, 'offset': offset_data, 'size': info.size},
+            ensure_ascii=False) + '\n')
+
+    def add_sample(self, base, base_name, extensions=('.tif', '.box'), remove=True):
+        """base + 拡張子 のファイルを base_name + 拡張子 として追記（既定で元ファイルは削除）"""
+        # 1サンプルのファイルは同じシャードに入れる
+        if self.tar is None or self.tar.offset >= self.max_bytes:
+            self._open_next()
+        for ext in extensions:
+            self.add_file(base + ext, base_name + ext)
+        # ジョブキューで完了にする前にディスクへ書き出す（元ファイルを消すのもその後）
+        self.flush()
+        if remove:
+            for ext in extensions:
+                os.unlink(base + ext)
+
+    def flush(self):
+        """シャードとインデックスをディスクに書き出す（fsync）"""
+        if self.tar is None:
+            return
+        for f in (self.tar.fileobj, self.index):
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.index.close()
+            self.tar = self.index = None
+
+
+def list_shards(path):
+    """ディレクトリならその中のシャード、ファイルならそれ自体を返す"""
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.tar'))
+    return [path]
+
+
+def read_index(shard_path):
+    """シャードのインデックスを読み込む（メンバー名 → (データ位置, サイズ)）"""
+    index = {}
+    with open(index_path(shard_path), 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                # 書き込み中に止まった場合の途切れた最終行
+                break
+            entry = json.loads(line)
+            index[entry['name']] = (entry['offset'], entry['size'])
+    return index
+
+
+def read_member(shard_path, name, index=None):
+    """インデックスを使って1メンバーだけをシークして読む"""
+    if index is None:
+        index = read_index(shard_path)
+    offset, size = index[name]
+    with open(shard_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def iter_members(shard_path):
+    """
+    シャードを先頭から順に読み、(メンバー名, データ) を返す
+
+    書き込み中に止まったワーカーのシャードは末尾のメンバーが途切れていることがあるので、
+    そこで読むのをやめる（そのジョブは完了になっていないので、別のワーカーが描画し直している）。
+    """
+    with tarfile.open(shard_path, 'r') as tar:
+        while True:
+            try:
+                info = tar.next()
+                if info is None:
+                    return
+                data = tar.extractfile(info).read() if info.isfile() else None
+            except tarfile.ReadError:
+                print(f"注意: {shard_path} の末尾が途切れているため、以降のメンバーを読み飛ばしました")
+                return
+            if data is not None:
+                yield info.name, data
+
+
+def expand_shards(path, dest_dir):
+    """シャードをばらのファイルに展開（Tesseractのツールに渡すため）"""
+    os.makedirs(dest_dir, exist_ok=True)
+    count = 0
+    for shard_path in list_shards(path):
+        for members in iter_complete_samples(shard_path):
+            for name, data in members:
+                with open(os.path.join(dest_dir, os.path.basename(name)), 'wb') as f:
+                    f.write(data)
+                count += 1
+    return count
+
+
+def iter_complete_samples(shard_path, extensions=('.tif', '.box')):
+    """
+    サンプルごとに [(メンバー名, データ), ...] を返す
+
+    1サンプルのファイルは続けて入っているので、途切れて拡張子が揃わない末尾のサンプルは返さない。
+    """
+    base, members = None, []
+    for name, data in iter_members(shard_path):
+        name_base = os.path.splitext(name)[0]
+        if name_base != base:
+            if len(members) == len(extensions):
+                yield members
+            base, members = name_base, []
+        members.append((name, data))
+    if len(members) == len(extensions):
+        yield members
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('list', 'expand'):
+        print(__doc__)
+        sys.exit(1)
+
+    command, path = sys.argv[1], sys.argv[2]
+    if command == 'list':
+        for shard_path in list_shards(path):
+            index = read_index(shard_path)
+            print(f"{shard_path}: {len(index)}ファイル, {os.path.getsize(shard_path)}バイト")
+    else:
+        dest_dir = sys.argv[3] if len(sys.argv) > 3 else '.'
+        count = expand_shards(path, dest_dir)
+        print(f"{count}ファイルを展開しました: {dest_dir}")
+
+
+if __name__ == "__main__":
+    main()
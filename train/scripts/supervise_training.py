@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+lstmtraining を早期終了付きで実行するスクリプト
+
+training_files.txt の .lstmf の一部をテキスト単位で評価用に取り分け（--eval_listfile, 同じ行の全フォント・派生サンプルは同じ側）、
+lstmtraining の出力（BCER/BWER と評価時の文字誤り率）を逐次読み取る。
+誤り率が EARLY_STOPPING_PATIENCE イテレーションの間 EARLY_STOPPING_MIN_DELTA 以上改善しなければ打ち切り、
+最も良かったチェックポイントから --stop_training で traineddata を作る。
+イテレーションと誤り率の推移は training_curve.csv に書き出す。
+
+使い方:
+  python3 scripts/supervise_training.py
+"""
+
+import csv
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import zlib
+
+from build_training_list import sample_index
+from sample_manifest import DEFAULT_MANIFEST_DIR, load_manifest
+from tess_box import read_box_file, box_text
+
+# 設定
+MODEL_NAME = "jpn_custom"
+START_MODEL = "jpn"
+TESSDATA = "/usr/local/share/tessdata"
+OUTPUT_DIR = "/workspace/output"
+TRAINING_LIST_FILE = os.path.join(OUTPUT_DIR, "training_files.txt")
+TRAIN_SPLIT_FILE = os.path.join(OUTPUT_DIR, "train_split_files.txt")
+EVAL_LIST_FILE = os.path.join(OUTPUT_DIR, "eval_files.txt")
+CURVE_FILE = os.path.join(OUTPUT_DIR, "training_curve.csv")
+SUMMARY_FILE = os.path.join(OUTPUT_DIR, "training_summary.json")
+
+# イテレーション数の上限（早期終了しなかった場合）と学習率
+MAX_ITERATIONS = int(os.environ.get('MAX_ITERATIONS', '50000'))
+LEARNING_RATE = os.environ.get('LEARNING_RATE', '0.001')
+# 評価用に取り分ける .lstmf の割合（%）
+EVAL_PERCENT = int(os.environ.get('EVAL_PERCENT', '5'))
+MANIFEST_DIR = os.environ.get('MANIFEST_DIR', DEFAULT_MANIFEST_DIR)
+# この間（イテレーション）誤り率が MIN_DELTA（ポイント）以上改善しなければ打ち切る
+EARLY_STOPPING_PATIENCE = int(os.environ.get('EARLY_STOPPING_PATIENCE', '5000'))
+EARLY_STOPPING_MIN_DELTA = float(os.environ.get('EARLY_STOPPING_MIN_DELTA', '0.1'))
+
+# "At iteration 100/200/200, Mean rms=..., BCER train=12.3%, BWER train=45.6%, ..."
+PROGRESS_RE = re.compile(r'At iteration (\d+)/(\d+)/(\d+),.*BCER train=([\d.]+)%, BWER train=([\d.]+)%')
+# "At iteration 1000, stage 0, Eval Char error rate=12.3, Word error rate=45.6"
+EVAL_RE = re.compile(r'At iteration (\d+), stage \d+, Eval Char error rate=([\d.]+), Word error rate=([\d.]+)')
+# "... New best BCER = 12.3 wrote best model:/workspace/output/jpn_custom_12.3_100_200.checkpoint ..."
+BEST_MODEL_RE = re.compile(r'wrote best model:(\S+?\.checkpoint)')
+
+
+def split_name(lstmf):
+    """派生サンプル（_augK）も元のサンプルと同じ側に振り分けるためのキー"""
+    return re.sub(r'_aug\d+(?=\.lstmf$)', '', os.path.basename(lstmf))
+
+
+def split_key(lstmf, texts):
+    """
+    評価用に振り分けるかを決めるキー（元のテキスト）
+
+    同じ行を別のフォントで描画したサンプルも派生サンプルも同じ側に入るように、
+    サンプル一覧（無ければ .box）のテキストから空白を除いたものを使う。どちらも無ければファイル名。
+    """
+    text = texts.get(sample_index(lstmf))
+    if text is None:
+        # 派生サンプルも元のサンプルと同じテキストなので、元の .box を読む
+        box_file = re.sub(r'(_aug\d+)?\.lstmf$', '.box', lstmf)
+        if not os.path.exists(box_file):
+            return split_name(lstmf)
+        text = box_text(read_box_file(box_file))
+    return ''.join(text.split())
+
+
+def split_training_list(eval_percent=EVAL_PERCENT, manifest_dir=MANIFEST_DIR):
+    """training_files.txt を学習用と評価用に分ける（テキストのハッシュで決まるので毎回同じ分け方）"""
+    with open(TRAINING_LIST_FILE, 'r', encoding='utf-8') as f:
+        lstmfs = [line.strip() for line in f if line.strip()]
+    texts = {index: sample['text'] for index, sample in load_manifest(manifest_dir).items()}
+
+    train, evaluation = [], []
+    for lstmf in lstmfs:
+        is_eval = zlib.crc32(split_key(lstmf, texts).encode('utf-8')) % 100 < eval_percent
+        (evaluation if is_eval else train).append(lstmf)
+    # 評価用が無いと早期終了できないので、少なすぎるときは1件だけ回す
+    if not evaluation and len(train) > 1:
+        evaluation.append(train.pop())
+
+    for path, items in ((TRAIN_SPLIT_FILE, train), (EVAL_LIST_FILE, evaluation)):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(item + '\n' for item in items)
+    return len(train), len(evaluation)
+
+
+class EarlyStopping:
+    """
+    誤り率の推移から打ち切りを判定する
+
+    評価時の文字誤り率が出ていればそれを、まだ出ていなければ学習時のBCERを見る。
+    """
+
+    def __init__(self, patience=EARLY_STOPPING_PATIENCE, min_delta=EARLY_STOPPING_MIN_DELTA):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best = {}  # 指標ごとの (誤り率, イテレーション)
+
+    def update(self, metric, iteration, error_rate):
+        best = self.best.get(metric)
+        if best is None or error_rate < best[0] - self.min_delta:
+            self.best[metric] = (error_rate, iteration)
+
+    def metric(self):
+        return 'eval_cer' if 'eval_cer' in self.best else 'train_bcer'
+
+    def best_iteration(self):
+        best = self.best.get(self.metric())
+        return best[1] if best else None
+
+    def should_stop(self, iteration):
+        best = self.best.get(self.metric())
+        return best is not None and iteration - best[1] >= self.patience
+
+
+def pick_checkpoint(best_models, best_iteration):
+    """最良のイテレーション以前に書かれた最後の best model（無ければ最新のチェックポイント）"""
+    candidates = [path for iteration, path in best_models
+                  if (best_iteration is None or iteration <= best_iteration) and os.path.exists(path)]
+    if candidates:
+        return candidates[-1]
+    return os.path.join(OUTPUT_DIR, f"{MODEL_NAME}_checkpoint")
+
+
+def build_training_cmd(eval_list):
+    """lstmtraining のコマンドライン（ScrollViewは debug_interval -1 で無効化）"""
+    cmd = [
+        'lstmtraining',
+        '--model_output', os.path.join(OUTPUT_DIR, MODEL_NAME),
+        '--continue_from', os.path.join(OUTPUT_DIR, f"{START_MODEL}_extracted.lstm"),
+        '--traineddata', os.path.join(TESSDATA, f"{START_MODEL}.traineddata"),
+        '--train_listfile', TRAIN_SPLIT_FILE if eval_list else TRAINING_LIST_FILE,
+        '--max_iterations', str(MAX_ITERATIONS),
+        '--debug_interval', '-1',
+        '--learning_rate', LEARNING_RATE,
+    ]
+    if eval_list:
+        cmd += ['--eval_listfile', EVAL_LIST_FILE]
+    return cmd
+
+
+def supervise(cmd, stopper):
+    """
+    lstmtraining を実行し、出力を読みながら推移を記録して必要なら打ち切る
+
+    (最後のイテレーション, 打ち切ったか, best modelの一覧, 経過秒数) を返す。
+    """
+    started = time.time()
+    best_models = []
+    iteration = 0
+    stopped = False
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+    with open(CURVE_FILE, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['iteration', 'elapsed_sec', 'train_bcer', 'train_bwer', 'eval_cer', 'eval_wer'])
+        for line in proc.stdout:
+            print(line, end='', flush=True)
+            elapsed = round(time.time() - started, 1)
+
+            progress = PROGRESS_RE.search(line)
+            if progress:
+                iteration = int(progress.group(2))
+                bcer, bwer = float(progress.group(4)), float(progress.group(5))
+                writer.writerow([iteration, elapsed, bcer, bwer, '', ''])
+                stopper.update('train_bcer', iteration, bcer)
+                best_model = BEST_MODEL_RE.search(line)
+                if best_model:
+                    best_models.append((iteration, best_model.group(1)))
+
+            evaluation = EVAL_RE.search(line)
+            if evaluation:
+                eval_iteration = int(evaluation.group(1))
+                cer, wer = float(evaluation.group(2)), float(evaluation.group(3))
+                writer.writerow([eval_iteration, elapsed, '', '', cer, wer])
+                stopper.update('eval_cer', eval_iteration, cer)
+            f.flush()
+
+            # チェックポイントを書き終えた行の直後に止めるので、書きかけのファイルは残らない
+            if (progress or evaluation) and stopper.should_stop(iteration):
+                stopped = True
+                print(f"\n早期終了: {stopper.patience}イテレーションの間 {stopper.metric()} が改善しませんでした"
+                      f"（最良: {stopper.best[stopper.metric()][0]}%, イテレーション {stopper.best_iteration()}）",
+                      flush=True)
+                proc.terminate()
+                break
+
+    proc.wait()
+    if not stopped and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return iteration, stopped, best_models, time.time() - started
+
+
+def stop_training(checkpoint):
+    """チェックポイントから traineddata を作る"""
+    subprocess.run([
+        'lstmtraining',
+        '--stop_training',
+        '--continue_from', checkpoint,
+        '--traineddata', os.path.join(TESSDATA, f"{START_MODEL}.traineddata"),
+        '--model_output', os.path.join(OUTPUT_DIR, f"{MODEL_NAME}.traineddata"),
+    ], check=True)
+
+
+def main():
+    """メイン処理"""
+    print("=== lstmtraining（早期終了付き） ===\n")
+    train_count, eval_count = split_training_list()
+    print(f"学習用: {train_count}件, 評価用: {eval_count}件（{EVAL_LIST_FILE}）")
+    print(f"上限: {MAX_ITERATIONS}イテレーション, 打ち切り: {EARLY_STOPPING_PATIENCE}イテレーションの間 "
+          f"{EARLY_STOPPING_MIN_DELTA}ポイント以上改善しなければ\n", flush=True)
+
+    stopper = EarlyStopping()
+    try:
+        iteration, stopped, best_models, elapsed = supervise(build_training_cmd(eval_count > 0), stopper)
+    except subprocess.CalledProcessError as e:
+        print(f"エラー: lstmtraining が終了コード {e.returncode} で終了しました")
+        sys.exit(1)
+
+    checkpoint = pick_checkpoint(best_models, stopper.best_iteration())
+    print(f"\n最終モデルを作成中（{os.path.basename(checkpoint)}）...", flush=True)
+    stop_training(checkpoint)
+
+    # 打ち切らなかった場合にかかったはずの時間（これまでの1イテレーションあたりの時間から推定）
+    saved_sec = elapsed / iteration * (MAX_ITERATIONS - iteration) if stopped and iteration else 0.0
+    summary = {
+        'iterations': iteration,
+        'max_iterations': MAX_ITERATIONS,
+        'early_stopped': stopped,
+        'metric': stopper.metric(),
+        'best': {metric: {'error_rate': rate, 'iteration': it} for metric, (rate, it) in stopper.best.items()},
+        'checkpoint': checkpoint,
+        'elapsed_sec': round(elapsed, 1),
+        'estimated_saved_sec': round(saved_sec, 1),
+        'train_files': train_count,
+        'eval_files': eval_count,
+    }
+    with open(SUMMARY_FILE, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"\nイテレーション: {iteration}/{MAX_ITERATIONS}, 学習時間: {elapsed / 60:.1f}分"
+          + (f", 短縮（推定）: {saved_sec / 60:.1f}分" if stopped else ''))
+    print(f"誤り率の推移: {CURVE_FILE}")
+    print(f"概要: {SUMMARY_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tesseract の BOX ファイル（text2image 出力形式）を読み書きするユーティリティ
+
+1行の形式: "<文字> <left> <bottom> <right> <top> <page>"
+座標は画像の左下を原点とし、各テキスト行の末尾にはタブ文字のボックスが入る。
+"""
+
+TEXTLINE_END = '\t'
+
+
+def parse_box_line(line):
+    """BOXファイルの1行を (文字, left, bottom, right, top, page) に変換"""
+    # 文字自体がスペースの場合があるので右側から分割する
+    char, left, bottom, right, top, page = line.rstrip('\n').rsplit(' ', 5)
+    return (char, int(left), int(bottom), int(right), int(top), int(page))
+
+
+def read_box_file(path):
+    """BOXファイルを読み込んでボックスのリストを返す"""
+    boxes = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip(' \n'):
+                boxes.append(parse_box_line(line))
+    return boxes
+
+
+def write_box_file(path, boxes):
+    """ボックスのリストをBOXファイルに書き出す"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for char, left, bottom, right, top, page in boxes:
+            f.write(f"{char} {left} {bottom} {right} {top} {page}\n")
+
+
+def split_textlines(boxes):
+    """ボックスをテキスト行ごとに分割（タブのボックスを行末として扱う）"""
+    lines = []
+    current = []
+    for box in boxes:
+        current.append(box)
+        if box[0] == TEXTLINE_END:
+            lines.append(current)
+            current = []
+    if current:
+        lines.append(current)
+    return lines
+
+
+def box_text(boxes):
+    """ボックスから空白・行末を除いた文字列を復元"""
+    return ''.join(box[0] for box in boxes if box[0] not in (' ', TEXTLINE_END))
+
+
+def bounding_box(boxes):
+    """ボックス群を囲む矩形 (left, bottom, right, top) を返す"""
+    return (
+        min(box[1] for box in boxes),
+        min(box[2] for box in boxes),
+        max(box[3] for box in boxes),
+        max(box[4] for box in boxes),
+    )
+
+
+def shift_boxes(boxes, dx, dy, page=0):
+    """ボックス座標を (dx, dy) だけ平行移動し、ページ番号を付け替える"""
+    return [
+        (char, left + dx, bottom + dy, right + dx, top + dy, page)
+        for char, left, bottom, right, top, _ in boxes
+    ]
+
+
+def crop_region(boxes, image_size, margin):
+    """
+    ボックス群を余白付きで切り出すための領域を計算
+
+    戻り値は (Pillow用の切り出し矩形, 切り出し後の座標に合わせたボックス)
+    """
+    width, height = image_size
+    left, bottom, right, top = bounding_box(boxes)
+    left = max(0, left - margin)
+    bottom = max(0, bottom - margin)
+    right = min(width, right + margin)
+    top = min(height, top + margin)
+
+    # Pillowは左上原点なので上下を反転する
+    crop_rect = (left, height - top, right, height - bottom)
+    return crop_rect, shift_boxes(boxes, -left, -bottom)
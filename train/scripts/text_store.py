@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+text2imageに渡すテキストファイルをtmpfs上で管理する
+
+テキスト1行につきファイルを1つだけ書き、全フォントの描画が終わった時点で削除する。
+ワーカー側ではファイルの作成・削除を行わないので、描画ループにファイル操作が入らない。
+"""
+
+import os
+import shutil
+import tempfile
+
+# tmpfs（共有メモリ）があればそこを使う
+DEFAULT_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+class TextFileStore:
+    """テキスト番号ごとのファイルを参照カウントで管理"""
+
+    def __init__(self, root=None):
+        self.root = tempfile.mkdtemp(prefix='text2image_texts_', dir=root or DEFAULT_ROOT)
+        self.refs = {}
+
+    def acquire(self, text_pos, text):
+        """テキストのファイルパスを返す（初回だけ書き出す）"""
+        path = os.path.join(self.root, f"{text_pos}.txt")
+        if text_pos not in self.refs:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            self.refs[text_pos] = 0
+        self.refs[text_pos] += 1
+        return path
+
+    def release(self, text_pos):
+        """参照が無くなったファイルを削除"""
+        if text_pos not in self.refs:
+            return
+        self.refs[text_pos] -= 1
+        if self.refs[text_pos] == 0:
+            del self.refs[text_pos]
+            os.unlink(os.path.join(self.root, f"{text_pos}.txt"))
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.refs.clear()
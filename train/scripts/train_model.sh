@@ -32,6 +32,12 @@ fi
 mkdir -p $OUTPUT_DIR
 cd $OUTPUT_DIR
 
+# シャード形式で出力されている場合は、Tesseractのツール用にばらのファイルへ展開
+if ls $DATA_DIR/shards/*.tar >/dev/null 2>&1; then
+    echo "シャードを展開中..."
+    python3 $WORK_DIR/scripts/shard_archive.py expand $DATA_DIR/shards $DATA_DIR
+fi
+
 # トレーニングデータの確認
 TIFF_COUNT=$(ls -1 $DATA_DIR/*.tif 2>/dev/null | wc -l)
 echo "トレーニング画像数: $TIFF_COUNT"
@@ -42,51 +48,15 @@ if [ $TIFF_COUNT -eq 0 ]; then
     exit 1
 fi
 
-# BOXファイルの生成
-echo "BOXファイルを生成中..."
-for tif in $DATA_DIR/*.tif; do
-    base=$(basename "$tif" .tif)
-    if [ ! -f "$DATA_DIR/$base.box" ]; then
-        tesseract "$tif" "$DATA_DIR/$base" -l $START_MODEL --psm 6 makebox
-        echo "  生成: $base.box"
-    fi
-done
-
-# lstmfファイルの生成（並列処理）
-echo "LSTMファイルを生成中（並列処理）..."
-
-# CPU数を取得（環境変数で上書き可能、デフォルト: 12）
-PARALLEL_JOBS=${PARALLEL_JOBS:-12}
-
-echo "並列ジョブ数: $PARALLEL_JOBS"
-
-# lstmfファイルが存在しないtifファイルのリストを作成
-find $DATA_DIR -name "*.tif" | while read tif; do
-    base=$(basename "$tif" .tif)
-    if [ ! -f "$DATA_DIR/$base.lstmf" ]; then
-        echo "$tif"
-    fi
-done > /tmp/tif_files_to_process.txt
+# BOXファイル・lstmfファイルの生成とトレーニングリストの作成（並列・差分処理）
+# PARALLEL_JOBS環境変数で並列数を指定可能（デフォルト: 使用可能なCPU数）
+echo "BOX/LSTMファイルを生成中（並列処理）..."
+python3 $WORK_DIR/scripts/build_lstmf.py
 
-TOTAL_FILES=$(wc -l < /tmp/tif_files_to_process.txt | tr -d ' ')
-echo "処理対象ファイル数: $TOTAL_FILES"
-
-if [ $TOTAL_FILES -gt 0 ]; then
-    # xargsで並列処理
-    cat /tmp/tif_files_to_process.txt | xargs -P $PARALLEL_JOBS -I {} bash -c '
-        tif="{}"
-        base=$(basename "$tif" .tif)
-        base_dir=$(dirname "$tif")
-        tesseract "$tif" "$base_dir/$base" -l jpn --psm 6 lstm.train 2>&1 | grep -v "Tesseract Open Source"
-    '
-    echo "全てのLSTMファイル生成完了"
-else
-    echo "全てのLSTMファイルは既に存在します"
-fi
-
-# トレーニングリストファイルの作成
-echo "トレーニングリストを作成中..."
-ls -1 $DATA_DIR/*.lstmf > $OUTPUT_DIR/training_files.txt
+# トレーニングリストの並び替え（カテゴリ × フォントを均等に混ぜる）
+# TRAINING_ORDER環境変数で並び順を指定可能（interleave / curriculum / sorted, デフォルト: interleave）
+# WEIGHT_BY_ERROR=1 で前回の評価レポートの誤り率が高いカテゴリ・フォントを多めに入れる
+python3 $WORK_DIR/scripts/build_training_list.py
 
 # モデルトレーニング開始
 echo "モデルのトレーニング開始..."
@@ -96,24 +66,31 @@ echo "LSTMモデルを抽出中..."
 combine_tessdata -e $TESSDATA/${START_MODEL}.traineddata $OUTPUT_DIR/${START_MODEL}_extracted.lstm
 
 # 既存モデルから継続学習
-# ScrollViewを無効化（debug_interval -1で完全に無効化）
-# イテレーション数を大幅に増やして精度向上（10,000 → 50,000）
-lstmtraining \
-    --model_output $OUTPUT_DIR/$MODEL_NAME \
-    --continue_from $OUTPUT_DIR/${START_MODEL}_extracted.lstm \
-    --traineddata $TESSDATA/${START_MODEL}.traineddata \
-    --train_listfile $OUTPUT_DIR/training_files.txt \
-    --max_iterations 50000 \
-    --debug_interval -1 \
-    --learning_rate 0.001
-
-# 最終モデルの作成
-echo "最終モデルを作成中..."
-lstmtraining \
-    --stop_training \
-    --continue_from $OUTPUT_DIR/${MODEL_NAME}_checkpoint \
-    --traineddata $TESSDATA/${START_MODEL}.traineddata \
-    --model_output $OUTPUT_DIR/${MODEL_NAME}.traineddata
+# EARLY_STOPPING=1（デフォルト）: 評価用に取り分けた.lstmfの誤り率が改善しなくなった時点で打ち切り、
+#   最も良かったチェックポイントから最終モデルを作る（推移は $OUTPUT_DIR/training_curve.csv）
+# EARLY_STOPPING=0: 従来どおり MAX_ITERATIONS（デフォルト: 50,000）まで学習
+if [ "${EARLY_STOPPING:-1}" = "1" ]; then
+    python3 $WORK_DIR/scripts/supervise_training.py
+else
+    # ScrollViewを無効化（debug_interval -1で完全に無効化）
+    # イテレーション数を大幅に増やして精度向上（10,000 → 50,000）
+    lstmtraining \
+        --model_output $OUTPUT_DIR/$MODEL_NAME \
+        --continue_from $OUTPUT_DIR/${START_MODEL}_extracted.lstm \
+        --traineddata $TESSDATA/${START_MODEL}.traineddata \
+        --train_listfile $OUTPUT_DIR/training_files.txt \
+        --max_iterations ${MAX_ITERATIONS:-50000} \
+        --debug_interval -1 \
+        --learning_rate 0.001
+
+    # 最終モデルの作成
+    echo "最終モデルを作成中..."
+    lstmtraining \
+        --stop_training \
+        --continue_from $OUTPUT_DIR/${MODEL_NAME}_checkpoint \
+        --traineddata $TESSDATA/${START_MODEL}.traineddata \
+        --model_output $OUTPUT_DIR/${MODEL_NAME}.traineddata
+fi
 
 echo "===================================="
 echo "トレーニング完了！"
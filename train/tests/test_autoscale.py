@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+同時実行数の自動調整（scripts/autoscale.py）のテスト
+
+実行方法:
+  python3 -m pytest train/tests
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import autoscale  # noqa: E402
+
+
+class ConcurrencyControllerTest(unittest.TestCase):
+
+    def run_windows(self, controller, windows):
+        """(枚数/秒, 空きメモリMB) の列を1秒ずつの間隔として渡し、各間隔の後の同時実行数を返す"""
+        levels = []
+        completed = 0
+        for rate, available in windows:
+            completed += rate
+            controller.window_start -= 1.0
+            with mock.patch.object(autoscale, 'available_memory_mb', return_value=available):
+                controller.observe(completed)
+            levels.append(controller.level)
+        return levels
+
+    def make_controller(self):
+        return autoscale.ConcurrencyController(
+            8, start=2, step=2, interval_sec=1.0, min_available_mb=1000, recovery_windows=3, log=lambda _: None)
+
+    def test_probes_upward_again_after_memory_recovers(self):
+        controller = self.make_controller()
+        levels = self.run_windows(controller, [
+            (10, 5000),  # 2 → 4
+            (20, 500),   # 空きメモリ不足: 4 → 2
+            (10, 5000),  # 頭打ちとして固定
+            (10, 5000),
+            (10, 5000),
+            (10, 5000),  # 余裕のある状態が続いたので 2 → 4
+            (20, 5000),  # 速くなったので 4 → 6
+        ])
+        self.assertEqual(levels, [4, 2, 2, 2, 2, 4, 6])
+
+    def test_returns_to_best_level_when_probe_does_not_help(self):
+        controller = self.make_controller()
+        levels = self.run_windows(controller, [
+            (10, 5000),  # 2 → 4
+            (10, 5000),  # 頭打ち: 2 に戻して固定
+            (10, 5000),
+            (10, 5000),
+            (10, 5000),  # 再探索: 2 → 4
+            (10, 5000),  # 速くならないので 2 に戻す
+        ])
+        self.assertEqual(levels, [4, 2, 2, 2, 4, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
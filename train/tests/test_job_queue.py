@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+ジョブキュー（scripts/job_queue.py）のテスト
+
+実行方法:
+  python3 -m pytest train/tests
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from job_queue import JobQueue, iter_leased, iter_lease_rounds  # noqa: E402
+
+# 描画を模した text2image（出力ファイルを作って少し待つだけ）
+FAKE_TEXT2IMAGE = textwrap.dedent("""\
+    #!/bin/sh
+    while [ $# -gt 0 ]; do
+        if [ "$1" = "--outputbase" ]; then base="$2"; fi
+        shift
+    done
+    sleep 0.1
+    printf 'II*\\000' > "$base.tif"
+    printf 'x 0 0 10 10 0\\n' > "$base.box"
+""")
+
+# 1ワーカー分の生成処理（出力先だけテスト用のディレクトリに差し替える）
+WORKER = textwrap.dedent("""\
+    import sys
+    sys.path.insert(0, {scripts_dir!r})
+    import generate_training_data as gen
+    gen.OUTPUT_DIR = {output_dir!r}
+    texts = ['行{{}}'.format(i) for i in range({texts})]
+    gen.generate_training_data_with_text2image(texts, ['A', 'B'], max_workers=2)
+""")
+
+
+def make_samples(count):
+    return [(f"行{i}", 'A', i) for i in range(count)]
+
+
+class JobQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'job_queue.sqlite')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_leased_returns_while_others_hold_leases(self):
+        queue = JobQueue(self.path)
+        queue.seed(make_samples(4), {})
+        self.assertEqual(len(queue.lease('other', 4)), 4)
+
+        started = time.time()
+        self.assertEqual(list(iter_leased(queue, 'me', 2)), [])
+        self.assertLess(time.time() - started, 1.0)
+        queue.close()
+
+    def test_seed_does_not_block_other_writers(self):
+        queue = JobQueue(self.path)
+        queue.seed(make_samples(2), {})
+        queue.lease('other', 2)
+        other = JobQueue(self.path)
+        other.conn.execute('PRAGMA busy_timeout = 100')
+
+        def slow_samples():
+            # 登録中に他のワーカーが書き戻せること
+            other.heartbeat('other')
+            other.complete(0)
+            yield from make_samples(2)
+
+        self.assertFalse(queue.seed(slow_samples(), {}))
+        self.assertEqual(queue.counts(), {'done': 1, 'leased': 1})
+        self.assertTrue(queue.seed(make_samples(3), {}))
+        self.assertEqual(queue.counts(), {'pending': 3})
+        other.close()
+        queue.close()
+
+    def test_rounds_retry_failed_jobs(self):
+        queue = JobQueue(self.path)
+        queue.seed(make_samples(3), {})
+        attempts = []
+        for leased in iter_lease_rounds(queue, 'me', 2, poll_sec=0.01):
+            for text, font_name, image_index in leased:
+                attempts.append(image_index)
+                if image_index == 1 and attempts.count(1) == 1:
+                    queue.fail(image_index, 'error')
+                else:
+                    queue.complete(image_index)
+        self.assertEqual(sorted(attempts), [0, 1, 1, 2])
+        self.assertEqual(queue.counts(), {'done': 3})
+        queue.close()
+
+    def test_rounds_recover_expired_leases(self):
+        queue = JobQueue(self.path)
+        queue.seed(make_samples(2), {})
+        queue.lease('stopped', 1, lease_sec=0.2)
+        done = []
+        for leased in iter_lease_rounds(queue, 'me', 2, poll_sec=0.05):
+            for text, font_name, image_index in leased:
+                queue.complete(image_index)
+                done.append(image_index)
+        self.assertEqual(sorted(done), [0, 1])
+        queue.close()
+
+    def test_two_workers_finish_shared_queue(self):
+        text2image = os.path.join(self.tmp.name, 'text2image')
+        with open(text2image, 'w') as f:
+            f.write(FAKE_TEXT2IMAGE)
+        os.chmod(text2image, 0o755)
+
+        env = dict(
+            os.environ,
+            TEXT2IMAGE_BIN=text2image,
+            JOB_QUEUE='1',
+            JOB_QUEUE_PATH=self.path,
+            JOB_LEASE_SEC='3',
+            JOB_POLL_SEC='0.2',
+            JOB_LEASE_BATCH='8',
+            FONT_COVERAGE='0',
+            RENDER_CACHE_DIR='',
+            METRICS_DIR='',
+            MAX_WORKERS='2',
+            EXECUTOR_BACKEND='thread',
+        )
+        texts = 60
+        workers = []
+        for n in range(2):
+            code = WORKER.format(scripts_dir=SCRIPTS_DIR, output_dir=os.path.join(self.tmp.name, f"out{n}"),
+                                 texts=texts)
+            workers.append(subprocess.Popen([sys.executable, '-c', code], env=env,
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True))
+        for worker in workers:
+            _, stderr = worker.communicate(timeout=60)
+            self.assertEqual(worker.returncode, 0, stderr)
+
+        queue = JobQueue(self.path)
+        errors = queue.conn.execute("SELECT error FROM jobs WHERE error IS NOT NULL LIMIT 3").fetchall()
+        self.assertEqual(queue.counts(), {'done': texts * 2}, errors)
+        queue.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+サンプル一覧（scripts/sample_manifest.py）のテスト
+
+実行方法:
+  python3 -m pytest train/tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from sample_manifest import ManifestWriter, clear_manifest, load_manifest  # noqa: E402
+
+
+class SampleManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_workers_append_to_their_own_files(self):
+        for worker, index in (('w1', 0), ('w2', 1), ('w1', 2)):
+            manifest = ManifestWriter(self.dir, worker)
+            manifest.add(index, f"東京都{index}", 'IPAexGothic')
+            manifest.close()
+
+        samples = load_manifest(self.dir)
+        self.assertEqual(sorted(samples), [0, 1, 2])
+        self.assertEqual(samples[2]['text'], '東京都2')
+        self.assertEqual(samples[2]['font'], 'IPAexGothic')
+        self.assertEqual(samples[2]['length'], 4)
+
+        clear_manifest(self.dir)
+        self.assertEqual(load_manifest(self.dir), {})
+
+    def test_truncated_last_row_is_skipped(self):
+        manifest = ManifestWriter(self.dir)
+        manifest.add(0, '山田 太郎', 'A')
+        manifest.add(1, '山田 花子', 'A')
+        manifest.close()
+        with open(manifest.path, 'r+b') as f:
+            f.truncate(os.path.getsize(manifest.path) - 4)
+        self.assertEqual(sorted(load_manifest(self.dir)), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+シャード出力（scripts/shard_archive.py）のテスト
+
+実行方法:
+  python3 -m pytest train/tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from shard_archive import ShardWriter, expand_shards, read_index  # noqa: E402
+
+
+class ShardArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.shard_dir = os.path.join(self.tmp, 'shards')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write_samples(self, count):
+        """count件のサンプルを書き、閉じずに返す（書き込み中に止まったワーカーを模す）"""
+        writer = ShardWriter(self.shard_dir, 'worker', 1 << 30)
+        for i in range(count):
+            base = os.path.join(self.tmp, f"sample{i}")
+            for ext in ('.tif', '.box'):
+                with open(base + ext, 'wb') as f:
+                    f.write(os.urandom(3000))
+            writer.add_sample(base, f"sample{i}")
+        return writer.shard_paths[0]
+
+    def test_flushed_samples_survive_without_close(self):
+        shard = self.write_samples(3)
+        dest = os.path.join(self.tmp, 'expanded')
+        self.assertEqual(expand_shards(self.shard_dir, dest), 6)
+        self.assertEqual(len(read_index(shard)), 6)
+
+    def test_truncated_tail_sample_is_skipped(self):
+        shard = self.write_samples(3)
+        # 最後のサンプルの .box の途中で途切れたシャード
+        with open(shard, 'r+b') as f:
+            f.truncate(os.path.getsize(shard) - 1000)
+        dest = os.path.join(self.tmp, 'expanded')
+        self.assertEqual(expand_shards(self.shard_dir, dest), 4)
+        self.assertEqual(sorted(os.listdir(dest)),
+                         ['sample0.box', 'sample0.tif', 'sample1.box', 'sample1.tif'])
+
+
+if __name__ == '__main__':
+    unittest.main()
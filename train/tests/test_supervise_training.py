@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+早期終了付きトレーニング（scripts/supervise_training.py）のテスト
+
+実行方法:
+  python3 -m pytest train/tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import supervise_training  # noqa: E402
+from sample_manifest import ManifestWriter  # noqa: E402
+from tess_box import TEXTLINE_END, write_box_file  # noqa: E402
+
+
+class SplitTrainingListTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.manifest_dir = os.path.join(self.dir, 'manifest')
+        self.saved = (supervise_training.TRAINING_LIST_FILE, supervise_training.TRAIN_SPLIT_FILE,
+                      supervise_training.EVAL_LIST_FILE)
+        supervise_training.TRAINING_LIST_FILE = os.path.join(self.dir, 'training_files.txt')
+        supervise_training.TRAIN_SPLIT_FILE = os.path.join(self.dir, 'train_split_files.txt')
+        supervise_training.EVAL_LIST_FILE = os.path.join(self.dir, 'eval_files.txt')
+
+    def tearDown(self):
+        (supervise_training.TRAINING_LIST_FILE, supervise_training.TRAIN_SPLIT_FILE,
+         supervise_training.EVAL_LIST_FILE) = self.saved
+        self.tmp.cleanup()
+
+    def lstmf(self, image_index, aug=0):
+        suffix = f"_aug{aug}" if aug else ''
+        return os.path.join(self.dir, f"jpn_custom.train_{image_index:04d}{suffix}.lstmf")
+
+    def read_groups(self, path, group_of):
+        with open(path, 'r', encoding='utf-8') as f:
+            return {group_of[line.strip()] for line in f if line.strip()}
+
+    def test_same_text_stays_on_one_side(self):
+        fonts = 3
+        manifest = ManifestWriter(self.manifest_dir)
+        group_of = {}
+        for line in range(200):
+            for font in range(fonts):
+                image_index = line * fonts + font
+                # 半分はサンプル一覧、残りは .box からテキストを取る
+                if font < 2:
+                    manifest.add(image_index, f"東京都 港区{line}", f"font{font}")
+                else:
+                    text = f"東京都港区{line}"
+                    boxes = [(char, 0, 0, 1, 1, 0) for char in text] + [(TEXTLINE_END, 0, 0, 1, 1, 0)]
+                    write_box_file(self.lstmf(image_index)[:-len('.lstmf')] + '.box', boxes)
+                group_of[self.lstmf(image_index)] = line
+                group_of[self.lstmf(image_index, aug=1)] = line
+        manifest.close()
+        with open(supervise_training.TRAINING_LIST_FILE, 'w', encoding='utf-8') as f:
+            f.writelines(path + '\n' for path in group_of)
+
+        train_count, eval_count = supervise_training.split_training_list(10, self.manifest_dir)
+        self.assertEqual(train_count + eval_count, len(group_of))
+        self.assertGreater(eval_count, 0)
+        train = self.read_groups(supervise_training.TRAIN_SPLIT_FILE, group_of)
+        evaluation = self.read_groups(supervise_training.EVAL_LIST_FILE, group_of)
+        self.assertEqual(train & evaluation, set())
+
+
+if __name__ == '__main__':
+    unittest.main()